@@ -1,321 +1,113 @@
 import streamlit as st
-import base64
+import pandas as pd
+import sqlite3
 import json
-import re
-from graphviz import Digraph
+import time
+from concurrent.futures import CancelledError, wait
+from threatmodel.ascii_diagram import ascii_diagram
+from threatmodel.blob_store import BlobTooLarge, blob_store
+from threatmodel.bulk_import import bulk_import
+from threatmodel.diagram import build_generic_diagram
+from threatmodel.incremental import IncrementalModel
+from threatmodel.metrics import add_to_totals, metrics
+from threatmodel.model_io import ModelError
+from threatmodel.partition import build_view, diagram_views
+from threatmodel.render import DIAGRAM_FORMAT, RenderError, image_source
+from threatmodel.render_pool import RenderPoolBusy, render_pool
+from threatmodel.report import REPORT_FORMATS
+from threatmodel.report_jobs import ReportQueueBusy, report_queue
+from threatmodel.results import PAGE_SIZE, page_bounds, threat_title, threats_markdown
+from threatmodel.risk import risk_color, risk_level, score_threats
+from threatmodel.session import init_session, reset_session
+from threatmodel.store import StoreError, model_store
+from threatmodel.threat_index import ThreatIndex
 
 # Streamlit UI
 st.title("Threat Modeling Application")
 
 # Initialize session state
-if 'step' not in st.session_state:
-    st.session_state.step = 1
-if 'text_input' not in st.session_state:
-    st.session_state.text_input = ""
-if 'diagram' not in st.session_state:
-    st.session_state.diagram = None
-if 'data_flows' not in st.session_state:
-    st.session_state.data_flows = []
-if 'trust_boundaries' not in st.session_state:
-    st.session_state.trust_boundaries = []
-if 'threat_model' not in st.session_state:
-    st.session_state.threat_model = None
-if 'error' not in st.session_state:
-    st.session_state.error = ""
-if 'generated_diagram' not in st.session_state:
-    st.session_state.generated_diagram = None
+init_session(st.session_state)
 
-def generate_diagram():
-    """Generate a diagram from data flows and trust boundaries using Graphviz."""
-    dot = Digraph(comment="Data Flow Diagram", format="png")
-    dot.attr(rankdir="LR", size="8,5")
-
-    # Add nodes for data flow sources and destinations
-    nodes = set()
-    for flow in st.session_state.data_flows:
-        nodes.add(flow["source"])
-        nodes.add(flow["destination"])
-    for node in nodes:
-        dot.node(node, node, shape="box")
-
-    # Add data flow edges
-    for flow in st.session_state.data_flows:
-        dot.edge(flow["source"], flow["destination"], label=flow["dataType"])
-
-    # Add trust boundaries as subgraphs
-    for boundary in st.session_state.trust_boundaries:
-        with dot.subgraph(name=f"cluster_{boundary['name']}") as c:
-            c.attr(label=boundary["name"], style="dashed")
-            # Assume components mentioned in boundary description are nodes
-            components = re.findall(r"\b\w+\b", boundary["description"].lower())
-            for node in nodes:
-                if node.lower() in components:
-                    c.node(node)
+# Stage timings of this rerun, shown in the sidebar when THREATMODEL_METRICS is set
+rerun_started = time.perf_counter()
+rerun_timings = {}
 
-    # Render diagram to file and encode as base64
-    diagram_path = dot.render("diagram", format="png", cleanup=True)
-    with open(diagram_path, "rb") as f:
-        st.session_state.generated_diagram = base64.b64encode(f.read()).decode("utf-8")
-    return st.session_state.generated_diagram
+def generate_diagram():
+    """Build a diagram from data flows and trust boundaries, with attack paths highlighted, and submit it for rendering."""
+    views = diagram_views(st.session_state.data_flows, st.session_state.trust_boundaries)
+    # Large model: only the view the user picks is rendered
+    view = st.selectbox("Diagram view", list(views), key="diagram_view") if views else None
+    analyze_threats()
+    with metrics.stage("dot_build", rerun_timings):
+        if views:
+            paths = st.session_state.analysis.attack_paths()
+            dot, engine = build_view(lambda flows, boundaries: build_generic_diagram(flows, boundaries, paths), st.session_state.data_flows, st.session_state.trust_boundaries, views, view)
+        else:
+            # Patched in place as flows and boundaries are added
+            dot, engine = st.session_state.analysis.layout()
+
+    # Render in the background pool (or reuse an identical earlier render)
+    try:
+        st.session_state.diagram_job = render_pool.resubmit(st.session_state.diagram_job, dot.source, DIAGRAM_FORMAT, engine)
+        st.session_state.diagram_error = ""
+    except RenderPoolBusy as e:
+        st.session_state.diagram_job = None
+        st.session_state.diagram_error = str(e)
+    return st.session_state.diagram_job
+
+def show_diagram(slot, caption):
+    """Wait for this session's render job and fill the placeholder with the result."""
+    job = st.session_state.diagram_job
+    if job is None:
+        slot.warning(st.session_state.diagram_error)
+        return
+    started = time.monotonic()
+    with metrics.stage("render_wait", rerun_timings):
+        while not job.done():
+            # Updating the placeholder lets Streamlit stop this run as soon as the model changes again
+            slot.info(f"Rendering diagram... ({time.monotonic() - started:.1f}s)")
+            wait([job], timeout=0.25)
+    try:
+        st.session_state.generated_diagram = job.result()
+    except CancelledError:
+        return
+    except RenderError as e:
+        st.session_state.generated_diagram = None
+        st.session_state.diagram_error = str(e)
+    except Exception as e:
+        st.session_state.generated_diagram = None
+        st.session_state.diagram_error = f"Failed to generate diagram: {str(e)}"
+    else:
+        slot.image(image_source(st.session_state.generated_diagram), caption=caption)
+        return
+    # Fall back to the text diagram, which needs no Graphviz
+    with slot.container():
+        st.code(ascii_diagram(st.session_state.data_flows, st.session_state.trust_boundaries), language="text")
+        st.warning(st.session_state.diagram_error)
 
 def analyze_threats():
-    """Perform comprehensive STRIDE-based threat analysis with security controls."""
-    threats = []
-
-    # Helper function to add threats
-    def add_threat(threat_type, description, stride, mitigation, asvs, samm, controls=None):
-        threat = {
-            "type": threat_type,
-            "description": description,
-            "stride": stride,
-            "mitigation": mitigation,
-            "asvs": asvs,
-            "samm": samm
-        }
-        if controls:
-            threat["controls"] = controls
-        threats.append(threat)
-
-    # Analyze system description for components and design characteristics
-    text_input = st.session_state.text_input.lower()
-    components = {
-        "web": "web application" in text_input or "website" in text_input or "public facing" in text_input,
-        "api": "api" in text_input or "endpoint" in text_input,
-        "database": "database" in text_input or "db" in text_input,
-        "cloud": "cloud" in text_input or "aws" in text_input or "azure" in text_input,
-        "authentication": "login" in text_input or "password" in text_input or "credential" in text_input,
-        "third_party": "third party" in text_input or "external" in text_input,
-        "public_facing": "public facing" in text_input or "external facing" in text_input
-    }
-
-    # Security controls for public-facing applications
-    if components["public_facing"] or components["web"]:
-        add_threat(
-            "Spoofing",
-            "Public-facing application vulnerable to impersonation attacks.",
-            "Spoofing",
-            "Implement strong authentication mechanisms such as multi-factor authentication (MFA) and OAuth 2.0 with short-lived tokens.",
-            "V2.1.1 - Verify strong authentication controls; V2.7.1 - Verify session management.",
-            "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Define authentication policies.",
-            controls="Use MFA (e.g., TOTP, biometrics), OAuth 2.0 with PKCE, and secure session cookies with HttpOnly and Secure flags."
-        )
-        add_threat(
-            "Denial of Service",
-            "Public-facing application susceptible to DoS attacks due to high exposure.",
-            "Denial of Service",
-            "Deploy Web Application Firewall (WAF), enable rate limiting, and use CDN with DDoS protection (e.g., AWS CloudFront, Shield).",
-            "V1.10.1 - Verify anti-DoS controls; V13.1.1 - Verify API security.",
-            "Incident Management Level 2 - Implement proactive monitoring; Operations Level 2 - Ensure availability.",
-            controls="Configure WAF rules for common attack patterns, set rate limits (e.g., 100 requests/min per IP), and enable auto-scaling."
-        )
-
-    # STRIDE: Spoofing
-    if components["authentication"] or components["api"]:
-        add_threat(
-            "Spoofing",
-            "Attackers may impersonate legitimate users or services.",
-            "Spoofing",
-            "Use strong session management, validate API tokens, and implement mutual TLS for APIs.",
-            "V2.1.2 - Verify identity validation; V13.2.1 - Verify API authentication.",
-            "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Enforce identity policies.",
-            controls="Implement JWT validation with HMAC-SHA256 and enforce mutual TLS for API endpoints."
-        )
-
-    # STRIDE: Tampering
-    if components["database"] or components["web"]:
-        add_threat(
-            "Tampering",
-            "Data integrity may be compromised due to insufficient validation.",
-            "Tampering",
-            "Use parameterized queries, apply cryptographic hashing (e.g., SHA-256), and enforce input sanitization.",
-            "V5.1.3 - Verify input validation; V5.3.4 - Verify secure database queries.",
-            "Secure Architecture Level 1 - Define security requirements; Design Level 2 - Implement integrity controls.",
-            controls="Use prepared statements for SQL queries and validate inputs against a whitelist."
-        )
-
-    # STRIDE: Repudiation
-    if components["authentication"] or components["web"]:
-        add_threat(
-            "Repudiation",
-            "Actions may not be traceable due to lack of audit trails.",
-            "Repudiation",
-            "Implement tamper-proof logging, centralize log storage, and enable log monitoring.",
-            "V7.1.1 - Verify logging controls; V7.2.1 - Verify log integrity.",
-            "Security Operations Level 2 - Enable audit logging; Incident Management Level 2 - Monitor logs.",
-            controls="Use a SIEM system (e.g., AWS CloudTrail, Splunk) and ensure logs include timestamps and user IDs."
-        )
-
-    # STRIDE: Information Disclosure
-    if components["database"] or components["cloud"]:
-        add_threat(
-            "Information Disclosure",
-            "Sensitive data may be exposed due to unencrypted storage or weak access controls.",
-            "Information Disclosure",
-            "Encrypt data at rest (AES-256) and in transit (TLS 1.3), enforce least privilege, and use secure key management.",
-            "V4.1.3 - Verify access controls; V9.1.1 - Verify secure communication.",
-            "Secure Architecture Level 2 - Standardize security controls; Implementation Level 2 - Secure data handling.",
-            controls="Use AWS KMS for key management and ensure database encryption with transparent data encryption."
-        )
-
-    # STRIDE: Denial of Service
-    if components["api"] or components["web"] and not components["public_facing"]:
-        add_threat(
-            "Denial of Service",
-            "System availability may be impacted by resource exhaustion.",
-            "Denial of Service",
-            "Implement rate limiting, use circuit breakers, and deploy auto-scaling groups.",
-            "V1.10.2 - Verify rate limiting; V13.1.2 - Verify API resilience.",
-            "Incident Management Level 2 - Monitor for DoS; Operations Level 2 - Ensure availability.",
-            controls="Set API rate limits (e.g., 1000 requests/hour) and configure auto-scaling triggers based on CPU usage."
-        )
-
-    # STRIDE: Elevation of Privilege
-    if components["third_party"] or components["cloud"]:
-        add_threat(
-            "Elevation of Privilege",
-            "Privilege escalation due to misconfigured roles or third-party vulnerabilities.",
-            "Elevation of Privilege",
-            "Enforce RBAC, segregate duties, audit third-party components, and apply patches promptly.",
-            "V4.2.1 - Verify RBAC; V14.2.3 - Verify dependency management.",
-            "Secure Architecture Level 2 - Implement RBAC; Implementation Level 2 - Manage dependencies.",
-            controls="Use IAM roles with least privilege and scan dependencies with tools like Dependabot."
-        )
-
-    # Analyze data flows
-    for flow in st.session_state.data_flows:
-        data_type = flow.get('dataType', '').lower()
-        source = flow.get('source', '').lower()
-        destination = flow.get('destination', '').lower()
-
-        # Spoofing in data flows
-        if 'user' in source or 'client' in source:
-            add_threat(
-                "Spoofing",
-                f"Unauthorized access in flow from {source} to {destination}.",
-                "Spoofing",
-                "Validate source identity with OAuth 2.0 or JWT and enforce secure session handling.",
-                "V2.1.2 - Verify identity validation; V2.7.3 - Verify session binding.",
-                "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Enforce identity policies.",
-                controls="Implement OAuth 2.0 with PKCE and secure JWT signing with RS256."
-            )
-
-        # Tampering in data flows
-        add_threat(
-            "Tampering",
-            f"Data integrity risk in flow from {source} to {destination}.",
-            "Tampering",
-            "Use digital signatures or HMAC for integrity and validate inputs at the destination.",
-            "V5.1.4 - Verify data integrity; V5.2.2 - Verify input sanitization.",
-            "Design Level 2 - Implement integrity controls; Verification Level 1 - Validate inputs.",
-            controls="Apply HMAC-SHA256 for data integrity and use schema-based input validation."
-        )
-
-        # Information Disclosure in sensitive data flows
-        if 'pii' in data_type or 'sensitive' in data_type or 'confidential' in data_type:
-            add_threat(
-                "Information Disclosure",
-                f"Sensitive data ({data_type}) exposed in flow from {source} to {destination}.",
-                "Information Disclosure",
-                "Encrypt data with TLS 1.3, mask sensitive data in logs, and restrict access.",
-                "V9.1.2 - Verify encryption in transit; V4.1.4 - Verify access restrictions.",
-                "Implementation Level 2 - Secure data handling; Operations Level 2 - Protect sensitive data.",
-                controls="Use TLS 1.3 with strong ciphers and implement data masking for logs."
-            )
-
-        # Denial of Service in data flows
-        if 'api' in destination or 'server' in destination:
-            add_threat(
-                "Denial of Service",
-                f"Potential DoS attack targeting {destination} in data flow.",
-                "Denial of Service",
-                "Implement rate limiting, use circuit breakers, and monitor traffic anomalies.",
-                "V1.10.2 - Verify rate limiting; V13.1.2 - Verify API resilience.",
-                "Incident Management Level 2 - Monitor for DoS; Operations Level 2 - Ensure availability.",
-                controls="Configure circuit breakers with a 5-second timeout and monitor with AWS CloudWatch."
-            )
-
-    # Analyze trust boundaries
-    for boundary in st.session_state.trust_boundaries:
-        name = boundary.get('name', '').lower()
-        description = boundary.get('description', '').lower()
-
-        # Spoofing across trust boundaries
-        if 'boundary' in name or 'dmz' in name:
-            add_threat(
-                "Spoofing",
-                f"Cross-boundary spoofing in {name}.",
-                "Spoofing",
-                "Enforce mutual TLS, use API gateway authentication, and validate cross-boundary requests.",
-                "V2.1.3 - Verify boundary authentication; V13.2.1 - Verify API security.",
-                "Threat Assessment Level 2 - Model boundary risks; Governance Level 2 - Define boundary policies.",
-                controls="Implement mutual TLS with client certificates and use AWS API Gateway for authentication."
-            )
-
-        # Tampering within trust boundaries
-        if 'database' in name or 'server' in name:
-            add_threat(
-                "Tampering",
-                f"Data tampering within {name} due to weak controls.",
-                "Tampering",
-                "Use integrity checks (e.g., checksums), secure coding, and validate data within the boundary.",
-                "V5.1.3 - Verify input validation; V5.3.5 - Verify secure coding.",
-                "Design Level 2 - Implement integrity controls; Verification Level 2 - Validate boundary controls.",
-                controls="Apply SHA-256 checksums and use OWASP secure coding guidelines."
-            )
-
-        # Elevation of Privilege within trust boundaries
-        add_threat(
-            "Elevation of Privilege",
-            f"Privilege escalation within {name} due to misconfigured access controls.",
-            "Elevation of Privilege",
-            "Implement RBAC, segregate duties, and audit permissions regularly.",
-            "V4.2.2 - Verify segregation of duties; V4.2.1 - Verify RBAC.",
-            "Secure Architecture Level 2 - Implement RBAC; Governance Level 2 - Audit permissions.",
-            controls="Define granular IAM roles and audit with AWS Config."
-        )
-
-    # Analyze diagram (simulate component detection)
-    if st.session_state.diagram:
-        diagram_components = []
-        if components["web"]:
-            diagram_components.append("Web Application")
-        if components["database"]:
-            diagram_components.append("Database")
-        if components["api"]:
-            diagram_components.append("API")
-        if components["cloud"]:
-            diagram_components.append("Cloud Service")
-
-        for component in diagram_components:
-            add_threat(
-                "Spoofing",
-                f"Impersonation of {component} in diagram.",
-                "Spoofing",
-                f"Secure {component} with strong authentication (e.g., OAuth, certificates).",
-                "V2.1.1 - Verify authentication controls; V13.2.2 - Verify API authentication.",
-                "Threat Assessment Level 1 - Identify component risks; Governance Level 2 - Enforce authentication.",
-                controls=f"Use OAuth 2.0 for {component} authentication and validate certificates."
-            )
-            add_threat(
-                "Information Disclosure",
-                f"Data exposure in {component} due to unencrypted channels.",
-                "Information Disclosure",
-                f"Encrypt data flows to/from {component} and restrict access.",
-                "V9.1.1 - Verify secure communication; V4.1.3 - Verify access controls.",
-                "Implementation Level 2 - Secure data flows; Operations Level 2 - Protect components.",
-                controls=f"Enable TLS 1.3 for {component} and restrict access with IAM policies."
-            )
-            add_threat(
-                "Denial of Service",
-                f"Resource exhaustion targeting {component} in diagram.",
-                "Denial of Service",
-                f"Implement rate limiting and auto-scaling for {component}.",
-                "V1.10.1 - Verify anti-DoS controls; V13.1.1 - Verify API resilience.",
-                "Incident Management Level 2 - Monitor components; Operations Level 2 - Ensure availability.",
-                controls=f"Configure rate limiting and auto-scaling for {component} using AWS services."
-            )
-
-    return {"threats": threats}
+    """Perform comprehensive STRIDE-based threat analysis, analyzing only newly added elements."""
+    if st.session_state.analysis is None:
+        st.session_state.analysis = IncrementalModel("generic")
+    with metrics.stage("analysis", rerun_timings):
+        return st.session_state.analysis.sync(
+            st.session_state.text_input,
+            st.session_state.data_flows,
+            st.session_state.trust_boundaries,
+            bool(st.session_state.diagram)
+        ).result()
+
+def store_upload(uploaded_file):
+    """Keep the uploaded diagram in the shared blob store, reading it only when the upload changes."""
+    if uploaded_file.file_id == st.session_state.diagram_upload and st.session_state.diagram in blob_store:
+        return
+    try:
+        st.session_state.diagram = blob_store.put(uploaded_file.getvalue())
+        st.session_state.diagram_upload = uploaded_file.file_id
+    except BlobTooLarge as e:
+        st.session_state.diagram = None
+        st.session_state.diagram_upload = None
+        st.session_state.error = str(e)
 
 def step_1():
     st.header("Step 1: Provide System Details")
@@ -326,8 +118,10 @@ def step_1():
     )
     uploaded_file = st.file_uploader("Upload a Data Flow Diagram (e.g., PNG, JPG)", type=["png", "jpg", "jpeg"])
     if uploaded_file:
-        st.session_state.diagram = base64.b64encode(uploaded_file.read()).decode("utf-8")
-        st.image(uploaded_file, caption="Uploaded Data Flow Diagram")
+        store_upload(uploaded_file)
+        image = blob_store.get(st.session_state.diagram)
+        if image is not None:
+            st.image(image, caption="Uploaded Data Flow Diagram")
     if st.button("Next"):
         if st.session_state.text_input or st.session_state.diagram:
             st.session_state.step = 2
@@ -352,9 +146,12 @@ def step_2():
                 st.session_state.error = "Please fill in all data flow fields."
     
     if st.session_state.data_flows:
-        st.write("**Current Data Flows:**")
-        for flow in st.session_state.data_flows:
-            st.write(f"{flow['source']} → {flow['destination']} ({flow['dataType']})")
+        # One element for the list, capped so large imports stay responsive
+        flows = st.session_state.data_flows
+        lines = [f"- {flow['source']} → {flow['destination']} ({flow['dataType']})" for flow in flows[:100]]
+        if len(flows) > 100:
+            lines.append(f"- ...and {len(flows) - 100} more")
+        st.markdown("**Current Data Flows:**\n" + "\n".join(lines))
 
     st.subheader("Trust Boundaries")
     with st.container():
@@ -380,14 +177,49 @@ def step_2():
                 st.session_state.error = "Please provide a valid trust boundary name and description."
     
     if st.session_state.trust_boundaries:
-        st.write("**Current Trust Boundaries:**")
-        for boundary in st.session_state.trust_boundaries:
-            st.write(f"{boundary['name']}: {boundary['description']}")
-
+        boundaries = st.session_state.trust_boundaries
+        lines = [f"- {boundary['name']}: {boundary['description']}" for boundary in boundaries[:100]]
+        if len(boundaries) > 100:
+            lines.append(f"- ...and {len(boundaries) - 100} more")
+        st.markdown("**Current Trust Boundaries:**\n" + "\n".join(lines))
+
+    st.subheader("Bulk Import")
+    bulk_file = st.file_uploader("Import data flows and trust boundaries (CSV, JSON or JSONL)", type=["csv", "json", "jsonl"], key="bulk_upload")
+    if bulk_file is not None and st.button("Import"):
+        report = st.session_state.import_report
+        if report is not None and report.get("file_id") == bulk_file.file_id:
+            st.session_state.import_report = dict(report, message="This file has already been imported.")
+        else:
+            try:
+                with metrics.stage("bulk_import", rerun_timings):
+                    imported = bulk_import(bulk_file, bulk_file.name)
+            except ModelError as e:
+                st.session_state.import_report = {"message": f"Import failed: {e}", "errors": [], "error_count": 0}
+            else:
+                # One state update, so the rerun analyzes and renders the model once
+                st.session_state.data_flows.extend(imported["data_flows"])
+                st.session_state.trust_boundaries.extend(imported["trust_boundaries"])
+                st.session_state.import_report = {
+                    "file_id": bulk_file.file_id,
+                    "message": f"Imported {len(imported['data_flows'])} data flows and {len(imported['trust_boundaries'])} trust boundaries.",
+                    "errors": imported["errors"],
+                    "error_count": imported["error_count"],
+                }
+        st.rerun()
+    report = st.session_state.import_report
+    if report is not None:
+        st.info(report["message"])
+        if report["error_count"]:
+            skipped = "\n".join(f"- Row {row}: {message}" for row, message in report["errors"])
+            more = report["error_count"] - len(report["errors"])
+            st.warning(f"Skipped {report['error_count']} invalid rows:\n{skipped}" + (f"\n- ...and {more} more" if more else ""))
+
+    diagram_slot = None
     if st.session_state.data_flows or st.session_state.trust_boundaries:
         st.subheader("Generated Data Flow Diagram")
-        diagram = generate_diagram()
-        st.image(f"data:image/png;base64,{diagram}", caption="Generated Data Flow Diagram with Trust Boundaries")
+        generate_diagram()
+        diagram_slot = st.empty()
+        diagram_slot.info("Rendering diagram...")
 
     if st.button("Analyze Threats"):
         if st.session_state.data_flows or st.session_state.trust_boundaries:
@@ -398,34 +230,199 @@ def step_2():
         else:
             st.session_state.error = "Please add at least one data flow or trust boundary."
 
+    if diagram_slot is not None:
+        show_diagram(diagram_slot, "Generated Data Flow Diagram with Trust Boundaries")
+
+def filter_threats(threats):
+    """Show the threat filters and return the threats they select, indexing each analysis result once."""
+    index = st.session_state.threat_index
+    if index is None or index.threats is not threats:
+        with metrics.stage("threat_index", rerun_timings):
+            index = st.session_state.threat_index = ThreatIndex(threats)
+    stride_column, element_column, reference_column = st.columns(3)
+    strides = stride_column.multiselect("STRIDE category", list(index.strides()), key="filter_stride")
+    elements = ()
+    if index.elements():
+        elements = element_column.multiselect("DFD element", list(index.elements()), key="filter_element")
+    references = reference_column.multiselect("OWASP ASVS/SAMM reference", list(index.references()), key="filter_reference")
+    text = st.text_input("Search threats", key="filter_text")
+    # Paging through results reruns with the same filters, so keep their result
+    key = (tuple(strides), tuple(elements), tuple(references), text)
+    cached = st.session_state.threat_filter
+    if cached is None or cached[0] is not index or cached[1] != key:
+        with metrics.stage("threat_filter", rerun_timings):
+            cached = st.session_state.threat_filter = (index, key, index.filter(strides, elements, references, text))
+    selected = cached[2]
+    st.caption(f"Showing {len(selected)} of {len(index)} threats")
+    return selected
+
+def show_risk(threats):
+    """Show the highest-risk threats and a DFD element x STRIDE heatmap of the highest risk per cell."""
+    scores = st.session_state.risk_scores
+    if scores is None or scores.threats is not threats:
+        with metrics.stage("risk_scores", rerun_timings):
+            scores = st.session_state.risk_scores = score_threats(
+                threats, st.session_state.data_flows, st.session_state.trust_boundaries
+            )
+    st.subheader("Risk")
+    st.caption(", ".join(f"{level}: {count}" for level, count in scores.level_counts().items()))
+    with metrics.stage("risk_views", rerun_timings):
+        top = scores.top(10)
+        elements, strides, matrix = scores.heatmap()
+    st.markdown("**Highest risks**")
+    st.dataframe(
+        {
+            "Risk": [int(scores.risk[p]) for p in top],
+            "Level": [risk_level(scores.risk[p]) for p in top],
+            "Threat": [threat_title(threats[p]) for p in top],
+            "STRIDE": [threats[p]["stride"] for p in top],
+            "DFD Element": [scores.elements[scores.element_codes[p]] for p in top],
+            "Likelihood": [int(scores.likelihood[p]) for p in top],
+            "Impact": [int(scores.impact[p]) for p in top],
+        },
+        hide_index=True,
+    )
+    if elements:
+        st.markdown(f"**Risk heatmap** (top {len(elements)} DFD elements)")
+        st.dataframe(pd.DataFrame(matrix, index=elements, columns=strides).style.map(risk_color))
+
+def results_page(total):
+    """Show a page picker when total threats need several pages and return the (start, stop) of the current page."""
+    start, stop, pages = page_bounds(total, st.session_state.get("threat_page", 1))
+    if pages > 1:
+        # Clamp the page before the widget is created, as filtering may have removed pages
+        st.session_state.threat_page = start // PAGE_SIZE + 1
+        st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="threat_page")
+        st.caption(f"Threats {start + 1}-{stop} of {total}")
+    return start, stop
+
+def export_report(threats):
+    """Write a downloadable report of the threat model in the background, showing its progress."""
+    st.subheader("Export Report")
+    formats = {label: fmt for fmt, (label, _) in REPORT_FORMATS.items()}
+    fmt = formats[st.selectbox("Report format", list(formats), key="report_format")]
+    if st.button("Generate Report"):
+        if st.session_state.report_job is not None:
+            st.session_state.report_job.cancel()
+        try:
+            st.session_state.report_job = report_queue.submit(
+                fmt, "Threat Model Report", st.session_state.text_input, threats,
+                st.session_state.data_flows, st.session_state.trust_boundaries,
+                st.session_state.diagram_job, DIAGRAM_FORMAT,
+            )
+        except ReportQueueBusy as e:
+            st.session_state.report_job = None
+            st.warning(str(e))
+    job = st.session_state.report_job
+    if job is None:
+        return
+    slot = st.empty()
+    with metrics.stage("report_wait", rerun_timings):
+        while not job.done():
+            # Updating the placeholder lets Streamlit stop this run as soon as the user does something else
+            slot.progress(job.progress(), text=f"Writing {job.filename}: {job.written} of {job.total} threats")
+            wait([job.future], timeout=0.25)
+    if job.future.cancelled():
+        slot.empty()
+    elif job.future.exception() is not None:
+        slot.error(f"Cannot write report: {job.future.exception()}")
+    else:
+        try:
+            with open(job.path, "rb") as f:
+                slot.download_button("Download Report", f, file_name=job.filename, mime=job.mime)
+        except OSError:
+            slot.warning("The report file is no longer available. Please generate it again.")
+
 def step_3():
     st.header("Step 3: Threat Model Results")
     if st.session_state.threat_model:
+        show_risk(st.session_state.threat_model["threats"])
         st.subheader("Identified Threats")
-        for threat in st.session_state.threat_model["threats"]:
-            st.markdown(f"**{threat['type']}** (STRIDE: {threat['stride']})")
-            st.markdown(f"- **Description**: {threat['description']}")
-            st.markdown(f"- **Mitigation**: {threat['mitigation']}")
-            if "controls" in threat:
-                st.markdown(f"- **Security Controls**: {threat['controls']}")
-            st.markdown(f"- **OWASP ASVS**: {threat['asvs']}")
-            st.markdown(f"- **OWASP SAMM**: {threat['samm']}")
-            st.markdown("---")
-    if st.session_state.generated_diagram:
+        threats = filter_threats(st.session_state.threat_model["threats"])
+        start, stop = results_page(len(threats))
+        with metrics.stage("step_3_widgets", rerun_timings):
+            # One markdown element per page, however many threats there are
+            if threats:
+                st.markdown(threats_markdown(threats[start:stop]))
+    diagram_slot = None
+    if st.session_state.diagram_job is not None:
         st.subheader("Generated Data Flow Diagram")
-        st.image(f"data:image/png;base64,{st.session_state.generated_diagram}", caption="Data Flow Diagram with Trust Boundaries")
+        diagram_slot = st.empty()
+        diagram_slot.info("Rendering diagram...")
     if st.button("Start Over"):
-        st.session_state.step = 1
-        st.session_state.text_input = ""
-        st.session_state.diagram = None
-        st.session_state.data_flows = []
-        st.session_state.trust_boundaries = []
-        st.session_state.threat_model = None
-        st.session_state.error = ""
-        st.session_state.generated_diagram = None
+        reset_session(st.session_state)
         st.rerun()
     if st.session_state.error:
         st.error(st.session_state.error)
+    if diagram_slot is not None:
+        show_diagram(diagram_slot, "Data Flow Diagram with Trust Boundaries")
+    if st.session_state.threat_model:
+        export_report(st.session_state.threat_model["threats"])
+
+def show_metrics():
+    """Show this rerun's stage timings, the session's totals and cache hit rates in the sidebar."""
+    rerun_timings["rerun"] = time.perf_counter() - rerun_started
+    metrics.observe("rerun", rerun_timings["rerun"])
+    totals = add_to_totals(st.session_state.metrics_totals, rerun_timings)
+    with st.sidebar.expander("Performance", expanded=True):
+        st.markdown("**This rerun**")
+        for name, seconds in sorted(rerun_timings.items(), key=lambda item: -item[1]):
+            st.text(f"{name:<14} {seconds * 1000:9.1f} ms")
+        st.markdown("**This session**")
+        for name, (count, seconds) in sorted(totals.items()):
+            st.text(f"{name:<14} {count:>4}x {seconds / count * 1000:9.1f} ms avg")
+        st.markdown("**Caches**")
+        for name, (hits, misses, rate) in metrics.cache_stats().items():
+            st.text(f"{name:<14} {hits} hits, {misses} misses" + (f" ({rate:.0%})" if rate is not None else ""))
+    metrics.maybe_write()
+
+def list_saved_models():
+    """Read the names of the most recently saved models into the session."""
+    try:
+        st.session_state.saved_models = [row[0] for row in model_store.list_models(100)]
+    except sqlite3.Error as e:
+        st.error(f"Cannot read saved models: {e}")
+
+def show_saved_models():
+    """Save the current model to, or load one from, the local model database in the sidebar."""
+    # The database is only opened when the user saves, lists or loads a model, not on every rerun
+    with st.sidebar.expander("Saved Models"):
+        name = st.text_input("Model name", key="model_name")
+        if st.button("Save Model"):
+            if name:
+                model = {
+                    "text_input": st.session_state.text_input,
+                    "data_flows": st.session_state.data_flows,
+                    "trust_boundaries": st.session_state.trust_boundaries,
+                }
+                try:
+                    version = model_store.save_model(name, model, analyze_threats()["threats"], "generic")
+                    st.success(f"Saved {name} (version {version})")
+                    if st.session_state.saved_models is not None:
+                        list_saved_models()
+                except sqlite3.Error as e:
+                    st.error(f"Cannot save model: {e}")
+            else:
+                st.warning("Please enter a model name.")
+        listed = st.session_state.saved_models is not None
+        if st.button("Refresh Saved Models" if listed else "Show Saved Models", key="list_models"):
+            list_saved_models()
+        saved = st.session_state.saved_models
+        if saved == []:
+            st.caption("No saved models yet.")
+        elif saved:
+            selected = st.selectbox("Saved model", saved, key="saved_model")
+            if st.button("Load Model"):
+                try:
+                    model = model_store.load_model(selected)
+                except (StoreError, sqlite3.Error) as e:
+                    st.error(f"Cannot load model: {e}")
+                else:
+                    reset_session(st.session_state, model)
+                    st.session_state.step = 2
+                    st.rerun()
+
+show_saved_models()
 
 # Render the current step
 if st.session_state.step == 1:
@@ -434,3 +431,6 @@ elif st.session_state.step == 2:
     step_2()
 elif st.session_state.step == 3:
     step_3()
+
+if metrics.enabled:
+    show_metrics()
@@ -0,0 +1 @@
+"""Benchmarks for the threat modeling pipeline; see benchmarks/run.py."""
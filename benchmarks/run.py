@@ -0,0 +1,187 @@
+"""Benchmark threat analysis and diagram generation on synthetic models.
+
+Usage::
+
+    python -m benchmarks.run [--sizes 10x1,1000x50,100000x1000]
+        [--ruleset generic|ecommerce|all] [--repeat N] [--description-words N]
+        [--no-render] [--render-max-flows N] [--output results.json]
+        [--compare baseline.json]
+
+Each size is FLOWSxBOUNDARIES. For every size and rule set (``generic`` is
+app.py, ``ecommerce`` is threat_modeling_app.py) the stages below are timed
+without the Streamlit UI, and the peak Python heap of one extra run is
+measured with tracemalloc:
+
+- ``analyze``: the full rule engine over the model
+- ``sync``: ``IncrementalModel.sync`` of the whole model, as on an app's
+  first analysis (threats include the attack path search)
+- ``sync_append``: ``IncrementalModel.sync`` after one flow is appended,
+  which is what the apps run when a flow is added
+- ``build_diagram``: DOT construction, including layout engine selection
+- ``render``: the Graphviz subprocess (skipped with --no-render, when the
+  ``dot`` binary is missing, or above --render-max-flows)
+- ``ascii``: the layered text diagram used when Graphviz is missing
+
+Results are written as JSON so runs from different versions can be diffed;
+--compare prints the speedup of each stage against an earlier results file.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_model
+from threatmodel.ascii_diagram import ascii_diagram
+from threatmodel.batch import RULESETS
+from threatmodel.incremental import IncrementalModel
+from threatmodel.partition import apply_engine, choose_engine, dfd_nodes
+from threatmodel.render import GraphvizNotFound, render_dot
+
+DEFAULT_SIZES = "10x1,100x10,1000x50,10000x200,100000x1000"
+
+
+def parse_sizes(text):
+    """Parse "FLOWSxBOUNDARIES,..." into a list of (flows, boundaries) pairs."""
+    sizes = []
+    for item in text.split(","):
+        flows, _, boundaries = item.strip().lower().partition("x")
+        sizes.append((int(flows), int(boundaries or 1)))
+    return sizes
+
+
+def measure(fn, repeat):
+    """Time fn repeat times, then record its peak traced memory on one more run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"min_s": min(times), "median_s": statistics.median(times), "peak_bytes": peak}
+
+
+def bench_model(model, ruleset, repeat=3, render=True):
+    """Return {stage: measurement} for one model and rule set."""
+    iter_threats, build_diagram = RULESETS[ruleset]
+    args = (model["text_input"], model["data_flows"], model["trust_boundaries"])
+    results = {}
+
+    results["analyze"] = measure(lambda: list(iter_threats(*args)), repeat)
+    results["sync"] = measure(lambda: IncrementalModel(ruleset).sync(*args).result(), repeat)
+
+    # Every timed run appends one more flow to the same synced model
+    flows = list(model["data_flows"])
+    incremental = IncrementalModel(ruleset).sync(model["text_input"], flows, model["trust_boundaries"])
+    incremental.result()
+    added = {"source": "Benchmark Client", "destination": flows[0]["destination"] if flows else "Benchmark Database", "dataType": "PII"}
+
+    def sync_append():
+        flows.append(added)
+        return incremental.sync(model["text_input"], flows, model["trust_boundaries"]).result()
+
+    results["sync_append"] = measure(sync_append, repeat)
+
+    threats = list(iter_threats(*args))
+    engine = choose_engine(len(dfd_nodes(model["data_flows"])))
+    results["build_diagram"] = measure(lambda: apply_engine(build_diagram(model, threats), engine).source, repeat)
+    results["build_diagram"]["engine"] = engine
+
+    if render:
+        source = apply_engine(build_diagram(model, threats), engine).source
+        try:
+            results["render"] = measure(lambda: render_dot(source, "svg", engine), repeat)
+            results["render"]["engine"] = engine
+        except GraphvizNotFound:
+            results["render"] = {"skipped": "Graphviz executable not found"}
+
+    results["ascii"] = measure(lambda: ascii_diagram(model["data_flows"], model["trust_boundaries"], threats), repeat)
+    return results
+
+
+def git_revision():
+    """Return the current git commit, or None outside a checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, rulesets, repeat=3, description_words=200, render=True, render_max_flows=2000, seed=0, log=sys.stderr):
+    """Benchmark every size and rule set and return the results document."""
+    results = []
+    for flows, boundaries in sizes:
+        model = synthetic_model(flows, boundaries, description_words, seed)
+        for ruleset in rulesets:
+            stages = bench_model(model, ruleset, repeat, render and flows <= render_max_flows)
+            for stage, measurement in stages.items():
+                results.append({"ruleset": ruleset, "flows": flows, "boundaries": boundaries, "stage": stage, **measurement})
+                if "min_s" in measurement:
+                    print(f"{ruleset:<9} {flows:>7} flows {boundaries:>5} boundaries  {stage:<14} "
+                          f"{measurement['min_s'] * 1000:>10.2f} ms  {measurement['peak_bytes'] / 1024:>10.0f} KiB", file=log)
+                else:
+                    print(f"{ruleset:<9} {flows:>7} flows {boundaries:>5} boundaries  {stage:<14} {measurement['skipped']}", file=log)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "revision": git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": repeat,
+            "description_words": description_words,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, log=sys.stderr):
+    """Print each stage's speedup of current over baseline (>1 means faster now)."""
+    def index(document):
+        return {(r["ruleset"], r["flows"], r["boundaries"], r["stage"]): r for r in document["results"] if "min_s" in r}
+
+    old = index(baseline)
+    for key, result in index(current).items():
+        if key in old and result["min_s"] > 0:
+            print(f"{key[0]:<9} {key[1]:>7} flows {key[2]:>5} boundaries  {key[3]:<14} "
+                  f"{old[key]['min_s'] / result['min_s']:>6.2f}x", file=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Benchmark the threat modeling pipeline on synthetic models.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated FLOWSxBOUNDARIES (default: {DEFAULT_SIZES})")
+    parser.add_argument("--ruleset", choices=sorted(RULESETS) + ["all"], default="all", help="rules to benchmark (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (default: 3)")
+    parser.add_argument("--description-words", type=int, default=200, help="length of the synthetic system description")
+    parser.add_argument("--no-render", action="store_true", help="only build DOT sources; do not run Graphviz")
+    parser.add_argument("--render-max-flows", type=int, default=2000, help="skip rendering for larger models (default: 2000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic models")
+    parser.add_argument("--output", "-o", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    rulesets = sorted(RULESETS) if args.ruleset == "all" else [args.ruleset]
+    document = run(parse_sizes(args.sizes), rulesets, args.repeat, args.description_words,
+                   not args.no_render, args.render_max_flows, args.seed)
+    if args.output == "-":
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(document, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Deterministic synthetic threat models of any size."""
+import random
+
+# Component kinds chosen so the STRIDE rules of both apps have something to match
+COMPONENT_KINDS = (
+    "User Client", "Frontend", "Backend", "API Gateway", "Web Server", "Database",
+    "Payment Gateway", "Auth Service", "Message Queue", "Cache", "Storage Bucket", "Third Party Service",
+)
+DATA_TYPES = (
+    "PII", "Credentials", "Payment Details", "Session Token", "User Data, Orders",
+    "Logs", "Health Records", "Configuration", "Telemetry",
+)
+BOUNDARY_KINDS = ("Internet", "DMZ", "Backend", "Database", "Payment Gateway", "Cloud", "Partner", "Internal")
+FILLER_WORDS = (
+    "the", "system", "serves", "requests", "from", "users", "and", "stores", "records", "behind",
+    "a", "load", "balancer", "with", "replicas", "in", "several", "regions", "for", "availability",
+)
+DESCRIPTION_KEYWORDS = (
+    "public-facing", "web", "api", "database", "login", "authentication", "aws", "cloud",
+    "third-party", "payment", "stripe", "react", "node.js", "mysql", "pii",
+)
+
+
+def synthetic_model(flows=100, boundaries=5, description_words=200, seed=0):
+    """Return a model dict with the given number of flows and boundaries.
+
+    Node count grows with flow count (about two flows per node), every
+    boundary description mentions a random slice of the nodes, and the
+    system description is description_words long.
+    """
+    rng = random.Random(seed)
+    node_count = max(2, flows // 2)
+    nodes = [f"{COMPONENT_KINDS[i % len(COMPONENT_KINDS)]} {i}" for i in range(node_count)]
+
+    data_flows = []
+    for _ in range(flows):
+        source, destination = rng.sample(nodes, 2)
+        data_flows.append({"source": source, "destination": destination, "dataType": rng.choice(DATA_TYPES)})
+
+    trust_boundaries = []
+    members_per_boundary = max(1, min(50, node_count // max(1, boundaries)))
+    for i in range(boundaries):
+        members = rng.sample(nodes, min(members_per_boundary, node_count))
+        filler = " ".join(rng.choice(FILLER_WORDS) for _ in range(20))
+        trust_boundaries.append({
+            "name": f"{BOUNDARY_KINDS[i % len(BOUNDARY_KINDS)]} Boundary {i}",
+            "description": f"Contains {', '.join(members)}; {filler}",
+        })
+
+    words = [rng.choice(DESCRIPTION_KEYWORDS if rng.random() < 0.2 else FILLER_WORDS) for _ in range(description_words)]
+    return {"text_input": " ".join(words), "data_flows": data_flows, "trust_boundaries": trust_boundaries}
@@ -1,39 +1,40 @@
 import streamlit as st
-import base64
-import re
-from graphviz import Digraph, ExecutableNotFound
+import pandas as pd
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import CancelledError, wait
+from threatmodel.ascii_diagram import ascii_diagram
+from threatmodel.blob_store import BlobTooLarge, blob_store
+from threatmodel.bulk_import import bulk_import
+from threatmodel.defaults import ECOMMERCE_MODEL
+from threatmodel.diagram import build_ecommerce_diagram
+from threatmodel.metrics import add_to_totals, metrics
+from threatmodel.model_io import ModelError
+from threatmodel.partition import build_view, diagram_views
+from threatmodel.render import DIAGRAM_FORMAT, GraphvizNotFound, image_source
+from threatmodel.render_pool import RenderPoolBusy, render_pool
+from threatmodel.report import REPORT_FORMATS
+from threatmodel.report_jobs import ReportQueueBusy, report_queue
+from threatmodel.results import PAGE_SIZE, element_runs, page_bounds, threat_title, threats_markdown
+from threatmodel.risk import risk_color, risk_level, score_threats
+from threatmodel.session import init_session, reset_session
+from threatmodel.store import StoreError, model_store
+from threatmodel.threat_index import ThreatIndex
+from threatmodel.warm_start import default_analysis, warm_default_model
 
 # Streamlit app configuration
 st.set_page_config(page_title="Threat Modeling 101", page_icon="🔒", layout="wide")
 
 # Initialize session state
-if 'step' not in st.session_state:
-    st.session_state.step = 1
-if 'text_input' not in st.session_state:
-    st.session_state.text_input = (
-        "E-commerce web app with a React frontend, Node.js backend API, MySQL database, and Stripe payment gateway. "
-        "The app is public-facing, handles user authentication, and processes sensitive data like PII and payment details."
-    )
-if 'diagram' not in st.session_state:
-    st.session_state.diagram = None
-if 'data_flows' not in st.session_state:
-    st.session_state.data_flows = [
-        {"source": "Frontend", "destination": "Backend", "dataType": "User Input (PII, Credentials)"},
-        {"source": "Backend", "destination": "Database", "dataType": "User Data, Orders"},
-        {"source": "Backend", "destination": "Payment Gateway", "dataType": "Payment Details"}
-    ]
-if 'trust_boundaries' not in st.session_state:
-    st.session_state.trust_boundaries = [
-        {"name": "Frontend Boundary", "description": "Untrusted client-side React app running on user devices"},
-        {"name": "Backend Boundary", "description": "Trusted server-side Node.js API and MySQL database"},
-        {"name": "Payment Gateway Boundary", "description": "External third-party Stripe service"}
-    ]
-if 'threat_model' not in st.session_state:
-    st.session_state.threat_model = None
-if 'error' not in st.session_state:
-    st.session_state.error = ""
-if 'generated_diagram' not in st.session_state:
-    st.session_state.generated_diagram = None
+init_session(st.session_state, ECOMMERCE_MODEL)
+
+# Analyze and pre-render the default model once per process, while new visitors read step 1
+warm_default_model()
+
+# Stage timings of this rerun, shown in the sidebar when THREATMODEL_METRICS is set
+rerun_started = time.perf_counter()
+rerun_timings = {}
 
 # Title and introduction
 st.title("Threat Modeling 101: E-commerce Example with Enhanced DFD")
@@ -67,295 +68,83 @@ Each threat is assigned a unique ID (e.g., T1, T2) and mapped to DFD elements (c
 """)
 
 def generate_diagram(threats):
-    """Generate a refined DFD with numbered threat IDs using Graphviz."""
+    """Build a refined DFD with numbered threat IDs and highlighted attack paths and submit it for rendering."""
     try:
-        dot = Digraph(comment="Data Flow Diagram", format="png")
-        dot.attr(rankdir="TB", size="10,8", fontname="Arial", bgcolor="white", splines="polyline")
-        dot.attr("node", fontname="Arial", fontsize="12")
-        dot.attr("edge", fontname="Arial", fontsize="10")
-
-        # Define node styles based on component type
-        node_styles = {
-            "Frontend": {"shape": "oval", "style": "filled", "fillcolor": "lightcoral", "color": "red"},
-            "Backend": {"shape": "box", "style": "filled", "fillcolor": "lightblue", "color": "blue"},
-            "Database": {"shape": "cylinder", "style": "filled", "fillcolor": "lightblue", "color": "blue"},
-            "Payment Gateway": {"shape": "oval", "style": "filled", "fillcolor": "lightgreen", "color": "green"}
-        }
-
-        # Add nodes for data flow sources and destinations
-        nodes = set()
-        for flow in st.session_state.data_flows:
-            nodes.add(flow["source"])
-            nodes.add(flow["destination"])
-        
-        # Map threats to nodes and edges
-        node_threats = {}
-        edge_threats = {}
-        for threat in threats:
-            dfd_element = threat.get("dfd_element", "")
-            threat_id = threat.get("id", "")
-            if "→" in dfd_element:
-                edge_threats.setdefault(dfd_element, []).append(f"{threat_id}: {threat['type']}")
+        views = diagram_views(st.session_state.data_flows, st.session_state.trust_boundaries)
+        # Large model: only the view the user picks is rendered
+        view = st.selectbox("Diagram view", list(views), key="diagram_view") if views else None
+        with metrics.stage("dot_build", rerun_timings):
+            if views:
+                paths = st.session_state.analysis.attack_paths()
+                dot, engine = build_view(lambda flows, boundaries: build_ecommerce_diagram(flows, boundaries, threats, paths), st.session_state.data_flows, st.session_state.trust_boundaries, views, view)
             else:
-                node_threats.setdefault(dfd_element, []).append(f"{threat_id}: {threat['type']}")
-
-        # Add nodes with refined styles and threat IDs
-        for node in nodes:
-            threat_label = node_threats.get(node, [])
-            label = f"{node}\nThreats: {', '.join(threat_label) if threat_label else 'None'}"
-            style = node_styles.get(node, {"shape": "box", "style": "filled", "fillcolor": "white", "color": "black"})
-            dot.node(node, label, **style, penwidth="2" if threat_label else "1")
-
-        # Add data flow edges with threat IDs
-        for flow in st.session_state.data_flows:
-            edge_key = f"{flow['source']} → {flow['destination']}"
-            threat_label = edge_threats.get(edge_key, [])
-            label = f"{flow['dataType']}\nThreats: {', '.join(threat_label) if threat_label else 'None'}"
-            dot.edge(flow["source"], flow["destination"], label=label, color="red" if threat_label else "black", penwidth="2" if threat_label else "1")
-
-        # Add trust boundaries as subgraphs
-        for boundary in st.session_state.trust_boundaries:
-            with dot.subgraph(name=f"cluster_{boundary['name']}") as c:
-                c.attr(label=f"{boundary['name']}\nThreats: {', '.join(node_threats.get(boundary['name'], []) or ['None'])}", 
-                       style="dashed", color="purple", fontname="Arial", fontsize="12", penwidth="2")
-                components = re.findall(r"\b\w+\b", boundary["description"].lower())
-                for node in nodes:
-                    if node.lower() in components or node.lower() in boundary["name"].lower():
-                        c.node(node)
-
-        # Render diagram to file and encode as base64
-        diagram_path = dot.render("diagram", format="png", cleanup=True)
-        with open(diagram_path, "rb") as f:
-            st.session_state.generated_diagram = base64.b64encode(f.read()).decode("utf-8")
-        return st.session_state.generated_diagram
-    except ExecutableNotFound:
-        st.session_state.error = "Graphviz executable not found. Falling back to ASCII diagram with numbered threat IDs."
-        return None
+                # Patched in place as flows and boundaries are added
+                dot, engine = st.session_state.analysis.layout()
+
+        # Render in the background pool (or reuse an identical earlier render)
+        st.session_state.diagram_job = render_pool.resubmit(st.session_state.diagram_job, dot.source, DIAGRAM_FORMAT, engine)
+        st.session_state.diagram_error = ""
+    except RenderPoolBusy as e:
+        st.session_state.diagram_job = None
+        st.session_state.diagram_error = str(e)
     except Exception as e:
-        st.session_state.error = f"Failed to generate diagram: {str(e)}"
-        return None
-
-def fallback_ascii_diagram(threats):
-    """Generate a refined ASCII diagram with numbered threat IDs and a legend table."""
-    # Map threats to DFD elements
-    edge_threats = {}
-    node_threats = {}
-    threat_details = {}
-    for threat in threats:
-        dfd_element = threat.get("dfd_element", "")
-        threat_id = threat.get("id", "")
-        threat_details[threat_id] = f"{threat['type']}: {threat['description']}"
-        if "→" in dfd_element:
-            edge_threats.setdefault(dfd_element, []).append(f"{threat_id}: {threat['type']}")
+        st.session_state.diagram_job = None
+        st.session_state.diagram_error = f"Failed to generate diagram: {str(e)}"
+    return st.session_state.diagram_job
+
+def show_diagram(slot, threats):
+    """Wait for this session's render job and fill the placeholder, falling back to ASCII on failure."""
+    job = st.session_state.diagram_job
+    if job is not None:
+        started = time.monotonic()
+        with metrics.stage("render_wait", rerun_timings):
+            while not job.done():
+                # Updating the placeholder lets Streamlit stop this run as soon as the model changes again
+                slot.info(f"Rendering diagram... ({time.monotonic() - started:.1f}s)")
+                wait([job], timeout=0.25)
+        try:
+            st.session_state.generated_diagram = job.result()
+        except CancelledError:
+            return
+        except GraphvizNotFound:
+            st.session_state.generated_diagram = None
+            st.session_state.diagram_error = "Graphviz executable not found. Falling back to ASCII diagram with numbered threat IDs."
+        except Exception as e:
+            st.session_state.generated_diagram = None
+            st.session_state.diagram_error = f"Failed to generate diagram: {str(e)}"
         else:
-            node_threats.setdefault(dfd_element, []).append(f"{threat_id}: {threat['type']}")
-
-    # Compact ASCII diagram
-    diagram = """
-    +----------------+         +----------------+         +----------------+
-    |    Frontend    |<------->|    Backend     |<------->|    Database    |
-    |   (React App)  |         |   (Node.js)    |         |    (MySQL)     |
-    |   [Untrusted]  |         |   [Trusted]    |         |   [Trusted]    |
-    | Threats: {frontend_threats} | Threats: {backend_threats} | Threats: {database_threats} |
-    +----------------+         +----------------+         +----------------+
-            |                          |
-            |                          v
-            |                   +----------------+
-            |                   | Payment Gateway |
-            |                   |   (Stripe)     |
-            |                   | [External Trust]|
-            |                   | Threats: {payment_threats} |
-            |                   +----------------+
-    ---- Trust Boundary ----
-
-    Data Flow Threats:
-      Frontend → Backend: {frontend_backend_threats}
-      Backend → Database: {backend_database_threats}
-      Backend → Payment Gateway: {backend_payment_threats}
-    """
-
-    # Generate threat legend table
-    legend = "\nThreat Legend:\n"
-    legend += "+-------+--------------------------+\n"
-    legend += "| ID    | Threat Description       |\n"
-    legend += "+-------+--------------------------+\n"
-    for threat_id, description in sorted(threat_details.items()):
-        legend += f"| {threat_id:<5} | {description:<24} |\n"
-    legend += "+-------+--------------------------+\n"
-
-    return diagram.format(
-        frontend_threats=", ".join(node_threats.get("Frontend", ["None"])),
-        backend_threats=", ".join(node_threats.get("Backend", ["None"])),
-        database_threats=", ".join(node_threats.get("Database", ["None"])),
-        payment_threats=", ".join(node_threats.get("Payment Gateway", ["None"])),
-        frontend_backend_threats=", ".join(edge_threats.get("Frontend → Backend", ["None"])),
-        backend_database_threats=", ".join(edge_threats.get("Backend → Database", ["None"])),
-        backend_payment_threats=", ".join(edge_threats.get("Backend → Payment Gateway", ["None"]))
-    ) + legend
+            slot.image(image_source(st.session_state.generated_diagram), caption="Refined Data Flow Diagram with Numbered Threat IDs", width=800)
+            return
+    with slot.container():
+        st.markdown("**Refined ASCII Diagram with Numbered Threat IDs**:")
+        st.code(ascii_diagram(st.session_state.data_flows, st.session_state.trust_boundaries, threats), language="text")
+        if st.session_state.diagram_error:
+            st.warning(st.session_state.diagram_error)
 
 def analyze_threats():
-    """Perform STRIDE-based threat analysis with numbered threat IDs."""
-    threats = []
-    threat_counter = 1
-
-    def add_threat(threat_type, description, stride, mitigation, asvs, samm, dfd_element, controls=None):
-        nonlocal threat_counter
-        threat = {
-            "id": f"T{threat_counter}",
-            "type": threat_type,
-            "description": description,
-            "stride": stride,
-            "mitigation": mitigation,
-            "asvs": asvs,
-            "samm": samm,
-            "dfd_element": dfd_element
-        }
-        if controls:
-            threat["controls"] = controls
-        threats.append(threat)
-        threat_counter += 1
-
-    # Predefined e-commerce threats
-    add_threat(
-        "Spoofing",
-        "Hackers impersonate users by stealing credentials.",
-        "Spoofing",
-        "Implement multi-factor authentication and secure session management.",
-        "V2.1.1 - Verify strong authentication; V2.7.1 - Verify session management.",
-        "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Define policies.",
-        "Frontend → Backend",
-        controls="Use MFA (e.g., TOTP) and HTTP-only, Secure cookies."
-    )
-    add_threat(
-        "Tampering",
-        "Users modify cart data (e.g., price).",
-        "Tampering",
-        "Validate inputs server-side and use signed tokens for integrity.",
-        "V5.1.3 - Verify input validation; V5.3.4 - Verify secure queries.",
-        "Secure Architecture Level 1 - Define security requirements; Design Level 2 - Integrity controls.",
-        "Frontend → Backend",
-        controls="Use HMAC-SHA256 for data integrity and whitelist input validation."
-    )
-    add_threat(
-        "Repudiation",
-        "Users deny placing orders due to missing logs.",
-        "Repudiation",
-        "Log all user actions with timestamps and IDs.",
-        "V7.1.1 - Verify logging controls; V7.2.1 - Verify log integrity.",
-        "Security Operations Level 2 - Enable audit logging; Incident Management Level 2 - Monitor logs.",
-        "Backend → Database",
-        controls="Use AWS CloudTrail for logging and ensure log integrity."
-    )
-    add_threat(
-        "Information Disclosure",
-        "Sensitive data exposed in transit or storage.",
-        "Information Disclosure",
-        "Use HTTPS and encrypt sensitive database fields.",
-        "V9.1.1 - Verify secure communication; V4.1.3 - Verify access controls.",
-        "Implementation Level 2 - Secure data handling; Operations Level 2 - Protect data.",
-        "Backend → Database",
-        controls="Enable TLS 1.3 and use AES-256 for database encryption."
-    )
-    add_threat(
-        "Information Disclosure",
-        "Payment details exposed in transit to third-party service.",
-        "Information Disclosure",
-        "Use HTTPS and secure API tokens for third-party communication.",
-        "V9.1.1 - Verify secure communication; V13.2.1 - Verify API security.",
-        "Implementation Level 2 - Secure data handling; Operations Level 2 - Protect data.",
-        "Backend → Payment Gateway",
-        controls="Use TLS 1.3 and OAuth 2.0 for Stripe API."
-    )
-    add_threat(
-        "Denial of Service",
-        "Flooding disrupts availability.",
-        "Denial of Service",
-        "Implement rate limiting and use a CDN for traffic spikes.",
-        "V1.10.1 - Verify anti-DoS controls; V13.1.1 - Verify API resilience.",
-        "Incident Management Level 2 - Monitor for DoS; Operations Level 2 - Ensure availability.",
-        "Frontend → Backend",
-        controls="Configure rate limiting (100 requests/min) and use AWS CloudFront."
-    )
-    add_threat(
-        "Elevation of Privilege",
-        "Weak role-based access controls allow privilege escalation.",
-        "Elevation of Privilege",
-        "Enforce strict RBAC and validate roles server-side.",
-        "V4.2.1 - Verify RBAC; V4.2.2 - Verify segregation of duties.",
-        "Secure Architecture Level 2 - Implement RBAC; Governance Level 2 - Audit permissions.",
-        "Backend",
-        controls="Use AWS IAM roles with least privilege."
-    )
-
-    # Analyze user-defined data flows
-    for flow in st.session_state.data_flows:
-        data_type = flow.get('dataType', '').lower()
-        source = flow.get('source', '').lower()
-        destination = flow.get('destination', '').lower()
-        edge_key = f"{flow['source']} → {flow['destination']}"
-
-        if 'user' in source or 'client' in source:
-            add_threat(
-                "Spoofing",
-                f"Unauthorized access in flow from {source} to {destination}.",
-                "Spoofing",
-                "Validate source identity with OAuth 2.0 or JWT.",
-                "V2.1.2 - Verify identity validation; V2.7.3 - Verify session binding.",
-                "Threat Assessment Level 1 - Identify risks; Governance Level 2 - Enforce policies.",
-                edge_key,
-                controls="Use OAuth 2.0 with PKCE and RS256 JWT signing."
-            )
-        add_threat(
-            "Tampering",
-            f"Data integrity risk in flow from {source} to {destination}.",
-            "Tampering",
-            "Use digital signatures and validate inputs at destination.",
-            "V5.1.4 - Verify data integrity; V5.2.2 - Verify input sanitization.",
-            "Design Level 2 - Integrity controls; Verification Level 1 - Validate inputs.",
-            edge_key,
-            controls="Apply HMAC-SHA256 and schema-based validation."
-        )
-        if 'pii' in data_type or 'sensitive' in data_type:
-            add_threat(
-                "Information Disclosure",
-                f"Sensitive data ({data_type}) exposed in flow from {source} to {destination}.",
-                "Information Disclosure",
-                "Encrypt data with TLS 1.3 and mask sensitive data in logs.",
-                "V9.1.2 - Verify encryption; V4.1.4 - Verify access restrictions.",
-                "Implementation Level 2 - Secure data; Operations Level 2 - Protect data.",
-                edge_key,
-                controls="Use TLS 1.3 and data masking for logs."
-            )
-
-    # Analyze trust boundaries
-    for boundary in st.session_state.trust_boundaries:
-        name = boundary.get('name', '').lower()
-        description = boundary.get('description', '').lower()
-
-        if 'boundary' in name or 'frontend' in name:
-            add_threat(
-                "Spoofing",
-                f"Cross-boundary spoofing in {name}.",
-                "Spoofing",
-                "Enforce mutual TLS and validate cross-boundary requests.",
-                "V2.1.3 - Verify boundary authentication; V13.2.1 - Verify API security.",
-                "Threat Assessment Level 2 - Model boundary risks; Governance Level 2 - Define policies.",
-                boundary["name"],
-                controls="Use mutual TLS with client certificates."
-            )
-        if 'database' in name or 'backend' in name:
-            add_threat(
-                "Tampering",
-                f"Data tampering within {name} due to weak controls.",
-                "Tampering",
-                "Use integrity checks and secure coding practices.",
-                "V5.1.3 - Verify input validation; V5.3.5 - Verify secure coding.",
-                "Design Level 2 - Integrity controls; Verification Level 2 - Validate controls.",
-                boundary["name"],
-                controls="Apply SHA-256 checksums and OWASP guidelines."
-            )
-
-    return {"threats": threats}
+    """Perform STRIDE-based threat analysis with numbered threat IDs, analyzing only newly added elements."""
+    if st.session_state.analysis is None:
+        # Start from the shared, already analyzed default model; sync() rebuilds if this session's model differs
+        st.session_state.analysis = default_analysis()
+    with metrics.stage("analysis", rerun_timings):
+        return st.session_state.analysis.sync(
+            st.session_state.text_input,
+            st.session_state.data_flows,
+            st.session_state.trust_boundaries,
+            bool(st.session_state.diagram)
+        ).result()
+
+def store_upload(uploaded_file):
+    """Keep the uploaded diagram in the shared blob store, reading it only when the upload changes."""
+    if uploaded_file.file_id == st.session_state.diagram_upload and st.session_state.diagram in blob_store:
+        return
+    try:
+        st.session_state.diagram = blob_store.put(uploaded_file.getvalue())
+        st.session_state.diagram_upload = uploaded_file.file_id
+    except BlobTooLarge as e:
+        st.session_state.diagram = None
+        st.session_state.diagram_upload = None
+        st.session_state.error = str(e)
 
 def step_1():
     st.header("Step 1: Provide System Details")
@@ -370,8 +159,10 @@ def step_1():
     )
     uploaded_file = st.file_uploader("Upload a Data Flow Diagram (e.g., PNG, JPG)", type=["png", "jpg", "jpeg"])
     if uploaded_file:
-        st.session_state.diagram = base64.b64encode(uploaded_file.read()).decode("utf-8")
-        st.image(uploaded_file, caption="Uploaded Data Flow Diagram")
+        store_upload(uploaded_file)
+        image = blob_store.get(st.session_state.diagram)
+        if image is not None:
+            st.image(image, caption="Uploaded Data Flow Diagram")
     if st.button("Next"):
         if st.session_state.text_input or st.session_state.diagram:
             st.session_state.step = 2
@@ -409,9 +200,12 @@ def step_2():
                 st.session_state.error = "Please fill in all data flow fields."
     
     if st.session_state.data_flows:
-        st.write("**Current Data Flows:**")
-        for flow in st.session_state.data_flows:
-            st.write(f"{flow['source']} → {flow['destination']} ({flow['dataType']})")
+        # One element for the list, capped so large imports stay responsive
+        flows = st.session_state.data_flows
+        lines = [f"- {flow['source']} → {flow['destination']} ({flow['dataType']})" for flow in flows[:100]]
+        if len(flows) > 100:
+            lines.append(f"- ...and {len(flows) - 100} more")
+        st.markdown("**Current Data Flows:**\n" + "\n".join(lines))
 
     st.subheader("Trust Boundaries")
     with st.container():
@@ -437,21 +231,50 @@ def step_2():
                 st.session_state.error = "Please provide a valid trust boundary name and description."
     
     if st.session_state.trust_boundaries:
-        st.write("**Current Trust Boundaries:**")
-        for boundary in st.session_state.trust_boundaries:
-            st.write(f"{boundary['name']}: {boundary['description']}")
-
+        boundaries = st.session_state.trust_boundaries
+        lines = [f"- {boundary['name']}: {boundary['description']}" for boundary in boundaries[:100]]
+        if len(boundaries) > 100:
+            lines.append(f"- ...and {len(boundaries) - 100} more")
+        st.markdown("**Current Trust Boundaries:**\n" + "\n".join(lines))
+
+    st.subheader("Bulk Import")
+    bulk_file = st.file_uploader("Import data flows and trust boundaries (CSV, JSON or JSONL)", type=["csv", "json", "jsonl"], key="bulk_upload")
+    if bulk_file is not None and st.button("Import"):
+        report = st.session_state.import_report
+        if report is not None and report.get("file_id") == bulk_file.file_id:
+            st.session_state.import_report = dict(report, message="This file has already been imported.")
+        else:
+            try:
+                with metrics.stage("bulk_import", rerun_timings):
+                    imported = bulk_import(bulk_file, bulk_file.name)
+            except ModelError as e:
+                st.session_state.import_report = {"message": f"Import failed: {e}", "errors": [], "error_count": 0}
+            else:
+                # One state update, so the rerun analyzes and renders the model once
+                st.session_state.data_flows.extend(imported["data_flows"])
+                st.session_state.trust_boundaries.extend(imported["trust_boundaries"])
+                st.session_state.import_report = {
+                    "file_id": bulk_file.file_id,
+                    "message": f"Imported {len(imported['data_flows'])} data flows and {len(imported['trust_boundaries'])} trust boundaries.",
+                    "errors": imported["errors"],
+                    "error_count": imported["error_count"],
+                }
+        st.rerun()
+    report = st.session_state.import_report
+    if report is not None:
+        st.info(report["message"])
+        if report["error_count"]:
+            skipped = "\n".join(f"- Row {row}: {message}" for row, message in report["errors"])
+            more = report["error_count"] - len(report["errors"])
+            st.warning(f"Skipped {report['error_count']} invalid rows:\n{skipped}" + (f"\n- ...and {more} more" if more else ""))
+
+    diagram_slot = None
     if st.session_state.data_flows or st.session_state.trust_boundaries:
         st.subheader("Preview Data Flow Diagram")
         preview_threats = analyze_threats().get("threats", [])
-        diagram = generate_diagram(preview_threats)
-        if diagram:
-            st.image(f"data:image/png;base64,{diagram}", caption="Refined Data Flow Diagram with Numbered Threat IDs", width=800)
-        else:
-            st.markdown("**Refined ASCII Diagram with Numbered Threat IDs**:")
-            st.code(fallback_ascii_diagram(preview_threats), language="text")
-            if st.session_state.error:
-                st.error(st.session_state.error)
+        generate_diagram(preview_threats)
+        diagram_slot = st.empty()
+        diagram_slot.info("Rendering diagram...")
 
     if st.button("Analyze Threats"):
         if st.session_state.data_flows or st.session_state.trust_boundaries:
@@ -462,57 +285,136 @@ def step_2():
         else:
             st.session_state.error = "Please add at least one data flow or trust boundary."
 
+    if diagram_slot is not None:
+        show_diagram(diagram_slot, preview_threats)
+
+def filter_threats(threats):
+    """Show the threat filters and return the threats they select, indexing each analysis result once."""
+    index = st.session_state.threat_index
+    if index is None or index.threats is not threats:
+        with metrics.stage("threat_index", rerun_timings):
+            index = st.session_state.threat_index = ThreatIndex(threats)
+    stride_column, element_column, reference_column = st.columns(3)
+    strides = stride_column.multiselect("STRIDE category", list(index.strides()), key="filter_stride")
+    elements = ()
+    if index.elements():
+        elements = element_column.multiselect("DFD element", list(index.elements()), key="filter_element")
+    references = reference_column.multiselect("OWASP ASVS/SAMM reference", list(index.references()), key="filter_reference")
+    text = st.text_input("Search threats", key="filter_text")
+    # Paging through results reruns with the same filters, so keep their result
+    key = (tuple(strides), tuple(elements), tuple(references), text)
+    cached = st.session_state.threat_filter
+    if cached is None or cached[0] is not index or cached[1] != key:
+        with metrics.stage("threat_filter", rerun_timings):
+            cached = st.session_state.threat_filter = (index, key, index.filter(strides, elements, references, text, group_by_element=True))
+    selected = cached[2]
+    st.caption(f"Showing {len(selected)} of {len(index)} threats")
+    return selected
+
+def show_risk(threats):
+    """Show the highest-risk threats and a DFD element x STRIDE heatmap of the highest risk per cell."""
+    scores = st.session_state.risk_scores
+    if scores is None or scores.threats is not threats:
+        with metrics.stage("risk_scores", rerun_timings):
+            scores = st.session_state.risk_scores = score_threats(
+                threats, st.session_state.data_flows, st.session_state.trust_boundaries
+            )
+    st.subheader("Risk")
+    st.caption(", ".join(f"{level}: {count}" for level, count in scores.level_counts().items()))
+    with metrics.stage("risk_views", rerun_timings):
+        top = scores.top(10)
+        elements, strides, matrix = scores.heatmap()
+    st.markdown("**Highest risks**")
+    st.dataframe(
+        {
+            "Risk": [int(scores.risk[p]) for p in top],
+            "Level": [risk_level(scores.risk[p]) for p in top],
+            "Threat": [threat_title(threats[p]) for p in top],
+            "STRIDE": [threats[p]["stride"] for p in top],
+            "DFD Element": [scores.elements[scores.element_codes[p]] for p in top],
+            "Likelihood": [int(scores.likelihood[p]) for p in top],
+            "Impact": [int(scores.impact[p]) for p in top],
+        },
+        hide_index=True,
+    )
+    if elements:
+        st.markdown(f"**Risk heatmap** (top {len(elements)} DFD elements)")
+        st.dataframe(pd.DataFrame(matrix, index=elements, columns=strides).style.map(risk_color))
+
+def results_page(total):
+    """Show a page picker when total threats need several pages and return the (start, stop) of the current page."""
+    start, stop, pages = page_bounds(total, st.session_state.get("threat_page", 1))
+    if pages > 1:
+        # Clamp the page before the widget is created, as filtering may have removed pages
+        st.session_state.threat_page = start // PAGE_SIZE + 1
+        st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="threat_page")
+        st.caption(f"Threats {start + 1}-{stop} of {total}")
+    return start, stop
+
+def export_report(threats):
+    """Write a downloadable report of the threat model in the background, showing its progress."""
+    st.subheader("Export Report")
+    formats = {label: fmt for fmt, (label, _) in REPORT_FORMATS.items()}
+    fmt = formats[st.selectbox("Report format", list(formats), key="report_format")]
+    if st.button("Generate Report"):
+        if st.session_state.report_job is not None:
+            st.session_state.report_job.cancel()
+        try:
+            st.session_state.report_job = report_queue.submit(
+                fmt, "E-commerce Threat Model Report", st.session_state.text_input, threats,
+                st.session_state.data_flows, st.session_state.trust_boundaries,
+                st.session_state.diagram_job, DIAGRAM_FORMAT,
+            )
+        except ReportQueueBusy as e:
+            st.session_state.report_job = None
+            st.warning(str(e))
+    job = st.session_state.report_job
+    if job is None:
+        return
+    slot = st.empty()
+    with metrics.stage("report_wait", rerun_timings):
+        while not job.done():
+            # Updating the placeholder lets Streamlit stop this run as soon as the user does something else
+            slot.progress(job.progress(), text=f"Writing {job.filename}: {job.written} of {job.total} threats")
+            wait([job.future], timeout=0.25)
+    if job.future.cancelled():
+        slot.empty()
+    elif job.future.exception() is not None:
+        slot.error(f"Cannot write report: {job.future.exception()}")
+    else:
+        try:
+            with open(job.path, "rb") as f:
+                slot.download_button("Download Report", f, file_name=job.filename, mime=job.mime)
+        except OSError:
+            slot.warning("The report file is no longer available. Please generate it again.")
+
 def step_3():
     st.header("Step 3: Threat Model Results")
     st.markdown("Below are the identified threats, labeled with numeric IDs (e.g., T1, T2) and mapped to Data Flow Diagram (DFD) elements. Refer to the DFD for threat locations.")
     if st.session_state.threat_model:
+        show_risk(st.session_state.threat_model["threats"])
         st.subheader("Identified Threats")
-        dfd_elements = {}
-        for threat in st.session_state.threat_model["threats"]:
-            dfd_element = threat["dfd_element"]
-            dfd_elements.setdefault(dfd_element, []).append(threat)
-        
-        for dfd_element, threats in dfd_elements.items():
-            st.markdown(f"### Threats for {dfd_element}")
-            for threat in threats:
-                with st.expander(f"{threat['id']}: {threat['type']} (STRIDE: {threat['stride']})"):
-                    st.markdown(f"- **Description**: {threat['description']}")
-                    st.markdown(f"- **Mitigation**: {threat['mitigation']}")
-                    if "controls" in threat:
-                        st.markdown(f"- **Security Controls**: {threat['controls']}")
-                    st.markdown(f"- **OWASP ASVS**: {threat['asvs']}")
-                    st.markdown(f"- **OWASP SAMM**: {threat['samm']}")
-                    st.markdown(f"- **DFD Element**: {threat['dfd_element']}")
-
-    if st.session_state.generated_diagram:
-        st.subheader("Refined Data Flow Diagram with Numbered Threat IDs")
-        st.image(f"data:image/png;base64,{st.session_state.generated_diagram}", caption="Refined Data Flow Diagram with Numbered Threat IDs", width=800)
-    else:
-        st.markdown("**Refined ASCII Diagram with Numbered Threat IDs**:")
-        st.code(fallback_ascii_diagram(st.session_state.threat_model.get("threats", [])), language="text")
+        threats = filter_threats(st.session_state.threat_model["threats"])
+        start, stop = results_page(len(threats))
+        with metrics.stage("step_3_widgets", rerun_timings):
+            # A collapsed summary per DFD element, each holding one markdown element
+            for dfd_element, element_threats in element_runs(threats[start:stop]):
+                strides = Counter(threat["stride"] for threat in element_threats)
+                summary = ", ".join(f"{stride}: {count}" for stride, count in strides.items())
+                with st.expander(f"Threats for {dfd_element} ({summary})"):
+                    st.markdown(threats_markdown(element_threats))
+
+    st.subheader("Refined Data Flow Diagram with Numbered Threat IDs")
+    diagram_slot = st.empty()
+    diagram_slot.info("Rendering diagram...")
     if st.button("Start Over"):
-        st.session_state.step = 1
-        st.session_state.text_input = (
-            "E-commerce web app with a React frontend, Node.js backend API, MySQL database, and Stripe payment gateway. "
-            "The app is public-facing, handles user authentication, and processes sensitive data like PII and payment details."
-        )
-        st.session_state.diagram = None
-        st.session_state.data_flows = [
-            {"source": "Frontend", "destination": "Backend", "dataType": "User Input (PII, Credentials)"},
-            {"source": "Backend", "destination": "Database", "dataType": "User Data, Orders"},
-            {"source": "Backend", "destination": "Payment Gateway", "dataType": "Payment Details"}
-        ]
-        st.session_state.trust_boundaries = [
-            {"name": "Frontend Boundary", "description": "Untrusted client-side React app running on user devices"},
-            {"name": "Backend Boundary", "description": "Trusted server-side Node.js API and MySQL database"},
-            {"name": "Payment Gateway Boundary", "description": "External third-party Stripe service"}
-        ]
-        st.session_state.threat_model = None
-        st.session_state.error = ""
-        st.session_state.generated_diagram = None
+        reset_session(st.session_state, ECOMMERCE_MODEL)
         st.rerun()
     if st.session_state.error:
         st.error(st.session_state.error)
+    show_diagram(diagram_slot, st.session_state.threat_model.get("threats", []))
+    if st.session_state.threat_model:
+        export_report(st.session_state.threat_model["threats"])
 
 # Section: Tips for Threat Modeling
 st.header("Tips for Effective Threat Modeling")
@@ -526,6 +428,71 @@ st.markdown("""
 7. **Document**: Record threats, mitigations, and DFD mappings.
 """)
 
+def show_metrics():
+    """Show this rerun's stage timings, the session's totals and cache hit rates in the sidebar."""
+    rerun_timings["rerun"] = time.perf_counter() - rerun_started
+    metrics.observe("rerun", rerun_timings["rerun"])
+    totals = add_to_totals(st.session_state.metrics_totals, rerun_timings)
+    with st.sidebar.expander("Performance", expanded=True):
+        st.markdown("**This rerun**")
+        for name, seconds in sorted(rerun_timings.items(), key=lambda item: -item[1]):
+            st.text(f"{name:<14} {seconds * 1000:9.1f} ms")
+        st.markdown("**This session**")
+        for name, (count, seconds) in sorted(totals.items()):
+            st.text(f"{name:<14} {count:>4}x {seconds / count * 1000:9.1f} ms avg")
+        st.markdown("**Caches**")
+        for name, (hits, misses, rate) in metrics.cache_stats().items():
+            st.text(f"{name:<14} {hits} hits, {misses} misses" + (f" ({rate:.0%})" if rate is not None else ""))
+    metrics.maybe_write()
+
+def list_saved_models():
+    """Read the names of the most recently saved models into the session."""
+    try:
+        st.session_state.saved_models = [row[0] for row in model_store.list_models(100)]
+    except sqlite3.Error as e:
+        st.error(f"Cannot read saved models: {e}")
+
+def show_saved_models():
+    """Save the current model to, or load one from, the local model database in the sidebar."""
+    # The database is only opened when the user saves, lists or loads a model, not on every rerun
+    with st.sidebar.expander("Saved Models"):
+        name = st.text_input("Model name", key="model_name")
+        if st.button("Save Model"):
+            if name:
+                model = {
+                    "text_input": st.session_state.text_input,
+                    "data_flows": st.session_state.data_flows,
+                    "trust_boundaries": st.session_state.trust_boundaries,
+                }
+                try:
+                    version = model_store.save_model(name, model, analyze_threats()["threats"], "ecommerce")
+                    st.success(f"Saved {name} (version {version})")
+                    if st.session_state.saved_models is not None:
+                        list_saved_models()
+                except sqlite3.Error as e:
+                    st.error(f"Cannot save model: {e}")
+            else:
+                st.warning("Please enter a model name.")
+        listed = st.session_state.saved_models is not None
+        if st.button("Refresh Saved Models" if listed else "Show Saved Models", key="list_models"):
+            list_saved_models()
+        saved = st.session_state.saved_models
+        if saved == []:
+            st.caption("No saved models yet.")
+        elif saved:
+            selected = st.selectbox("Saved model", saved, key="saved_model")
+            if st.button("Load Model"):
+                try:
+                    model = model_store.load_model(selected)
+                except (StoreError, sqlite3.Error) as e:
+                    st.error(f"Cannot load model: {e}")
+                else:
+                    reset_session(st.session_state, model)
+                    st.session_state.step = 2
+                    st.rerun()
+
+show_saved_models()
+
 # Render the current step
 if st.session_state.step == 1:
     step_1()
@@ -539,3 +506,6 @@ st.markdown("""
 ---
 *Built with Streamlit | Learn more at [OWASP](https://owasp.org/www-community/Threat_Modeling) or [Microsoft STRIDE](https://docs.microsoft.com/en-us/azure/security/develop/threat-modeling-tool-threats).*
 """)
+
+if metrics.enabled:
+    show_metrics()
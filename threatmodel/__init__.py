@@ -0,0 +1 @@
+"""Shared helpers for the threat modeling Streamlit apps."""
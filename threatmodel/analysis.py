@@ -0,0 +1,248 @@
+"""STRIDE threat analysis rules shared by the Streamlit apps.
+
+``iter_generic_threats`` is the rule set behind ``app.py`` and
+``iter_ecommerce_threats`` the one behind ``threat_modeling_app.py``. Both
+yield threats as they walk the model, so exporters can stream arbitrarily
+large models; the rules for a single flow or boundary are exposed as their
+own generators. Attack-path threats need the whole flow graph, so the
+streams feed each flow and boundary into an ``AttackGraph`` as they pass
+and yield one threat per attack path last.
+
+``analyze_generic`` and ``analyze_ecommerce`` collect those streams into
+``{"threats": [...]}`` dicts. The apps analyze through incremental.py
+instead, which only runs the rules for the elements an edit adds.
+"""
+from threatmodel.attack_paths import AttackGraph, path_element
+from threatmodel.catalog import make_threat
+from threatmodel.keyword_matcher import KeywordMatcher
+
+
+# Trigger keywords for each rule, compiled once into single-pass matchers
+_COMPONENT_KEYWORDS = {
+    "web": ("web application", "website", "public facing"),
+    "api": ("api", "endpoint"),
+    "database": ("database", "db"),
+    "cloud": ("cloud", "aws", "azure"),
+    "authentication": ("login", "password", "credential"),
+    "third_party": ("third party", "external"),
+    "public_facing": ("public facing", "external facing"),
+}
+_USER_SOURCES = ("user", "client")
+_SENSITIVE_DATA = ("pii", "sensitive", "confidential")
+_EXPOSED_DESTINATIONS = ("api", "server")
+_SPOOFABLE_BOUNDARIES = ("boundary", "dmz")
+_TAMPERABLE_BOUNDARIES = ("database", "server")
+_ECOMMERCE_SENSITIVE_DATA = ("pii", "sensitive")
+_ECOMMERCE_SPOOFABLE_BOUNDARIES = ("boundary", "frontend")
+_ECOMMERCE_TAMPERABLE_BOUNDARIES = ("database", "backend")
+
+_component_matcher = KeywordMatcher(keyword for keywords in _COMPONENT_KEYWORDS.values() for keyword in keywords)
+_element_matcher = KeywordMatcher(
+    _USER_SOURCES + _SENSITIVE_DATA + _EXPOSED_DESTINATIONS + _SPOOFABLE_BOUNDARIES + _TAMPERABLE_BOUNDARIES
+    + _ECOMMERCE_SPOOFABLE_BOUNDARIES + _ECOMMERCE_TAMPERABLE_BOUNDARIES
+)
+
+
+def _mentions(found, keywords):
+    """Return True if any of keywords is among the matcher's findings."""
+    return not found.isdisjoint(keywords)
+
+
+def iter_generic_threats(text_input, data_flows, trust_boundaries, has_diagram=False):
+    """Yield the generic STRIDE threats one at a time while walking the model.
+
+    data_flows and trust_boundaries may be any iterables (they are consumed
+    once), so peak memory is bounded by the attack graph's integer edge
+    lists, not the result set.
+    """
+    components = generic_components(text_input)
+    graph = AttackGraph()
+    yield from generic_system_threats(components)
+    for flow in data_flows:
+        graph.add_flow(flow)
+        yield from generic_flow_threats(flow)
+    for boundary in trust_boundaries:
+        graph.add_boundary(boundary)
+        yield from generic_boundary_threats(boundary)
+    if has_diagram:
+        yield from generic_diagram_threats(components)
+    yield from generic_path_threats(graph.paths())
+
+
+def generic_components(text_input):
+    """Detect components and design characteristics in the system description."""
+    found = _component_matcher.find(text_input.lower())
+    return {name: _mentions(found, keywords) for name, keywords in _COMPONENT_KEYWORDS.items()}
+
+
+def generic_system_threats(components):
+    """Yield threats raised by the components found in the system description."""
+    # Security controls for public-facing applications
+    if components["public_facing"] or components["web"]:
+        yield make_threat("generic.public_app_spoofing")
+        yield make_threat("generic.public_app_dos")
+
+    # STRIDE: Spoofing
+    if components["authentication"] or components["api"]:
+        yield make_threat("generic.identity_spoofing")
+
+    # STRIDE: Tampering
+    if components["database"] or components["web"]:
+        yield make_threat("generic.data_tampering")
+
+    # STRIDE: Repudiation
+    if components["authentication"] or components["web"]:
+        yield make_threat("generic.missing_audit_trail")
+
+    # STRIDE: Information Disclosure
+    if components["database"] or components["cloud"]:
+        yield make_threat("generic.data_exposure")
+
+    # STRIDE: Denial of Service
+    if components["api"] or components["web"] and not components["public_facing"]:
+        yield make_threat("generic.resource_exhaustion")
+
+    # STRIDE: Elevation of Privilege
+    if components["third_party"] or components["cloud"]:
+        yield make_threat("generic.privilege_escalation")
+
+
+def generic_flow_threats(flow):
+    """Yield the threats raised by one data flow."""
+    data_type = flow.get('dataType', '').lower()
+    source = flow.get('source', '').lower()
+    destination = flow.get('destination', '').lower()
+
+    # Spoofing in data flows
+    if _mentions(_element_matcher.find(source), _USER_SOURCES):
+        yield make_threat("generic.flow_spoofing", source=source, destination=destination)
+
+    # Tampering in data flows
+    yield make_threat("generic.flow_tampering", source=source, destination=destination)
+
+    # Information Disclosure in sensitive data flows
+    if _mentions(_element_matcher.find(data_type), _SENSITIVE_DATA):
+        yield make_threat("generic.flow_disclosure", data_type=data_type, source=source, destination=destination)
+
+    # Denial of Service in data flows
+    if _mentions(_element_matcher.find(destination), _EXPOSED_DESTINATIONS):
+        yield make_threat("generic.flow_dos", destination=destination)
+
+
+def generic_boundary_threats(boundary):
+    """Yield the threats raised by one trust boundary."""
+    name = boundary.get('name', '').lower()
+    name_terms = _element_matcher.find(name)
+
+    # Spoofing across trust boundaries
+    if _mentions(name_terms, _SPOOFABLE_BOUNDARIES):
+        yield make_threat("generic.boundary_spoofing", name=name)
+
+    # Tampering within trust boundaries
+    if _mentions(name_terms, _TAMPERABLE_BOUNDARIES):
+        yield make_threat("generic.boundary_tampering", name=name)
+
+    # Elevation of Privilege within trust boundaries
+    yield make_threat("generic.boundary_privilege_escalation", name=name)
+
+
+def generic_diagram_threats(components):
+    """Yield threats for components detected in an uploaded diagram (simulated)."""
+    diagram_components = []
+    if components["web"]:
+        diagram_components.append("Web Application")
+    if components["database"]:
+        diagram_components.append("Database")
+    if components["api"]:
+        diagram_components.append("API")
+    if components["cloud"]:
+        diagram_components.append("Cloud Service")
+
+    for component in diagram_components:
+        yield make_threat("generic.component_spoofing", component=component)
+        yield make_threat("generic.component_disclosure", component=component)
+        yield make_threat("generic.component_dos", component=component)
+
+
+def generic_path_threats(paths):
+    """Yield a threat for each attack path from an untrusted entry point to a sensitive sink."""
+    for entry, path in paths:
+        yield make_threat("generic.attack_path", path_element(entry, path), entry=entry.lower(), sink=path[-1].lower(),
+                          hops=str(len(path) - 1), path=" → ".join(path).lower())
+
+
+def analyze_generic(text_input, data_flows, trust_boundaries, has_diagram=False):
+    """Perform comprehensive STRIDE-based threat analysis with security controls."""
+    return {"threats": list(iter_generic_threats(text_input, data_flows, trust_boundaries, has_diagram))}
+
+
+def iter_ecommerce_threats(text_input, data_flows, trust_boundaries, has_diagram=False):
+    """Yield the e-commerce threats with numbered IDs one at a time while walking the model.
+
+    data_flows and trust_boundaries may be any iterables (they are consumed
+    once), so peak memory is bounded by the attack graph's integer edge
+    lists, not the result set.
+    """
+    graph = AttackGraph()
+
+    def threats():
+        yield from ecommerce_baseline_threats()
+        for flow in data_flows:
+            graph.add_flow(flow)
+            yield from ecommerce_flow_threats(flow)
+        for boundary in trust_boundaries:
+            graph.add_boundary(boundary)
+            yield from ecommerce_boundary_threats(boundary)
+        yield from ecommerce_path_threats(graph.paths())
+
+    for number, threat in enumerate(threats(), 1):
+        threat.number = number
+        yield threat
+
+
+def ecommerce_baseline_threats():
+    """Yield the predefined e-commerce threats."""
+    yield make_threat("ecommerce.credential_theft", "Frontend → Backend")
+    yield make_threat("ecommerce.cart_tampering", "Frontend → Backend")
+    yield make_threat("ecommerce.order_repudiation", "Backend → Database")
+    yield make_threat("ecommerce.data_exposure", "Backend → Database")
+    yield make_threat("ecommerce.payment_disclosure", "Backend → Payment Gateway")
+    yield make_threat("ecommerce.flooding", "Frontend → Backend")
+    yield make_threat("ecommerce.weak_rbac", "Backend")
+
+
+def ecommerce_flow_threats(flow):
+    """Yield the (unnumbered) threats raised by one user-defined data flow."""
+    data_type = flow.get('dataType', '').lower()
+    source = flow.get('source', '').lower()
+    destination = flow.get('destination', '').lower()
+    edge_key = f"{flow['source']} → {flow['destination']}"
+
+    if _mentions(_element_matcher.find(source), _USER_SOURCES):
+        yield make_threat("ecommerce.flow_spoofing", edge_key, source=source, destination=destination)
+    yield make_threat("ecommerce.flow_tampering", edge_key, source=source, destination=destination)
+    if _mentions(_element_matcher.find(data_type), _ECOMMERCE_SENSITIVE_DATA):
+        yield make_threat("ecommerce.flow_disclosure", edge_key, data_type=data_type, source=source, destination=destination)
+
+
+def ecommerce_boundary_threats(boundary):
+    """Yield the (unnumbered) threats raised by one trust boundary."""
+    name = boundary.get('name', '').lower()
+    name_terms = _element_matcher.find(name)
+
+    if _mentions(name_terms, _ECOMMERCE_SPOOFABLE_BOUNDARIES):
+        yield make_threat("ecommerce.boundary_spoofing", boundary["name"], name=name)
+    if _mentions(name_terms, _ECOMMERCE_TAMPERABLE_BOUNDARIES):
+        yield make_threat("ecommerce.boundary_tampering", boundary["name"], name=name)
+
+
+def ecommerce_path_threats(paths):
+    """Yield the (unnumbered) threats of attack paths, each tied to the elements it goes through."""
+    for entry, path in paths:
+        yield make_threat("ecommerce.attack_path", path_element(entry, path), entry=entry.lower(), sink=path[-1].lower(),
+                          hops=str(len(path) - 1), path=" → ".join(path).lower())
+
+
+def analyze_ecommerce(text_input, data_flows, trust_boundaries, has_diagram=False):
+    """Perform STRIDE-based threat analysis with numbered threat IDs."""
+    return {"threats": list(iter_ecommerce_threats(text_input, data_flows, trust_boundaries, has_diagram))}
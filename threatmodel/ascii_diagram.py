@@ -0,0 +1,247 @@
+"""Plain-text data flow diagrams.
+
+``ascii_diagram`` draws any model as text, so the apps still show a diagram
+when Graphviz is missing, and previews need no subprocess. Nodes are placed
+with a simplified Sugiyama layout, each step linear (or n log n) in the size
+of the graph:
+
+1. cycles are broken by reversing the back edges found by a depth-first search;
+2. each node goes one layer below its deepest predecessor (longest path);
+3. one downward and one upward barycenter sweep order the nodes within each
+   layer to cut down edge crossings.
+
+Every layer is printed as a row of boxes framed by their trust boundary,
+followed by the flows leaving it; a legend lists each threat in full.
+"""
+import io
+
+from threatmodel.attack_paths import path_sink
+from threatmodel.boundary_index import BoundaryIndex
+from threatmodel.partition import dfd_nodes
+
+# Widest line before a layer's boxes wrap onto another row
+MAX_WIDTH = 120
+# Widest box content before threat IDs wrap
+BOX_WIDTH = 30
+
+
+def _back_edges(nodes, successors):
+    """Return the edges an iterative depth-first search finds closing a cycle."""
+    back = set()
+    state = {}  # 1 while on the DFS stack, 2 once finished
+    for root in nodes:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                mark = state.get(child)
+                if mark is None:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    break
+                if mark == 1:
+                    back.add((node, child))
+            else:
+                state[node] = 2
+                stack.pop()
+    return back
+
+
+def layered_layout(nodes, edges):
+    """Return nodes arranged in layers, each a list in left-to-right order.
+
+    nodes is a sorted list and edges an iterable of (source, destination).
+    """
+    edges = list(edges)
+    successors = {node: [] for node in nodes}
+    for source, destination in edges:
+        successors[source].append(destination)
+    back = _back_edges(nodes, successors)
+
+    # Acyclic version of the graph: back edges reversed, self loops dropped
+    children = {node: [] for node in nodes}
+    parents = {node: [] for node in nodes}
+    indegree = dict.fromkeys(nodes, 0)
+    for source, destination in edges:
+        if source == destination:
+            continue
+        if (source, destination) in back:
+            source, destination = destination, source
+        children[source].append(destination)
+        parents[destination].append(source)
+        indegree[destination] += 1
+
+    # Longest-path layering in topological order
+    depth = dict.fromkeys(nodes, 0)
+    queue = [node for node in nodes if indegree[node] == 0]
+    for node in queue:
+        for child in children[node]:
+            depth[child] = max(depth[child], depth[node] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    layers = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+    for node in nodes:
+        layers[depth[node]].append(node)
+
+    # Barycenter ordering: down the layers by parents, then back up by children
+    position = {node: index for layer in layers for index, node in enumerate(layer)}
+    for sweep, neighbours in ((layers[1:], parents), (layers[-2::-1], children)):
+        for layer in sweep:
+            layer.sort(key=lambda node: sum(position[n] for n in neighbours[node]) / len(neighbours[node]) if neighbours[node] else position[node])
+            for index, node in enumerate(layer):
+                position[node] = index
+    return layers
+
+
+def _wrap_ids(ids, width):
+    """Split a list of threat IDs into comma-separated lines of at most width characters."""
+    lines = []
+    line = ""
+    for threat_id in ids:
+        candidate = f"{line}, {threat_id}" if line else threat_id
+        if len(candidate) > width and line:
+            lines.append(line + ",")
+            line = threat_id
+        else:
+            line = candidate
+    lines.append(line or "None")
+    return lines
+
+
+def _box(node, ids):
+    """Return the lines of one node box."""
+    content = [node] + ["Threats: " + line if index == 0 else "  " + line for index, line in enumerate(_wrap_ids(ids, BOX_WIDTH))]
+    width = max(len(line) for line in content)
+    border = "+" + "-" * (width + 2) + "+"
+    return [border] + [f"| {line:<{width}} |" for line in content] + [border]
+
+
+def _frame(title, boxes):
+    """Place boxes side by side inside a trust boundary frame (or blank margins without title)."""
+    height = max(len(box) for box in boxes)
+    rows = []
+    for line in range(height):
+        rows.append("  ".join(box[line] if line < len(box) else " " * len(box[0]) for box in boxes))
+    width = len(rows[0])
+    if title is None:
+        blank = " " * (width + 4)
+        return [blank] + [f"  {row}  " for row in rows] + [blank]
+    top = f".- {title} "
+    top += "-" * max(1, width + 3 - len(top)) + "."
+    width = len(top) - 4
+    return [top] + [f"| {row:<{width}} |" for row in rows] + ["'" + "-" * (width + 2) + "'"]
+
+
+def _row(frames):
+    """Join frames horizontally into lines."""
+    height = max(len(frame) for frame in frames)
+    lines = []
+    for line in range(height):
+        lines.append(" ".join(frame[line] if line < len(frame) else " " * len(frame[0]) for frame in frames).rstrip())
+    return lines
+
+
+def ascii_diagram(data_flows, trust_boundaries, threats=(), max_width=MAX_WIDTH):
+    """Return a text DFD of the model with numbered threat IDs and a threat legend."""
+    nodes = dfd_nodes(data_flows)
+    node_set = set(nodes)
+    boundary_names = {boundary["name"] for boundary in trust_boundaries}
+
+    # Threat IDs per DFD element, in threat order
+    element_ids = {}
+    legend = []
+    for threat in threats:
+        threat_id = threat.get("id")
+        if threat_id is None:
+            continue
+        element = threat.get("dfd_element", "")
+        element_ids.setdefault(path_sink(element) or element, []).append(threat_id)
+        legend.append((threat_id, threat["type"], threat["description"]))
+
+    # Each node is framed by the first boundary that mentions it
+    index = BoundaryIndex((boundary["description"], boundary["name"]) for boundary in trust_boundaries)
+    group = {}
+    for node in nodes:
+        positions = index.boundaries_for(node)
+        group[node] = min(positions) if positions else None
+
+    out = io.StringIO()
+    if trust_boundaries:
+        out.write("Trust Boundaries:\n")
+        for boundary in trust_boundaries:
+            ids = element_ids.get(boundary["name"])
+            out.write(f"  {boundary['name']}: {boundary['description']}")
+            out.write(f"  [Threats: {', '.join(ids)}]\n" if ids else "\n")
+        out.write("\n")
+
+    flows_from = {}
+    for flow in data_flows:
+        flows_from.setdefault(flow["source"], []).append(flow)
+
+    layers = layered_layout(nodes, ((flow["source"], flow["destination"]) for flow in data_flows))
+    for depth, layer in enumerate(layers):
+        # Keep each boundary's nodes together, groups ordered by where their nodes sit
+        runs = {}
+        for position, node in enumerate(layer):
+            runs.setdefault(group[node], []).append((position, node))
+        ordered = sorted(runs.items(), key=lambda item: sum(p for p, _ in item[1]) / len(item[1]))
+
+        out.write(f"Layer {depth + 1}:\n")
+        frames = []
+        width = 0
+        for boundary, members in ordered:
+            title = trust_boundaries[boundary]["name"] if boundary is not None else None
+            boxes = [_box(node, element_ids.get(node, [])) for _, node in members]
+            # Split a boundary across rows when its boxes do not fit on one line
+            chunk = []
+            chunk_width = 0
+            for box in boxes:
+                if chunk and chunk_width + len(box[0]) + 6 > max_width:
+                    frames.append(_frame(title, chunk))
+                    chunk, chunk_width = [], 0
+                chunk.append(box)
+                chunk_width += len(box[0]) + 2
+            frames.append(_frame(title, chunk))
+        row = []
+        for frame in frames:
+            if row and width + len(frame[0]) + 1 > max_width:
+                out.write("\n".join(_row(row)) + "\n")
+                row, width = [], 0
+            row.append(frame)
+            width += len(frame[0]) + 1
+        if row:
+            out.write("\n".join(_row(row)) + "\n")
+
+        for node in layer:
+            for flow in flows_from.get(node, ()):
+                ids = element_ids.get(f"{flow['source']} → {flow['destination']}")
+                out.write(f"    {flow['source']} --> {flow['destination']} : {flow['dataType']}")
+                out.write(f"  [Threats: {', '.join(ids)}]\n" if ids else "\n")
+        out.write("\n")
+
+    # Threats on elements the diagram does not draw, e.g. the e-commerce baseline flows
+    drawn = node_set | boundary_names | {f"{flow['source']} → {flow['destination']}" for flow in data_flows}
+    others = [(element, ids) for element, ids in element_ids.items() if element not in drawn]
+    if others:
+        out.write("Other DFD Elements:\n")
+        for element, ids in others:
+            out.write(f"  {element or '(system)'}: {', '.join(ids)}\n")
+        out.write("\n")
+
+    if legend:
+        id_width = max(len("ID"), max(len(threat_id) for threat_id, _, _ in legend))
+        type_width = max(len("Type"), max(len(kind) for _, kind, _ in legend))
+        description_width = max(len("Description"), max(len(description) for _, _, description in legend))
+        border = f"+-{'-' * id_width}-+-{'-' * type_width}-+-{'-' * description_width}-+\n"
+        out.write("Threat Legend:\n")
+        out.write(border)
+        out.write(f"| {'ID':<{id_width}} | {'Type':<{type_width}} | {'Description':<{description_width}} |\n")
+        out.write(border)
+        for threat_id, kind, description in sorted(legend, key=lambda entry: int(entry[0][1:]) if entry[0][1:].isdigit() else 0):
+            out.write(f"| {threat_id:<{id_width}} | {kind:<{type_width}} | {description:<{description_width}} |\n")
+        out.write(border)
+    return out.getvalue()
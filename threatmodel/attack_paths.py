@@ -0,0 +1,205 @@
+"""Attack paths from untrusted parts of a model to its sensitive stores.
+
+The flows of a model form a directed graph. ``AttackGraph`` keeps it as an
+adjacency index that grows one flow or boundary at a time, the way the apps
+edit models, and on demand packs it into NumPy arrays (edge targets sorted by
+source plus per-node offsets). Reachability from every untrusted entry point
+is then a breadth-first search that expands a whole frontier per step with
+array operations, so a 100k-edge model costs a few dozen vectorized steps
+rather than a Python loop per edge.
+
+Entry points are the trust boundaries whose name or description marks them
+as untrusted (and the nodes they mention), plus untrusted-looking nodes
+outside any such boundary; boundaries whose names only differ in case or
+spacing are one entry point. Sinks are nodes named like data stores or payment
+systems. For each entry point the shortest path to each reachable sink is
+reported, nearest sinks first.
+
+The DFD element of a path is its chain "entry point → node → ... → sink",
+which always has at least two arrows, unlike a flow's "source → destination".
+"""
+import numpy as np
+
+from threatmodel.boundary_index import BoundaryIndex, tokenize
+
+# Words marking a boundary or node as untrusted, and a node as a sensitive sink
+UNTRUSTED_WORDS = frozenset((
+    "untrusted", "public", "internet", "external", "dmz", "client", "user", "users",
+    "browser", "customer", "customers", "anonymous", "guest", "attacker", "mobile",
+))
+SINK_WORDS = frozenset((
+    "database", "db", "datastore", "storage", "store", "vault", "secrets", "payment",
+    "payments", "ledger", "warehouse", "bucket",
+))
+
+# Entry point of untrusted nodes that are not inside an untrusted boundary
+EXTERNAL_ENTRY = "External entities"
+
+# Paths reported per entry point, nearest sinks first
+MAX_PATHS_PER_ENTRY = 50
+
+
+def is_untrusted(texts):
+    """Return True if any of texts marks its boundary or node as untrusted."""
+    return any(not UNTRUSTED_WORDS.isdisjoint(tokenize(text)) for text in texts)
+
+
+def entry_key(name):
+    """Return the name entry points are told apart by: case and spacing do not count."""
+    return " ".join(name.split()).casefold()
+
+
+def path_element(entry, path):
+    """Return the DFD element of an attack path: its entry point, then every node up to the sink."""
+    return " → ".join((entry,) + tuple(path))
+
+
+def path_sink(element):
+    """Return the sink of an attack path's DFD element, or None for any other element."""
+    parts = element.split(" → ")
+    return parts[-1] if len(parts) > 2 else None
+
+
+class AttackGraph:
+    """Adjacency index of a data flow graph with its untrusted entry points and sensitive sinks."""
+
+    def __init__(self, data_flows=(), trust_boundaries=()):
+        self.nodes = []
+        self._codes = {}
+        self._sources = []
+        self._destinations = []
+        self._sinks = []
+        self._external = []
+        # Node codes by their words, to find the phrases of a new boundary that name nodes
+        self._codes_by_words = {}
+        self._longest = 0
+        # Untrusted boundaries: (name, set of member node codes), indexed for new nodes;
+        # boundaries with the same entry_key() share one entry point
+        self._entries = []
+        self._entry_positions = {}
+        self._entry_of = []
+        self._entry_index = BoundaryIndex(())
+        self._paths = None
+        for flow in data_flows:
+            self.add_flow(flow)
+        for boundary in trust_boundaries:
+            self.add_boundary(boundary)
+
+    def _node(self, node):
+        """Return the code of node, classifying it the first time it is seen."""
+        code = self._codes.get(node)
+        if code is None:
+            code = self._codes[node] = len(self.nodes)
+            self.nodes.append(node)
+            words = tokenize(node)
+            if words:
+                self._codes_by_words.setdefault(words, []).append(code)
+                self._longest = max(self._longest, len(words))
+            if not SINK_WORDS.isdisjoint(words):
+                self._sinks.append(code)
+            if not UNTRUSTED_WORDS.isdisjoint(words):
+                self._external.append(code)
+            for position in self._entry_index.boundaries_for(node):
+                self._entries[self._entry_of[position]][1].add(code)
+        return code
+
+    def add_flow(self, flow):
+        """Add one data flow as an edge."""
+        self._sources.append(self._node(flow["source"]))
+        self._destinations.append(self._node(flow["destination"]))
+        self._paths = None
+
+    def add_boundary(self, boundary):
+        """Add one trust boundary; only untrusted boundaries become entry points."""
+        texts = (boundary["description"], boundary["name"])
+        if not is_untrusted(texts):
+            return
+        self._entry_index.add(texts)
+        members = set()
+        for text in texts:
+            words = tokenize(text)
+            for start in range(len(words)):
+                for stop in range(start + 1, min(start + self._longest, len(words)) + 1):
+                    members.update(self._codes_by_words.get(words[start:stop], ()))
+        key = entry_key(boundary["name"])
+        position = self._entry_positions.get(key)
+        if position is None:
+            position = self._entry_positions[key] = len(self._entries)
+            self._entries.append((boundary["name"], set()))
+        self._entry_of.append(position)
+        self._entries[position][1].update(members)
+        self._paths = None
+
+    def _adjacency(self):
+        """Return (offsets, targets): the targets of node i are targets[offsets[i]:offsets[i + 1]]."""
+        sources = np.array(self._sources, dtype=np.int64)
+        targets = np.array(self._destinations, dtype=np.int64)[np.argsort(sources, kind="stable")]
+        offsets = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.nodes)), out=offsets[1:])
+        return offsets, targets
+
+    @staticmethod
+    def _search(starts, offsets, targets):
+        """Breadth-first search from the start nodes; return (distance, parent) arrays, -1 where unreached."""
+        distance = np.full(len(offsets) - 1, -1, dtype=np.int64)
+        parent = np.full(len(offsets) - 1, -1, dtype=np.int64)
+        frontier = np.unique(np.asarray(starts, dtype=np.int64))
+        distance[frontier] = 0
+        level = 0
+        while frontier.size:
+            first = offsets[frontier]
+            counts = offsets[frontier + 1] - first
+            total = int(counts.sum())
+            if not total:
+                break
+            # Positions of every edge leaving the frontier, in frontier order
+            ends = np.cumsum(counts)
+            positions = np.arange(total) + np.repeat(first - (ends - counts), counts)
+            tails = np.repeat(frontier, counts)
+            heads = targets[positions]
+            new = distance[heads] < 0
+            # The first edge found into a node is its parent
+            frontier, found = np.unique(heads[new], return_index=True)
+            level += 1
+            distance[frontier] = level
+            parent[frontier] = tails[new][found]
+        return distance, parent
+
+    def entries(self):
+        """Return [(entry point name, node codes)] of the untrusted parts of the graph."""
+        entries = [(name, members) for name, members in self._entries if members]
+        inside = set().union(*(members for _, members in entries))
+        external = [code for code in self._external if code not in inside]
+        if external:
+            for position, (name, members) in enumerate(entries):
+                if entry_key(name) == entry_key(EXTERNAL_ENTRY):
+                    # A boundary named like the external entry point takes them in
+                    entries[position] = (name, members | set(external))
+                    break
+            else:
+                entries.append((EXTERNAL_ENTRY, external))
+        return entries
+
+    def paths(self):
+        """Return [(entry point name, node names of the path)] of the shortest path to each reachable sink."""
+        if self._paths is None:
+            self._paths = []
+            entries = self.entries()
+            if entries and self._sinks and self._sources:
+                offsets, targets = self._adjacency()
+                sinks = np.array(self._sinks, dtype=np.int64)
+                for name, starts in entries:
+                    distance, parent = self._search(list(starts), offsets, targets)
+                    reached = sinks[distance[sinks] > 0]
+                    reached = reached[np.lexsort((reached, distance[reached]))][:MAX_PATHS_PER_ENTRY]
+                    for sink in reached.tolist():
+                        path = [sink]
+                        while distance[path[-1]] > 0:
+                            path.append(int(parent[path[-1]]))
+                        self._paths.append((name, tuple(self.nodes[code] for code in reversed(path))))
+        return self._paths
+
+
+def attack_paths(data_flows, trust_boundaries):
+    """Return the attack paths of a model; see AttackGraph.paths()."""
+    return AttackGraph(data_flows, trust_boundaries).paths()
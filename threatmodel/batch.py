@@ -0,0 +1,134 @@
+"""Headless batch threat modeling over many model files.
+
+Usage::
+
+    python -m threatmodel.batch MODEL_OR_DIR [MODEL_OR_DIR ...]
+        [--ruleset generic|ecommerce] [--workers N] [--output results.jsonl]
+        [--threats-dir DIR] [--render-dir DIR] [--format png|svg|svgz|txt]
+
+Every model file (JSON or YAML with ``text_input``, ``data_flows`` and
+``trust_boundaries``) is analyzed in a worker process with the same rules as
+the Streamlit apps. One JSON line per model is streamed out, in input order,
+as soon as it is ready. With ``--threats-dir`` each worker streams a model's
+threats straight from the analysis generator into its own JSONL file, and the
+summary line only points at it, so very large models never hold their full
+result set in memory. A file that cannot be loaded yields an error record
+and the batch carries on; the exit status is 1 if any model failed.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from threatmodel.analysis import iter_ecommerce_threats, iter_generic_threats
+from threatmodel.ascii_diagram import ascii_diagram
+from threatmodel.diagram import build_ecommerce_diagram, build_generic_diagram
+from threatmodel.fingerprint import model_fingerprint
+from threatmodel.model_io import ModelError, find_models, load_model
+from threatmodel.render import RenderError, render_dot
+
+# Rule set name -> (threat stream, diagram builder), matching app.py and threat_modeling_app.py
+RULESETS = {
+    "generic": (iter_generic_threats, lambda model, threats: build_generic_diagram(model["data_flows"], model["trust_boundaries"])),
+    "ecommerce": (iter_ecommerce_threats, lambda model, threats: build_ecommerce_diagram(model["data_flows"], model["trust_boundaries"], threats)),
+}
+
+
+def process_model(path, ruleset="generic", render_dir=None, fmt="png", threats_dir=None):
+    """Analyze (and optionally render) one model file and return its result record."""
+    iter_threats, build_diagram = RULESETS[ruleset]
+
+    def threats():
+        return iter_threats(model["text_input"], model["data_flows"], model["trust_boundaries"])
+
+    try:
+        model = load_model(path)
+        fingerprint = model_fingerprint(model["text_input"], model["data_flows"], model["trust_boundaries"])
+        stem = f"{os.path.splitext(os.path.basename(path))[0]}-{fingerprint[:12]}"
+        record = {"path": path, "ok": True, "fingerprint": fingerprint}
+        if threats_dir:
+            threats_path = os.path.join(threats_dir, f"{stem}.jsonl")
+            count = 0
+            with open(threats_path, "w", encoding="utf-8") as f:
+                for threat in threats():
+                    f.write(json.dumps(threat.to_dict(), ensure_ascii=False) + "\n")
+                    count += 1
+            record["threat_count"] = count
+            record["threats_file"] = threats_path
+        else:
+            record["threats"] = [threat.to_dict() for threat in threats()]
+            record["threat_count"] = len(record["threats"])
+    except ModelError as e:
+        return {"path": path, "ok": False, "error": str(e)}
+    except Exception as e:
+        return {"path": path, "ok": False, "error": f"analysis failed: {e}"}
+
+    if render_dir:
+        diagram_path = os.path.join(render_dir, f"{stem}.{fmt}")
+        try:
+            if fmt == "txt":
+                image = ascii_diagram(model["data_flows"], model["trust_boundaries"], threats()).encode("utf-8")
+            else:
+                image = render_dot(build_diagram(model, threats()).source, fmt)
+            with open(diagram_path, "wb") as f:
+                f.write(image)
+            record["diagram"] = diagram_path
+        except (RenderError, OSError) as e:
+            record["diagram"] = None
+            record["diagram_error"] = str(e)
+    return record
+
+
+def run_batch(paths, out, ruleset="generic", workers=None, render_dir=None, fmt="png", chunksize=4, threats_dir=None):
+    """Process every model under paths, writing one JSON line per model to out.
+
+    Returns (total, failed) counts.
+    """
+    for directory in (render_dir, threats_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    worker = functools.partial(process_model, ruleset=ruleset, render_dir=render_dir, fmt=fmt, threats_dir=threats_dir)
+    total = failed = 0
+
+    def emit(records):
+        nonlocal total, failed
+        for record in records:
+            total += 1
+            failed += not record["ok"]
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    if workers == 1:
+        emit(map(worker, find_models(paths)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            emit(executor.map(worker, find_models(paths), chunksize=chunksize))
+    return total, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m threatmodel.batch", description="Threat-model many system descriptions without the Streamlit UI.")
+    parser.add_argument("paths", nargs="+", help="model files (.json/.yaml/.yml) or directories containing them")
+    parser.add_argument("--ruleset", choices=sorted(RULESETS), default="generic", help="generic (app.py) or ecommerce (threat_modeling_app.py) rules")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--chunksize", type=int, default=4, help="models handed to a worker at a time")
+    parser.add_argument("--output", "-o", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--threats-dir", help="stream each model's threats to DIR/<model>.jsonl instead of inlining them")
+    parser.add_argument("--render-dir", help="also render each DFD into this directory (requires Graphviz)")
+    parser.add_argument("--format", default="png", choices=("png", "svg", "svgz", "txt"), help="diagram format for --render-dir (svgz is gzip-compressed SVG, txt a text diagram that needs no Graphviz)")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        total, failed = run_batch(args.paths, out, args.ruleset, args.workers, args.render_dir, args.format, args.chunksize, args.threats_dir)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Analyzed {total} models ({failed} failed).", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Content-addressed store for uploaded diagram images.
+
+Uploads are kept once, as raw bytes, in a process-wide store keyed on their
+SHA-256, so the same image uploaded by several sessions (or re-uploaded by
+one) costs nothing extra. Sessions only hold the key. The store is an LRU
+bounded by total bytes; images larger than a configured dimension are
+downscaled with Pillow when it is installed.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed to downscale oversized uploads
+    Image = None
+
+
+class BlobTooLarge(ValueError):
+    """Raised when an upload exceeds the per-blob size limit."""
+
+
+def blob_key(data):
+    """Return the content hash used as a blob handle."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def downscale_image(data, max_dimension):
+    """Return data re-encoded so neither side exceeds max_dimension, or data unchanged."""
+    if Image is None or not max_dimension:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= max_dimension or image.format not in ("PNG", "JPEG"):
+                return data
+            image_format = image.format
+            image.thumbnail((max_dimension, max_dimension))
+            out = io.BytesIO()
+            image.save(out, format=image_format)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return data  # Not an image Pillow can handle; keep the upload as-is
+    resized = out.getvalue()
+    return resized if len(resized) < len(data) else data
+
+
+class BlobStore:
+    """LRU store of immutable blobs bounded by total size."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_blob_bytes=10 * 1024 * 1024, max_dimension=2048):
+        self.max_bytes = max_bytes
+        self.max_blob_bytes = max_blob_bytes
+        self.max_dimension = max_dimension
+        self.total_bytes = 0
+        self._blobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        """Store data (downscaled if needed) and return its handle."""
+        key = blob_key(data)
+        with self._lock:
+            if key in self._blobs:
+                self._blobs.move_to_end(key)
+                return key
+        if len(data) > self.max_blob_bytes:
+            data = downscale_image(data, self.max_dimension)
+            if len(data) > self.max_blob_bytes:
+                raise BlobTooLarge(f"Uploaded file is larger than {self.max_blob_bytes // (1024 * 1024)} MB.")
+        else:
+            data = downscale_image(data, self.max_dimension)
+        with self._lock:
+            if key not in self._blobs:
+                self._blobs[key] = data
+                self.total_bytes += len(data)
+                # Never evict the blob just stored
+                while self.total_bytes > self.max_bytes and len(self._blobs) > 1:
+                    _, evicted = self._blobs.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+            self._blobs.move_to_end(key)
+        return key
+
+    def get(self, key):
+        """Return the bytes stored under key, or None if unknown or evicted."""
+        with self._lock:
+            data = self._blobs.get(key)
+            if data is not None:
+                self._blobs.move_to_end(key)
+            return data
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._blobs
+
+
+def store_from_env():
+    """Build the shared store from THREATMODEL_UPLOAD_* environment variables."""
+    return BlobStore(
+        max_bytes=int(os.environ.get("THREATMODEL_UPLOAD_STORE_MB", "64")) * 1024 * 1024,
+        max_blob_bytes=int(os.environ.get("THREATMODEL_UPLOAD_MAX_MB", "10")) * 1024 * 1024,
+        max_dimension=int(os.environ.get("THREATMODEL_UPLOAD_MAX_PIXELS", "2048")),
+    )
+
+
+# Process-wide instance shared by every Streamlit session
+blob_store = store_from_env()
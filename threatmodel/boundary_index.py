@@ -0,0 +1,73 @@
+"""Index of which trust boundaries mention which DFD nodes.
+
+Boundary texts (descriptions, and for some diagrams names) are tokenized once
+into a word -> positions index. A node belongs to a boundary when its words
+appear as a contiguous phrase in one of the boundary's texts, so multi-word
+nodes such as "Payment Gateway" match as well as single words, and looking a
+node up costs a few dictionary hits instead of a scan over every boundary.
+"""
+import re
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into lowercase words."""
+    return tuple(_WORD.findall(text.lower()))
+
+
+class BoundaryIndex:
+    """Phrase index over the texts of a list of trust boundaries."""
+
+    def __init__(self, boundary_texts):
+        # boundary_texts yields, per boundary, the texts that may mention its nodes
+        self._documents = []
+        self._owners = []
+        self._postings = {}
+        self._boundaries = 0
+        for texts in boundary_texts:
+            self.add(texts)
+
+    def add(self, texts):
+        """Index one more boundary's texts and return its position."""
+        boundary = self._boundaries
+        self._boundaries += 1
+        for text in texts:
+            document = len(self._documents)
+            words = tokenize(text)
+            self._documents.append(words)
+            self._owners.append(boundary)
+            for position, word in enumerate(words):
+                self._postings.setdefault(word, {}).setdefault(document, []).append(position)
+        return boundary
+
+    def boundaries_for(self, node):
+        """Return the set of boundary positions whose texts mention node."""
+        words = tokenize(node)
+        if not words or words[0] not in self._postings:
+            return set()
+        first = self._postings[words[0]]
+        if len(words) == 1:
+            return {self._owners[document] for document in first}
+
+        # Only documents containing every word can contain the phrase
+        candidates = set(first)
+        for word in words[1:]:
+            postings = self._postings.get(word)
+            if postings is None:
+                return set()
+            candidates &= postings.keys()
+        found = set()
+        for document in candidates:
+            tokens = self._documents[document]
+            if any(tokens[start:start + len(words)] == words for start in first[document]):
+                found.add(self._owners[document])
+        return found
+
+    def members(self, nodes):
+        """Map each boundary position to the nodes it contains, in the order given."""
+        members = {}
+        for node in nodes:
+            for boundary in self.boundaries_for(node):
+                members.setdefault(boundary, []).append(node)
+        return members
@@ -0,0 +1,120 @@
+"""Bulk import of data flows and trust boundaries from CSV, JSON or JSONL files.
+
+Rows are read one at a time from the (binary) upload stream and checked with
+the same validators as model files, so a bad row is reported with its row
+number and skipped instead of failing the whole import. CSV and JSONL are
+streamed line by line; a JSON document has to be parsed whole, but its rows
+are still validated one at a time.
+
+A row is a data flow if it has a ``source`` (``source``, ``destination``,
+``dataType``) and a trust boundary if it has a ``name`` (``name``,
+``description``); an explicit ``kind`` column of ``flow`` or ``boundary``
+overrides the guess. A JSON file may also be a whole model with
+``data_flows`` and ``trust_boundaries`` lists.
+"""
+import csv
+import io
+import json
+import os
+
+from threatmodel.model_io import ModelError, validate_boundary, validate_flow
+
+IMPORT_EXTENSIONS = (".csv", ".json", ".jsonl")
+
+# Row errors kept for display; the rest are only counted
+MAX_ERRORS = 100
+
+_KINDS = {
+    "flow": "flow", "data_flow": "flow", "data flow": "flow",
+    "boundary": "boundary", "trust_boundary": "boundary", "trust boundary": "boundary",
+}
+
+
+def _csv_rows(text):
+    reader = csv.DictReader(text)
+    for row in reader:
+        # Blank cells mean "not given", so a mixed file can leave other kinds' columns empty
+        yield reader.line_num, {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+
+
+def _jsonl_rows(text):
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, ModelError(f"invalid JSON: {e.msg}")
+
+
+def _json_rows(text):
+    try:
+        data = json.load(text)
+    except json.JSONDecodeError as e:
+        raise ModelError(f"cannot parse JSON: {e}") from None
+    if isinstance(data, dict):
+        flows = data.get("data_flows", [])
+        boundaries = data.get("trust_boundaries", [])
+        if not isinstance(flows, list) or not isinstance(boundaries, list):
+            raise ModelError("'data_flows' and 'trust_boundaries' must be lists")
+        data = [dict(flow, kind="flow") if isinstance(flow, dict) else flow for flow in flows] + \
+               [dict(boundary, kind="boundary") if isinstance(boundary, dict) else boundary for boundary in boundaries]
+    if not isinstance(data, list):
+        raise ModelError("JSON import must be a list of rows or a model object")
+    return enumerate(data, 1)
+
+
+def read_rows(stream, filename):
+    """Yield (row number, row dict or ModelError) from a binary stream, by filename extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    readers = {".csv": _csv_rows, ".jsonl": _jsonl_rows, ".json": _json_rows}
+    if extension not in readers:
+        raise ModelError(f"unsupported import file type '{extension}'")
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="" if extension == ".csv" else None)
+    try:
+        yield from readers[extension](text)
+    except UnicodeDecodeError:
+        raise ModelError("import file is not UTF-8 text") from None
+    except csv.Error as e:
+        raise ModelError(f"cannot parse CSV: {e}") from None
+    finally:
+        text.detach()  # Leave the caller's stream open
+
+
+def parse_row(row):
+    """Return ("flow" or "boundary", validated dict) for one import row, or raise ModelError."""
+    if isinstance(row, ModelError):
+        raise row
+    if not isinstance(row, dict):
+        raise ModelError("row must be an object")
+    kind = _KINDS.get(str(row.get("kind", "")).strip().lower())
+    if kind is None:
+        if "kind" in row:
+            raise ModelError(f"unknown kind '{row['kind']}' (expected flow or boundary)")
+        kind = "flow" if "source" in row else "boundary" if "name" in row else None
+    if kind == "flow":
+        return kind, validate_flow(row)
+    if kind == "boundary":
+        return kind, validate_boundary(row)
+    raise ModelError("row is neither a data flow (source, destination, dataType) nor a trust boundary (name, description)")
+
+
+def bulk_import(stream, filename, max_errors=MAX_ERRORS):
+    """Read every row of an import file and return the valid flows and boundaries with the row errors.
+
+    Returns {"data_flows": [...], "trust_boundaries": [...], "errors": [(row, message), ...],
+    "error_count": n}; only the first max_errors errors are kept. Raises
+    ModelError if the file as a whole cannot be read.
+    """
+    result = {"data_flows": [], "trust_boundaries": [], "errors": [], "error_count": 0}
+    targets = {"flow": result["data_flows"], "boundary": result["trust_boundaries"]}
+    for number, row in read_rows(stream, filename):
+        try:
+            kind, element = parse_row(row)
+        except ModelError as e:
+            result["error_count"] += 1
+            if len(result["errors"]) < max_errors:
+                result["errors"].append((number, str(e)))
+            continue
+        targets[kind].append(element)
+    return result
@@ -0,0 +1,442 @@
+"""Catalog of threat templates shared by every analysis result.
+
+The mitigation, ASVS, SAMM and controls text of a threat only depends on the
+rule that raised it, so it is stored once per rule as a ``ThreatTemplate``.
+Analysis results hold compact ``Threat`` records that point at a template
+and carry just the interpolated values (flow endpoints, boundary name, ...),
+the DFD element and the threat number. Full dicts are built lazily when a
+threat is rendered or exported.
+"""
+import string
+import sys
+
+CATALOG = {}
+
+
+class ThreatTemplate:
+    """Shared text of one threat rule, with {placeholders} for per-element values."""
+
+    __slots__ = ("id", "type", "description", "stride", "mitigation", "asvs", "samm", "controls", "fields")
+
+    def __init__(self, template_id, threat_type, description, stride, mitigation, asvs, samm, controls=None):
+        self.id = sys.intern(template_id)
+        self.type = threat_type
+        self.description = description
+        self.stride = stride
+        self.mitigation = mitigation
+        self.asvs = asvs
+        self.samm = samm
+        self.controls = controls
+        fields = []
+        for text in (description, mitigation, controls or ""):
+            for _, name, _, _ in string.Formatter().parse(text):
+                if name and name not in fields:
+                    fields.append(name)
+        self.fields = tuple(fields)
+
+    def __repr__(self):
+        return f"ThreatTemplate({self.id!r})"
+
+
+class Threat:
+    """Compact threat record: a catalog template plus its interpolated values.
+
+    Supports read-only dict-style access (``threat["description"]``,
+    ``"controls" in threat``, ``dict(threat)``) so renderers can use it like
+    the dicts the analysis used to build.
+    """
+
+    __slots__ = ("template", "values", "dfd_element", "number")
+
+    def __init__(self, template, values=(), dfd_element=None, number=None):
+        self.template = template
+        self.values = values
+        self.dfd_element = dfd_element
+        self.number = number
+
+    @property
+    def id(self):
+        return f"T{self.number}" if self.number is not None else None
+
+    def keys(self):
+        keys = ["id"] if self.number is not None else []
+        keys += ["type", "description", "stride", "mitigation", "asvs", "samm"]
+        if self.dfd_element is not None:
+            keys.append("dfd_element")
+        if self.template.controls:
+            keys.append("controls")
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        template = self.template
+        if key in ("type", "stride", "asvs", "samm"):
+            return getattr(template, key)
+        if key in ("description", "mitigation") or (key == "controls" and template.controls):
+            return self._interpolate(getattr(template, key))
+        if key == "id" and self.number is not None:
+            return self.id
+        if key == "dfd_element" and self.dfd_element is not None:
+            return self.dfd_element
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Materialize the full threat dict for rendering or export."""
+        return {key: self[key] for key in self.keys()}
+
+    def _interpolate(self, text):
+        if not self.values:
+            return text
+        return text.format(**dict(zip(self.template.fields, self.values)))
+
+    def __repr__(self):
+        return f"Threat({self.template.id!r}, {self.values!r}, dfd_element={self.dfd_element!r}, number={self.number!r})"
+
+
+def make_threat(template_id, dfd_element=None, number=None, **fields):
+    """Build a Threat for a catalog template, interning its per-element values."""
+    template = CATALOG[template_id]
+    values = tuple(sys.intern(fields[name]) for name in template.fields)
+    if dfd_element is not None:
+        dfd_element = sys.intern(dfd_element)
+    return Threat(template, values, dfd_element, number)
+
+
+def _template(template_id, threat_type, description, stride, mitigation, asvs, samm, controls=None):
+    CATALOG[template_id] = ThreatTemplate(template_id, threat_type, description, stride, mitigation, asvs, samm, controls)
+
+
+# Rules behind app.py
+_template(
+    "generic.public_app_spoofing",
+    "Spoofing",
+    "Public-facing application vulnerable to impersonation attacks.",
+    "Spoofing",
+    "Implement strong authentication mechanisms such as multi-factor authentication (MFA) and OAuth 2.0 with short-lived tokens.",
+    "V2.1.1 - Verify strong authentication controls; V2.7.1 - Verify session management.",
+    "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Define authentication policies.",
+    controls="Use MFA (e.g., TOTP, biometrics), OAuth 2.0 with PKCE, and secure session cookies with HttpOnly and Secure flags."
+)
+_template(
+    "generic.public_app_dos",
+    "Denial of Service",
+    "Public-facing application susceptible to DoS attacks due to high exposure.",
+    "Denial of Service",
+    "Deploy Web Application Firewall (WAF), enable rate limiting, and use CDN with DDoS protection (e.g., AWS CloudFront, Shield).",
+    "V1.10.1 - Verify anti-DoS controls; V13.1.1 - Verify API security.",
+    "Incident Management Level 2 - Implement proactive monitoring; Operations Level 2 - Ensure availability.",
+    controls="Configure WAF rules for common attack patterns, set rate limits (e.g., 100 requests/min per IP), and enable auto-scaling."
+)
+_template(
+    "generic.identity_spoofing",
+    "Spoofing",
+    "Attackers may impersonate legitimate users or services.",
+    "Spoofing",
+    "Use strong session management, validate API tokens, and implement mutual TLS for APIs.",
+    "V2.1.2 - Verify identity validation; V13.2.1 - Verify API authentication.",
+    "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Enforce identity policies.",
+    controls="Implement JWT validation with HMAC-SHA256 and enforce mutual TLS for API endpoints."
+)
+_template(
+    "generic.data_tampering",
+    "Tampering",
+    "Data integrity may be compromised due to insufficient validation.",
+    "Tampering",
+    "Use parameterized queries, apply cryptographic hashing (e.g., SHA-256), and enforce input sanitization.",
+    "V5.1.3 - Verify input validation; V5.3.4 - Verify secure database queries.",
+    "Secure Architecture Level 1 - Define security requirements; Design Level 2 - Implement integrity controls.",
+    controls="Use prepared statements for SQL queries and validate inputs against a whitelist."
+)
+_template(
+    "generic.missing_audit_trail",
+    "Repudiation",
+    "Actions may not be traceable due to lack of audit trails.",
+    "Repudiation",
+    "Implement tamper-proof logging, centralize log storage, and enable log monitoring.",
+    "V7.1.1 - Verify logging controls; V7.2.1 - Verify log integrity.",
+    "Security Operations Level 2 - Enable audit logging; Incident Management Level 2 - Monitor logs.",
+    controls="Use a SIEM system (e.g., AWS CloudTrail, Splunk) and ensure logs include timestamps and user IDs."
+)
+_template(
+    "generic.data_exposure",
+    "Information Disclosure",
+    "Sensitive data may be exposed due to unencrypted storage or weak access controls.",
+    "Information Disclosure",
+    "Encrypt data at rest (AES-256) and in transit (TLS 1.3), enforce least privilege, and use secure key management.",
+    "V4.1.3 - Verify access controls; V9.1.1 - Verify secure communication.",
+    "Secure Architecture Level 2 - Standardize security controls; Implementation Level 2 - Secure data handling.",
+    controls="Use AWS KMS for key management and ensure database encryption with transparent data encryption."
+)
+_template(
+    "generic.resource_exhaustion",
+    "Denial of Service",
+    "System availability may be impacted by resource exhaustion.",
+    "Denial of Service",
+    "Implement rate limiting, use circuit breakers, and deploy auto-scaling groups.",
+    "V1.10.2 - Verify rate limiting; V13.1.2 - Verify API resilience.",
+    "Incident Management Level 2 - Monitor for DoS; Operations Level 2 - Ensure availability.",
+    controls="Set API rate limits (e.g., 1000 requests/hour) and configure auto-scaling triggers based on CPU usage."
+)
+_template(
+    "generic.privilege_escalation",
+    "Elevation of Privilege",
+    "Privilege escalation due to misconfigured roles or third-party vulnerabilities.",
+    "Elevation of Privilege",
+    "Enforce RBAC, segregate duties, audit third-party components, and apply patches promptly.",
+    "V4.2.1 - Verify RBAC; V14.2.3 - Verify dependency management.",
+    "Secure Architecture Level 2 - Implement RBAC; Implementation Level 2 - Manage dependencies.",
+    controls="Use IAM roles with least privilege and scan dependencies with tools like Dependabot."
+)
+_template(
+    "generic.flow_spoofing",
+    "Spoofing",
+    "Unauthorized access in flow from {source} to {destination}.",
+    "Spoofing",
+    "Validate source identity with OAuth 2.0 or JWT and enforce secure session handling.",
+    "V2.1.2 - Verify identity validation; V2.7.3 - Verify session binding.",
+    "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Enforce identity policies.",
+    controls="Implement OAuth 2.0 with PKCE and secure JWT signing with RS256."
+)
+_template(
+    "generic.flow_tampering",
+    "Tampering",
+    "Data integrity risk in flow from {source} to {destination}.",
+    "Tampering",
+    "Use digital signatures or HMAC for integrity and validate inputs at the destination.",
+    "V5.1.4 - Verify data integrity; V5.2.2 - Verify input sanitization.",
+    "Design Level 2 - Implement integrity controls; Verification Level 1 - Validate inputs.",
+    controls="Apply HMAC-SHA256 for data integrity and use schema-based input validation."
+)
+_template(
+    "generic.flow_disclosure",
+    "Information Disclosure",
+    "Sensitive data ({data_type}) exposed in flow from {source} to {destination}.",
+    "Information Disclosure",
+    "Encrypt data with TLS 1.3, mask sensitive data in logs, and restrict access.",
+    "V9.1.2 - Verify encryption in transit; V4.1.4 - Verify access restrictions.",
+    "Implementation Level 2 - Secure data handling; Operations Level 2 - Protect sensitive data.",
+    controls="Use TLS 1.3 with strong ciphers and implement data masking for logs."
+)
+_template(
+    "generic.flow_dos",
+    "Denial of Service",
+    "Potential DoS attack targeting {destination} in data flow.",
+    "Denial of Service",
+    "Implement rate limiting, use circuit breakers, and monitor traffic anomalies.",
+    "V1.10.2 - Verify rate limiting; V13.1.2 - Verify API resilience.",
+    "Incident Management Level 2 - Monitor for DoS; Operations Level 2 - Ensure availability.",
+    controls="Configure circuit breakers with a 5-second timeout and monitor with AWS CloudWatch."
+)
+_template(
+    "generic.boundary_spoofing",
+    "Spoofing",
+    "Cross-boundary spoofing in {name}.",
+    "Spoofing",
+    "Enforce mutual TLS, use API gateway authentication, and validate cross-boundary requests.",
+    "V2.1.3 - Verify boundary authentication; V13.2.1 - Verify API security.",
+    "Threat Assessment Level 2 - Model boundary risks; Governance Level 2 - Define boundary policies.",
+    controls="Implement mutual TLS with client certificates and use AWS API Gateway for authentication."
+)
+_template(
+    "generic.boundary_tampering",
+    "Tampering",
+    "Data tampering within {name} due to weak controls.",
+    "Tampering",
+    "Use integrity checks (e.g., checksums), secure coding, and validate data within the boundary.",
+    "V5.1.3 - Verify input validation; V5.3.5 - Verify secure coding.",
+    "Design Level 2 - Implement integrity controls; Verification Level 2 - Validate boundary controls.",
+    controls="Apply SHA-256 checksums and use OWASP secure coding guidelines."
+)
+_template(
+    "generic.boundary_privilege_escalation",
+    "Elevation of Privilege",
+    "Privilege escalation within {name} due to misconfigured access controls.",
+    "Elevation of Privilege",
+    "Implement RBAC, segregate duties, and audit permissions regularly.",
+    "V4.2.2 - Verify segregation of duties; V4.2.1 - Verify RBAC.",
+    "Secure Architecture Level 2 - Implement RBAC; Governance Level 2 - Audit permissions.",
+    controls="Define granular IAM roles and audit with AWS Config."
+)
+_template(
+    "generic.component_spoofing",
+    "Spoofing",
+    "Impersonation of {component} in diagram.",
+    "Spoofing",
+    "Secure {component} with strong authentication (e.g., OAuth, certificates).",
+    "V2.1.1 - Verify authentication controls; V13.2.2 - Verify API authentication.",
+    "Threat Assessment Level 1 - Identify component risks; Governance Level 2 - Enforce authentication.",
+    controls="Use OAuth 2.0 for {component} authentication and validate certificates."
+)
+_template(
+    "generic.component_disclosure",
+    "Information Disclosure",
+    "Data exposure in {component} due to unencrypted channels.",
+    "Information Disclosure",
+    "Encrypt data flows to/from {component} and restrict access.",
+    "V9.1.1 - Verify secure communication; V4.1.3 - Verify access controls.",
+    "Implementation Level 2 - Secure data flows; Operations Level 2 - Protect components.",
+    controls="Enable TLS 1.3 for {component} and restrict access with IAM policies."
+)
+_template(
+    "generic.component_dos",
+    "Denial of Service",
+    "Resource exhaustion targeting {component} in diagram.",
+    "Denial of Service",
+    "Implement rate limiting and auto-scaling for {component}.",
+    "V1.10.1 - Verify anti-DoS controls; V13.1.1 - Verify API resilience.",
+    "Incident Management Level 2 - Monitor components; Operations Level 2 - Ensure availability.",
+    controls="Configure rate limiting and auto-scaling for {component} using AWS services."
+)
+_template(
+    "generic.attack_path",
+    "Elevation of Privilege",
+    "Attack path from untrusted {entry} reaches sensitive {sink} in {hops} hops: {path}.",
+    "Elevation of Privilege",
+    "Segment the path to {sink} and authenticate and authorize every hop so one compromised component cannot reach it.",
+    "V1.4.1 - Verify access control at trusted enforcement points; V4.1.3 - Verify least privilege.",
+    "Threat Assessment Level 2 - Model attack paths; Secure Architecture Level 2 - Enforce segmentation.",
+    controls="Use network segmentation, mutual TLS between services and per-service credentials with least privilege."
+)
+
+# Rules behind threat_modeling_app.py
+_template(
+    "ecommerce.credential_theft",
+    "Spoofing",
+    "Hackers impersonate users by stealing credentials.",
+    "Spoofing",
+    "Implement multi-factor authentication and secure session management.",
+    "V2.1.1 - Verify strong authentication; V2.7.1 - Verify session management.",
+    "Threat Assessment Level 1 - Identify authentication risks; Governance Level 2 - Define policies.",
+    controls="Use MFA (e.g., TOTP) and HTTP-only, Secure cookies."
+)
+_template(
+    "ecommerce.cart_tampering",
+    "Tampering",
+    "Users modify cart data (e.g., price).",
+    "Tampering",
+    "Validate inputs server-side and use signed tokens for integrity.",
+    "V5.1.3 - Verify input validation; V5.3.4 - Verify secure queries.",
+    "Secure Architecture Level 1 - Define security requirements; Design Level 2 - Integrity controls.",
+    controls="Use HMAC-SHA256 for data integrity and whitelist input validation."
+)
+_template(
+    "ecommerce.order_repudiation",
+    "Repudiation",
+    "Users deny placing orders due to missing logs.",
+    "Repudiation",
+    "Log all user actions with timestamps and IDs.",
+    "V7.1.1 - Verify logging controls; V7.2.1 - Verify log integrity.",
+    "Security Operations Level 2 - Enable audit logging; Incident Management Level 2 - Monitor logs.",
+    controls="Use AWS CloudTrail for logging and ensure log integrity."
+)
+_template(
+    "ecommerce.data_exposure",
+    "Information Disclosure",
+    "Sensitive data exposed in transit or storage.",
+    "Information Disclosure",
+    "Use HTTPS and encrypt sensitive database fields.",
+    "V9.1.1 - Verify secure communication; V4.1.3 - Verify access controls.",
+    "Implementation Level 2 - Secure data handling; Operations Level 2 - Protect data.",
+    controls="Enable TLS 1.3 and use AES-256 for database encryption."
+)
+_template(
+    "ecommerce.payment_disclosure",
+    "Information Disclosure",
+    "Payment details exposed in transit to third-party service.",
+    "Information Disclosure",
+    "Use HTTPS and secure API tokens for third-party communication.",
+    "V9.1.1 - Verify secure communication; V13.2.1 - Verify API security.",
+    "Implementation Level 2 - Secure data handling; Operations Level 2 - Protect data.",
+    controls="Use TLS 1.3 and OAuth 2.0 for Stripe API."
+)
+_template(
+    "ecommerce.flooding",
+    "Denial of Service",
+    "Flooding disrupts availability.",
+    "Denial of Service",
+    "Implement rate limiting and use a CDN for traffic spikes.",
+    "V1.10.1 - Verify anti-DoS controls; V13.1.1 - Verify API resilience.",
+    "Incident Management Level 2 - Monitor for DoS; Operations Level 2 - Ensure availability.",
+    controls="Configure rate limiting (100 requests/min) and use AWS CloudFront."
+)
+_template(
+    "ecommerce.weak_rbac",
+    "Elevation of Privilege",
+    "Weak role-based access controls allow privilege escalation.",
+    "Elevation of Privilege",
+    "Enforce strict RBAC and validate roles server-side.",
+    "V4.2.1 - Verify RBAC; V4.2.2 - Verify segregation of duties.",
+    "Secure Architecture Level 2 - Implement RBAC; Governance Level 2 - Audit permissions.",
+    controls="Use AWS IAM roles with least privilege."
+)
+_template(
+    "ecommerce.flow_spoofing",
+    "Spoofing",
+    "Unauthorized access in flow from {source} to {destination}.",
+    "Spoofing",
+    "Validate source identity with OAuth 2.0 or JWT.",
+    "V2.1.2 - Verify identity validation; V2.7.3 - Verify session binding.",
+    "Threat Assessment Level 1 - Identify risks; Governance Level 2 - Enforce policies.",
+    controls="Use OAuth 2.0 with PKCE and RS256 JWT signing."
+)
+_template(
+    "ecommerce.flow_tampering",
+    "Tampering",
+    "Data integrity risk in flow from {source} to {destination}.",
+    "Tampering",
+    "Use digital signatures and validate inputs at destination.",
+    "V5.1.4 - Verify data integrity; V5.2.2 - Verify input sanitization.",
+    "Design Level 2 - Integrity controls; Verification Level 1 - Validate inputs.",
+    controls="Apply HMAC-SHA256 and schema-based validation."
+)
+_template(
+    "ecommerce.flow_disclosure",
+    "Information Disclosure",
+    "Sensitive data ({data_type}) exposed in flow from {source} to {destination}.",
+    "Information Disclosure",
+    "Encrypt data with TLS 1.3 and mask sensitive data in logs.",
+    "V9.1.2 - Verify encryption; V4.1.4 - Verify access restrictions.",
+    "Implementation Level 2 - Secure data; Operations Level 2 - Protect data.",
+    controls="Use TLS 1.3 and data masking for logs."
+)
+_template(
+    "ecommerce.boundary_spoofing",
+    "Spoofing",
+    "Cross-boundary spoofing in {name}.",
+    "Spoofing",
+    "Enforce mutual TLS and validate cross-boundary requests.",
+    "V2.1.3 - Verify boundary authentication; V13.2.1 - Verify API security.",
+    "Threat Assessment Level 2 - Model boundary risks; Governance Level 2 - Define policies.",
+    controls="Use mutual TLS with client certificates."
+)
+_template(
+    "ecommerce.boundary_tampering",
+    "Tampering",
+    "Data tampering within {name} due to weak controls.",
+    "Tampering",
+    "Use integrity checks and secure coding practices.",
+    "V5.1.3 - Verify input validation; V5.3.5 - Verify secure coding.",
+    "Design Level 2 - Integrity controls; Verification Level 2 - Validate controls.",
+    controls="Apply SHA-256 checksums and OWASP guidelines."
+)
+_template(
+    "ecommerce.attack_path",
+    "Elevation of Privilege",
+    "Attackers in {entry} can reach {sink} in {hops} hops: {path}.",
+    "Elevation of Privilege",
+    "Segment the backend and authorize every hop towards {sink}.",
+    "V1.4.1 - Verify access control enforcement; V4.1.3 - Verify least privilege.",
+    "Threat Assessment Level 2 - Model attack paths; Secure Architecture Level 2 - Enforce segmentation.",
+    controls="Use security groups and mutual TLS between services."
+)
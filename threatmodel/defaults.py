@@ -0,0 +1,19 @@
+"""Example models the apps start from."""
+
+# The e-commerce system threat_modeling_app.py opens with
+ECOMMERCE_MODEL = {
+    "text_input": (
+        "E-commerce web app with a React frontend, Node.js backend API, MySQL database, and Stripe payment gateway. "
+        "The app is public-facing, handles user authentication, and processes sensitive data like PII and payment details."
+    ),
+    "data_flows": [
+        {"source": "Frontend", "destination": "Backend", "dataType": "User Input (PII, Credentials)"},
+        {"source": "Backend", "destination": "Database", "dataType": "User Data, Orders"},
+        {"source": "Backend", "destination": "Payment Gateway", "dataType": "Payment Details"}
+    ],
+    "trust_boundaries": [
+        {"name": "Frontend Boundary", "description": "Untrusted client-side React app running on user devices"},
+        {"name": "Backend Boundary", "description": "Trusted server-side Node.js API and MySQL database"},
+        {"name": "Payment Gateway Boundary", "description": "External third-party Stripe service"}
+    ],
+}
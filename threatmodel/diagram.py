@@ -0,0 +1,179 @@
+"""Graphviz DOT construction for the data flow diagrams.
+
+Each diagram is drawn element by element with the ``add_*`` helpers, which
+incremental.py reuses to patch an existing graph. graphviz is imported on
+first use, so analysis-only processes never load it.
+"""
+from threatmodel.attack_paths import path_sink
+from threatmodel.boundary_index import BoundaryIndex
+
+# Node styles of the e-commerce diagram, by component name
+ECOMMERCE_NODE_STYLES = {
+    "Frontend": {"shape": "oval", "style": "filled", "fillcolor": "lightcoral", "color": "red"},
+    "Backend": {"shape": "box", "style": "filled", "fillcolor": "lightblue", "color": "blue"},
+    "Database": {"shape": "cylinder", "style": "filled", "fillcolor": "lightblue", "color": "blue"},
+    "Payment Gateway": {"shape": "oval", "style": "filled", "fillcolor": "lightgreen", "color": "green"}
+}
+_DEFAULT_NODE_STYLE = {"shape": "box", "style": "filled", "fillcolor": "white", "color": "black"}
+
+# Outline of the nodes and edges on attack paths
+PATH_HIGHLIGHT = {"color": "orangered", "penwidth": "3"}
+
+
+def new_digraph(comment):
+    """Return an empty Digraph, importing graphviz on first use."""
+    from graphviz import Digraph
+    return Digraph(comment=comment, format="png")
+
+
+def add_to_cluster(dot, boundary, nodes):
+    """Add nodes to a boundary's cluster; DOT merges a re-opened cluster with the original."""
+    with dot.subgraph(name=f"cluster_{boundary['name']}") as c:
+        for node in nodes:
+            c.node(node)
+
+
+def new_generic_diagram():
+    """Return the empty diagram app.py draws on."""
+    dot = new_digraph("Data Flow Diagram")
+    dot.attr(rankdir="LR", size="8,5")
+    return dot
+
+
+def path_highlights(paths):
+    """Return the (nodes, (source, destination) edges) of attack paths, to draw them highlighted."""
+    nodes = set()
+    edges = set()
+    for _, path in paths:
+        nodes.update(path)
+        edges.update(zip(path, path[1:]))
+    return nodes, edges
+
+
+def add_generic_node(dot, node, highlight=False):
+    dot.node(node, node, shape="box", **(PATH_HIGHLIGHT if highlight else {}))
+
+
+def add_generic_edge(dot, flow, highlight=False):
+    dot.edge(flow["source"], flow["destination"], label=flow["dataType"], **(PATH_HIGHLIGHT if highlight else {}))
+
+
+def add_generic_cluster(dot, boundary, members):
+    with dot.subgraph(name=f"cluster_{boundary['name']}") as c:
+        c.attr(label=boundary["name"], style="dashed")
+        for node in members:
+            c.node(node)
+
+
+def build_generic_diagram(data_flows, trust_boundaries, paths=(), edge_lines=None):
+    """Build the diagram of data flows and trust boundaries used by app.py.
+
+    The nodes and edges of the attack paths in paths are highlighted. If
+    edge_lines is a list, the body position of each flow's edge is appended
+    to it, so the edge can be redrawn later.
+    """
+    dot = new_generic_diagram()
+    path_nodes, path_edges = path_highlights(paths)
+
+    # Add nodes for data flow sources and destinations
+    nodes = set()
+    for flow in data_flows:
+        nodes.add(flow["source"])
+        nodes.add(flow["destination"])
+    for node in sorted(nodes):
+        add_generic_node(dot, node, node in path_nodes)
+
+    # Add data flow edges
+    for flow in data_flows:
+        if edge_lines is not None:
+            edge_lines.append(len(dot.body))
+        add_generic_edge(dot, flow, (flow["source"], flow["destination"]) in path_edges)
+
+    # Add trust boundaries as subgraphs
+    # Assume components mentioned in boundary description are nodes
+    members = BoundaryIndex([boundary["description"]] for boundary in trust_boundaries).members(sorted(nodes))
+    for position, boundary in enumerate(trust_boundaries):
+        add_generic_cluster(dot, boundary, members.get(position, ()))
+
+    return dot
+
+
+def new_ecommerce_diagram():
+    """Return the empty diagram threat_modeling_app.py draws on."""
+    dot = new_digraph("Data Flow Diagram")
+    dot.attr(rankdir="TB", size="10,8", fontname="Arial", bgcolor="white", splines="polyline")
+    dot.attr("node", fontname="Arial", fontsize="12")
+    dot.attr("edge", fontname="Arial", fontsize="10")
+    return dot
+
+
+def add_threat_labels(labels, threats):
+    """Record "ID: type" labels of threats under their DFD element in labels; attack paths go on their sink."""
+    for threat in threats:
+        element = threat.get("dfd_element", "")
+        labels.setdefault(path_sink(element) or element, []).append(f"{threat.get('id', '')}: {threat['type']}")
+    return labels
+
+
+def add_ecommerce_node(dot, node, labels, highlight=False):
+    threat_label = labels.get(node, [])
+    label = f"{node}\nThreats: {', '.join(threat_label) if threat_label else 'None'}"
+    attrs = dict(ECOMMERCE_NODE_STYLES.get(node, _DEFAULT_NODE_STYLE), penwidth="2" if threat_label else "1")
+    if highlight:
+        attrs.update(PATH_HIGHLIGHT)
+    dot.node(node, label, **attrs)
+
+
+def add_ecommerce_edge(dot, flow, labels, highlight=False):
+    threat_label = labels.get(f"{flow['source']} → {flow['destination']}", [])
+    label = f"{flow['dataType']}\nThreats: {', '.join(threat_label) if threat_label else 'None'}"
+    attrs = {"color": "red" if threat_label else "black", "penwidth": "2" if threat_label else "1"}
+    if highlight:
+        attrs.update(PATH_HIGHLIGHT)
+    dot.edge(flow["source"], flow["destination"], label=label, **attrs)
+
+
+def add_ecommerce_cluster(dot, boundary, members, labels):
+    with dot.subgraph(name=f"cluster_{boundary['name']}") as c:
+        c.attr(label=f"{boundary['name']}\nThreats: {', '.join(labels.get(boundary['name'], []) or ['None'])}",
+               style="dashed", color="purple", fontname="Arial", fontsize="12", penwidth="2")
+        for node in members:
+            c.node(node)
+
+
+def build_ecommerce_diagram(data_flows, trust_boundaries, threats, paths=(), edge_lines=None):
+    """Build the refined DFD with numbered threat IDs used by threat_modeling_app.py.
+
+    threats may be any iterable, such as a live iter_ecommerce_threats()
+    stream; it is consumed once. paths and edge_lines work as in
+    build_generic_diagram().
+    """
+    dot = new_ecommerce_diagram()
+    path_nodes, path_edges = path_highlights(paths)
+
+    # Add nodes for data flow sources and destinations
+    nodes = set()
+    for flow in data_flows:
+        nodes.add(flow["source"])
+        nodes.add(flow["destination"])
+
+    # Map threats to nodes, edges and boundaries
+    labels = add_threat_labels({}, threats)
+
+    # Add nodes with refined styles and threat IDs
+    for node in sorted(nodes):
+        add_ecommerce_node(dot, node, labels, node in path_nodes)
+
+    # Add data flow edges with threat IDs
+    for flow in data_flows:
+        if edge_lines is not None:
+            edge_lines.append(len(dot.body))
+        add_ecommerce_edge(dot, flow, labels, (flow["source"], flow["destination"]) in path_edges)
+
+    # Add trust boundaries as subgraphs holding the nodes their name or description mentions
+    members = BoundaryIndex((boundary["description"], boundary["name"]) for boundary in trust_boundaries).members(sorted(nodes))
+    for position, boundary in enumerate(trust_boundaries):
+        add_ecommerce_cluster(dot, boundary, members.get(position, ()), labels)
+
+    return dot
+
@@ -0,0 +1,15 @@
+"""Canonical fingerprints of threat models."""
+import hashlib
+import json
+
+
+def model_fingerprint(text_input, data_flows, trust_boundaries, has_diagram=False):
+    """Return a stable hash of everything the threat analysis depends on."""
+    model = {
+        "text_input": text_input or "",
+        "data_flows": list(data_flows),
+        "trust_boundaries": list(trust_boundaries),
+        "has_diagram": bool(has_diagram),
+    }
+    canonical = json.dumps(model, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
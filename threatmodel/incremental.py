@@ -0,0 +1,324 @@
+"""Incremental threat analysis and diagram construction for one editing session.
+
+Adding a data flow or trust boundary in the apps appends to the session's
+lists and reruns the script. ``IncrementalModel.sync`` notices that only new
+elements were appended and runs the rules for just those elements, keeping a
+threat list per element, so the cost of an edit depends on the size of the
+change rather than of the model. E-commerce threat numbers continue from the
+last one handed out, so the IDs of existing threats never change.
+
+The DOT graph is patched the same way: a new flow adds its nodes and edge
+(and re-opens the clusters of the boundaries that mention a new node), a new
+boundary adds its cluster holding the nodes it mentions. Any other change,
+such as a removed or edited element, falls back to a full rebuild.
+
+Attack paths depend on the whole graph, so they are searched again after
+each edit (see attack_paths.py) and drawn over a copy of the graph by
+``layout``: their nodes are re-declared with the highlight (DOT merges the
+attributes) and their edges redrawn in place at the body position recorded
+when each was first drawn. An e-commerce path keeps its threat number while
+it exists.
+"""
+import copy
+
+from threatmodel.analysis import (
+    ecommerce_baseline_threats,
+    ecommerce_boundary_threats,
+    ecommerce_flow_threats,
+    ecommerce_path_threats,
+    generic_boundary_threats,
+    generic_components,
+    generic_diagram_threats,
+    generic_flow_threats,
+    generic_path_threats,
+    generic_system_threats,
+)
+from threatmodel.attack_paths import AttackGraph
+from threatmodel.boundary_index import BoundaryIndex, tokenize
+from threatmodel.diagram import (
+    add_ecommerce_cluster,
+    add_ecommerce_edge,
+    add_ecommerce_node,
+    add_generic_cluster,
+    add_generic_edge,
+    add_generic_node,
+    add_threat_labels,
+    add_to_cluster,
+    build_ecommerce_diagram,
+    build_generic_diagram,
+    path_highlights,
+)
+from threatmodel.partition import apply_engine, choose_engine
+
+RULESETS = ("generic", "ecommerce")
+
+
+class IncrementalModel:
+    """Threats and DOT graph of a model that is mostly edited by appending elements."""
+
+    def __init__(self, ruleset="generic"):
+        if ruleset not in RULESETS:
+            raise ValueError(f"Unknown rule set: {ruleset}")
+        self.ruleset = ruleset
+        self._reset()
+
+    def _reset(self):
+        self._text_input = None
+        self._has_diagram = None
+        self._flow_source = None
+        self._boundary_source = None
+        self._flows = []
+        self._boundaries = []
+        self._system_threats = []
+        self._element_threats = []
+        self._diagram_threats = []
+        self._threats = None
+        self._graph = AttackGraph()
+        self._path_threats = None
+        self._path_numbers = {}
+        self._next_number = 1
+        self._dot = None
+        if self.ruleset == "ecommerce":
+            self._system_threats = self._numbered(ecommerce_baseline_threats())
+
+    def _numbered(self, threats):
+        """Give threats the next free numbers and return them as a list."""
+        threats = list(threats)
+        for threat in threats:
+            threat.number = self._next_number
+            self._next_number += 1
+        return threats
+
+    def _texts(self, boundary):
+        """Return the boundary texts the diagram searches for node names."""
+        if self.ruleset == "ecommerce":
+            return (boundary["description"], boundary["name"])
+        return (boundary["description"],)
+
+    @staticmethod
+    def _appended(current, source, seen):
+        """Return the elements appended to current since it matched seen, or None if it changed otherwise."""
+        count = len(seen)
+        if len(current) < count:
+            return None
+        if current is source:
+            # The apps only ever append, so checking the last known element is enough
+            if count and current[count - 1] != seen[-1]:
+                return None
+        elif current[:count] != seen:
+            return None
+        return current[count:]
+
+    def sync(self, text_input, data_flows, trust_boundaries, has_diagram=False):
+        """Bring the model up to date with the given state, analyzing only what changed."""
+        flows = self._appended(data_flows, self._flow_source, self._flows)
+        boundaries = self._appended(trust_boundaries, self._boundary_source, self._boundaries)
+        if flows is None or boundaries is None:
+            self._reset()
+            flows, boundaries = data_flows, trust_boundaries
+        self._flow_source = data_flows
+        self._boundary_source = trust_boundaries
+
+        # The generic system and diagram threats only depend on the description
+        if self.ruleset == "generic" and (text_input, bool(has_diagram)) != (self._text_input, self._has_diagram):
+            components = generic_components(text_input or "")
+            self._system_threats = list(generic_system_threats(components))
+            self._diagram_threats = list(generic_diagram_threats(components)) if has_diagram else []
+            self._text_input = text_input
+            self._has_diagram = bool(has_diagram)
+            self._threats = None
+
+        for flow in flows:
+            self.add_flow(flow)
+        for boundary in boundaries:
+            self.add_boundary(boundary)
+        return self
+
+    def add_flow(self, flow):
+        """Analyze one new data flow and draw it."""
+        flow = dict(flow)
+        self._flows.append(flow)
+        self._graph.add_flow(flow)
+        self._path_threats = None
+        if self.ruleset == "ecommerce":
+            threats = self._numbered(ecommerce_flow_threats(flow))
+        else:
+            threats = list(generic_flow_threats(flow))
+        self._element_threats.extend(threats)
+        self._threats = None
+        if self._dot is not None:
+            self._draw_flow(flow, threats)
+
+    def add_boundary(self, boundary):
+        """Analyze one new trust boundary and draw it."""
+        boundary = dict(boundary)
+        self._boundaries.append(boundary)
+        self._graph.add_boundary(boundary)
+        self._path_threats = None
+        if self.ruleset == "ecommerce":
+            threats = self._numbered(ecommerce_boundary_threats(boundary))
+        else:
+            threats = list(generic_boundary_threats(boundary))
+        self._element_threats.extend(threats)
+        self._threats = None
+        if self._dot is not None:
+            self._draw_boundary(boundary, threats)
+
+    def copy(self):
+        """Return an independent copy that shares the (read-only) threat records."""
+        other = copy.copy(self)
+        other._flows = list(self._flows)
+        other._boundaries = list(self._boundaries)
+        other._system_threats = list(self._system_threats)
+        other._element_threats = list(self._element_threats)
+        other._diagram_threats = list(self._diagram_threats)
+        other._graph = copy.deepcopy(self._graph)
+        other._path_numbers = dict(self._path_numbers)
+        if self._dot is not None:
+            other._dot = self._dot.copy()
+            other._boundary_index = copy.deepcopy(self._boundary_index)
+            other._nodes = set(self._nodes)
+            other._nodes_by_word = {word: set(nodes) for word, nodes in self._nodes_by_word.items()}
+            other._edge_lines = {edge: list(lines) for edge, lines in self._edge_lines.items()}
+            if self.ruleset == "ecommerce":
+                other._labels = {element: list(labels) for element, labels in self._labels.items()}
+        return other
+
+    def _element_threats_all(self):
+        return self._system_threats + self._element_threats + self._diagram_threats
+
+    def threats(self):
+        """Return the threats of the model, system threats first, then per element in the order added, then attack paths.
+
+        E-commerce threats are in ID order instead: a path keeps its number
+        across edits, so it can be older than the threats of later elements.
+        """
+        if self._threats is None:
+            self._threats = self._element_threats_all() + self.path_threats()
+            if self.ruleset == "ecommerce":
+                self._threats.sort(key=lambda threat: threat.number)
+        return self._threats
+
+    def attack_paths(self):
+        """Return the model's attack paths as (entry point, node names) pairs."""
+        return self._graph.paths()
+
+    def path_threats(self):
+        """Return one threat per attack path."""
+        if self._path_threats is None:
+            if self.ruleset == "ecommerce":
+                self._path_threats = list(ecommerce_path_threats(self.attack_paths()))
+                # Keyed on the path's DFD element, which keeps the case of its entry point and nodes
+                for threat in self._path_threats:
+                    number = self._path_numbers.get(threat.dfd_element)
+                    if number is None:
+                        number = self._path_numbers[threat.dfd_element] = self._next_number
+                        self._next_number += 1
+                    threat.number = number
+            else:
+                self._path_threats = list(generic_path_threats(self.attack_paths()))
+        return self._path_threats
+
+    def result(self):
+        """Return the {"threats": [...]} dict the apps show; treat it as read-only."""
+        return {"threats": self.threats()}
+
+    def diagram(self):
+        """Return the DOT graph of the model, built once and patched as elements are added."""
+        if self._dot is None:
+            edge_lines = []
+            if self.ruleset == "ecommerce":
+                # Attack paths change with every edit, so layout() draws them on a copy
+                threats = self._element_threats_all()
+                self._dot = build_ecommerce_diagram(self._flows, self._boundaries, threats, edge_lines=edge_lines)
+                self._labels = add_threat_labels({}, threats)
+            else:
+                self._dot = build_generic_diagram(self._flows, self._boundaries, edge_lines=edge_lines)
+            # (source, destination) -> [(body position, flow)] of the edges drawn
+            self._edge_lines = {}
+            for flow, position in zip(self._flows, edge_lines):
+                self._edge_lines.setdefault((flow["source"], flow["destination"]), []).append((position, flow))
+            self._boundary_index = BoundaryIndex(self._texts(boundary) for boundary in self._boundaries)
+            self._nodes = set()
+            self._nodes_by_word = {}
+            for flow in self._flows:
+                self._index_node(flow["source"])
+                self._index_node(flow["destination"])
+        return self._dot
+
+    def layout(self):
+        """Return (dot, engine): a copy of the graph with its attack paths highlighted, tuned for the engine its size calls for."""
+        dot = self.diagram().copy()
+        paths = self.attack_paths()
+        if paths:
+            nodes, edges = path_highlights(paths)
+            path_labels = add_threat_labels({}, self.path_threats()) if self.ruleset == "ecommerce" else {}
+            for node in sorted(nodes):
+                # Re-declaring a node merges its attributes; a sink's label lists its path threats too
+                if self.ruleset == "ecommerce":
+                    add_ecommerce_node(dot, node, {node: self._labels.get(node, []) + path_labels.get(node, [])}, True)
+                else:
+                    add_generic_node(dot, node, True)
+            for edge in edges:
+                # Re-declaring an edge would draw a second one, so the highlighted edge replaces its line
+                for position, flow in self._edge_lines.get(edge, ()):
+                    if self.ruleset == "ecommerce":
+                        add_ecommerce_edge(dot, flow, self._labels, True)
+                    else:
+                        add_generic_edge(dot, flow, True)
+                    dot.body[position] = dot.body.pop()
+        engine = choose_engine(len(self._nodes))
+        return apply_engine(dot, engine), engine
+
+    def _index_node(self, node):
+        """Record node, returning True if it is new; nodes are indexed by first word to find boundary members."""
+        if node in self._nodes:
+            return False
+        self._nodes.add(node)
+        words = tokenize(node)
+        if words:
+            self._nodes_by_word.setdefault(words[0], set()).add(node)
+        return True
+
+    def _draw_flow(self, flow, threats):
+        dot = self._dot
+        if self.ruleset == "ecommerce":
+            edge = f"{flow['source']} → {flow['destination']}"
+            if edge in self._labels:
+                # A parallel flow changes the labels already drawn on this edge
+                self._dot = None
+                return
+            add_threat_labels(self._labels, threats)
+        for node in (flow["source"], flow["destination"]):
+            if self._index_node(node):
+                if self.ruleset == "ecommerce":
+                    add_ecommerce_node(dot, node, self._labels)
+                else:
+                    add_generic_node(dot, node)
+                for position in sorted(self._boundary_index.boundaries_for(node)):
+                    add_to_cluster(dot, self._boundaries[position], [node])
+        self._edge_lines.setdefault((flow["source"], flow["destination"]), []).append((len(dot.body), flow))
+        if self.ruleset == "ecommerce":
+            add_ecommerce_edge(dot, flow, self._labels)
+        else:
+            add_generic_edge(dot, flow)
+
+    def _draw_boundary(self, boundary, threats):
+        if self.ruleset == "ecommerce" and threats and (boundary["name"] in self._nodes or boundary["name"] in self._labels):
+            # Its threats change the labels of a node, edge or cluster already drawn under the same name
+            self._dot = None
+            return
+        texts = self._texts(boundary)
+        self._boundary_index.add(texts)
+        # Only nodes starting with a word of the boundary's texts can be mentioned by it
+        candidates = set()
+        for text in texts:
+            for word in tokenize(text):
+                candidates |= self._nodes_by_word.get(word, set())
+        index = BoundaryIndex([texts])
+        members = sorted(node for node in candidates if index.boundaries_for(node))
+        if self.ruleset == "ecommerce":
+            add_threat_labels(self._labels, threats)
+            add_ecommerce_cluster(self._dot, boundary, members, self._labels)
+        else:
+            add_generic_cluster(self._dot, boundary, members)
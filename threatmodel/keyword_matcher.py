@@ -0,0 +1,69 @@
+"""Multi-pattern keyword matching for the STRIDE rule engine.
+
+The rules trigger on dozens of substrings of the same few strings (the system
+description, flow endpoints, data types, boundary names). ``KeywordMatcher``
+compiles all of them into one Aho-Corasick automaton so every keyword
+occurring in a string is found in a single left-to-right pass, with the same
+semantics as a series of ``keyword in text`` checks.
+"""
+from collections import deque
+
+# Flow endpoints and boundary names repeat heavily across a model
+_MAX_CACHED = 4096
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton finding every keyword contained in a string."""
+
+    def __init__(self, keywords):
+        self.keywords = frozenset(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [frozenset()]
+        self._cache = {}
+
+        # Trie of all keywords
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(frozenset())
+                    self._goto[state][char] = nxt
+                state = nxt
+            self._out[state] = self._out[state] | {keyword}
+
+        # Failure links, breadth first so shorter suffixes are resolved first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] | self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Return the frozenset of keywords that occur in text."""
+        found = self._cache.get(text)
+        if found is not None:
+            return found
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                matches |= out[state]
+        found = frozenset(matches)
+        if len(self._cache) >= _MAX_CACHED:
+            self._cache.clear()
+        self._cache[text] = found
+        return found
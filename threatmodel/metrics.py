@@ -0,0 +1,148 @@
+"""Opt-in timing of the pipeline stages behind each Streamlit rerun.
+
+Enable with THREATMODEL_METRICS=1. ``metrics.stage(name, rerun)`` times a
+block into a process-wide histogram and, given a ``rerun`` dict, into that
+rerun's breakdown, which the apps show in a sidebar panel together with the
+session's totals. Histograms, cache hit/miss counters and per-stage totals
+are exported in the Prometheus text format to THREATMODEL_METRICS_FILE
+(rewritten at most every THREATMODEL_METRICS_INTERVAL seconds), e.g. for a
+node_exporter textfile collector. When disabled, ``stage`` hands back a
+shared no-op context manager, so the hooks can stay in place.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Process-wide stage histograms and cache statistics."""
+
+    def __init__(self, enabled=False, path=None, write_interval=10.0):
+        self.enabled = enabled
+        self.path = path
+        self.write_interval = write_interval
+        self._histograms = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def stage(self, name, rerun=None):
+        """Return a context manager timing a block as stage name."""
+        if not self.enabled:
+            return _NOOP
+        return self._timed(name, rerun)
+
+    @contextmanager
+    def _timed(self, name, rerun):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(name, elapsed)
+            if rerun is not None:
+                rerun[name] = rerun.get(name, 0.0) + elapsed
+
+    def observe(self, name, seconds):
+        """Record one duration for stage name."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram()
+            histogram.buckets[bisect_left(BUCKETS, seconds)] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def register_cache(self, name, stats):
+        """Export a cache whose stats() returns (hits, misses)."""
+        self._caches[name] = stats
+
+    def cache_stats(self):
+        """Return {cache: (hits, misses, hit rate or None)}."""
+        result = {}
+        for name, stats in sorted(self._caches.items()):
+            hits, misses = stats()
+            result[name] = (hits, misses, hits / (hits + misses) if hits + misses else None)
+        return result
+
+    def prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP threatmodel_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE threatmodel_stage_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {name: (list(h.buckets), h.sum, h.count) for name, h in self._histograms.items()}
+        for name, (buckets, total, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, observed in zip(BUCKETS + ("+Inf",), buckets):
+                cumulative += observed
+                lines.append(f'threatmodel_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'threatmodel_stage_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'threatmodel_stage_seconds_count{{stage="{name}"}} {count}')
+
+        stats = self.cache_stats()
+        lines.append("# HELP threatmodel_cache_hits_total Cache lookups answered from the cache.")
+        lines.append("# TYPE threatmodel_cache_hits_total counter")
+        lines.extend(f'threatmodel_cache_hits_total{{cache="{name}"}} {hits}' for name, (hits, _, _) in stats.items())
+        lines.append("# HELP threatmodel_cache_misses_total Cache lookups that had to compute the result.")
+        lines.append("# TYPE threatmodel_cache_misses_total counter")
+        lines.extend(f'threatmodel_cache_misses_total{{cache="{name}"}} {misses}' for name, (_, misses, _) in stats.items())
+        return "\n".join(lines) + "\n"
+
+    def maybe_write(self):
+        """Rewrite the metrics file if one is configured and the interval has passed."""
+        if not self.enabled or not self.path:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_write < self.write_interval:
+                return
+            self._last_write = now
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Metrics must never break the app
+
+
+def add_to_totals(totals, rerun):
+    """Fold one rerun's stage timings into a session's {stage: [count, seconds]} totals."""
+    for name, seconds in rerun.items():
+        entry = totals.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+    return totals
+
+
+def metrics_from_env():
+    """Build the shared registry from THREATMODEL_METRICS* environment variables."""
+    return Metrics(
+        enabled=os.environ.get("THREATMODEL_METRICS", "").lower() in ("1", "true", "yes", "on"),
+        path=os.environ.get("THREATMODEL_METRICS_FILE") or None,
+        write_interval=float(os.environ.get("THREATMODEL_METRICS_INTERVAL", "10")),
+    )
+
+
+# Process-wide instance shared by every Streamlit session
+metrics = metrics_from_env()
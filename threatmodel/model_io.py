@@ -0,0 +1,96 @@
+"""Loading and validating threat models stored as JSON or YAML files."""
+import json
+import os
+
+MODEL_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class ModelError(ValueError):
+    """Raised when a model file is unreadable or malformed."""
+
+
+def validate_flow(flow):
+    """Return flow as a clean data flow dict, or raise ModelError."""
+    if not isinstance(flow, dict):
+        raise ModelError("data flow must be an object with source, destination and dataType")
+    for field in ("source", "destination", "dataType"):
+        if not isinstance(flow.get(field), str) or not flow[field].strip():
+            raise ModelError(f"data flow is missing a non-empty '{field}'")
+    return {"source": flow["source"], "destination": flow["destination"], "dataType": flow["dataType"]}
+
+
+def validate_boundary(boundary):
+    """Return boundary as a clean trust boundary dict, or raise ModelError."""
+    if not isinstance(boundary, dict):
+        raise ModelError("trust boundary must be an object with name and description")
+    for field in ("name", "description"):
+        if not isinstance(boundary.get(field), str) or not boundary[field].strip():
+            raise ModelError(f"trust boundary is missing a non-empty '{field}'")
+    return {"name": boundary["name"], "description": boundary["description"]}
+
+
+def validate_model(data):
+    """Return data as a model dict with text_input, data_flows and trust_boundaries."""
+    if not isinstance(data, dict):
+        raise ModelError("model must be an object with text_input, data_flows and trust_boundaries")
+    text_input = data.get("text_input", "")
+    if not isinstance(text_input, str):
+        raise ModelError("'text_input' must be a string")
+    flows = data.get("data_flows", [])
+    boundaries = data.get("trust_boundaries", [])
+    if not isinstance(flows, list) or not isinstance(boundaries, list):
+        raise ModelError("'data_flows' and 'trust_boundaries' must be lists")
+    model = {"text_input": text_input, "data_flows": [], "trust_boundaries": []}
+    for index, flow in enumerate(flows):
+        try:
+            model["data_flows"].append(validate_flow(flow))
+        except ModelError as e:
+            raise ModelError(f"data_flows[{index}]: {e}") from None
+    for index, boundary in enumerate(boundaries):
+        try:
+            model["trust_boundaries"].append(validate_boundary(boundary))
+        except ModelError as e:
+            raise ModelError(f"trust_boundaries[{index}]: {e}") from None
+    return model
+
+
+def _import_yaml():
+    """Import PyYAML on first use; it is only needed for .yaml/.yml models."""
+    try:
+        import yaml
+    except ImportError:
+        raise ModelError("PyYAML is required to read YAML models (pip install pyyaml)") from None
+    return yaml
+
+
+def load_model(path):
+    """Read and validate a model from a .json, .yaml or .yml file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        parse, parse_error = json.load, json.JSONDecodeError
+    elif extension in (".yaml", ".yml"):
+        yaml = _import_yaml()
+        parse, parse_error = yaml.safe_load, yaml.YAMLError
+    else:
+        raise ModelError(f"unsupported model file type '{extension}'")
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = parse(f)
+    except OSError as e:
+        raise ModelError(f"cannot read model: {e.strerror}") from None
+    except parse_error as e:
+        raise ModelError(f"cannot parse model: {e}") from None
+    return validate_model(data)
+
+
+def find_models(paths):
+    """Yield model files from paths, descending into directories in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(MODEL_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
@@ -0,0 +1,126 @@
+"""Scalable rendering of large data flow diagrams.
+
+``dot``'s hierarchical layout with routed splines slows down sharply past a
+few hundred nodes. ``choose_engine`` switches to the force-directed
+``neato``/``sfdp`` engines as a diagram grows, and ``apply_engine`` drops the
+attributes they cannot use cheaply. Past a larger threshold the apps stop
+drawing the whole DFD at once: ``diagram_views`` splits the model into an
+overview of how the trust boundaries talk to each other plus one subdiagram
+per boundary, and only the view the user picks is rendered.
+"""
+import os
+from collections import Counter
+
+from threatmodel.boundary_index import BoundaryIndex
+from threatmodel.diagram import new_digraph
+
+# Node counts at which layout switches engine, and at which the DFD is split into views
+NEATO_NODES = int(os.environ.get("THREATMODEL_NEATO_NODES", "60"))
+SFDP_NODES = int(os.environ.get("THREATMODEL_SFDP_NODES", "250"))
+PARTITION_NODES = int(os.environ.get("THREATMODEL_PARTITION_NODES", "120"))
+
+OVERVIEW = "Overview"
+OUTSIDE = "Outside trust boundaries"
+
+
+def dfd_nodes(data_flows):
+    """Return the sorted DFD nodes named by data flows."""
+    nodes = set()
+    for flow in data_flows:
+        nodes.add(flow["source"])
+        nodes.add(flow["destination"])
+    return sorted(nodes)
+
+
+def choose_engine(node_count):
+    """Pick the Graphviz layout engine for a diagram with node_count nodes."""
+    if node_count >= SFDP_NODES:
+        return "sfdp"
+    if node_count >= NEATO_NODES:
+        return "neato"
+    return "dot"
+
+
+def apply_engine(dot, engine):
+    """Tune dot's graph attributes for engine and return it."""
+    if engine != "dot":
+        # Later graph attributes win, so this overrides splines="polyline" and friends
+        dot.attr(splines="false", overlap="false", outputorder="edgesfirst")
+    return dot
+
+
+def _node_groups(nodes, trust_boundaries):
+    """Map each node to the positions of the boundaries that mention it."""
+    index = BoundaryIndex((boundary["description"], boundary["name"]) for boundary in trust_boundaries)
+    return {node: index.boundaries_for(node) for node in nodes}
+
+
+def diagram_views(data_flows, trust_boundaries):
+    """Split a large model into renderable views, or return None if it is small enough to draw whole.
+
+    The result maps a view title to the (data_flows, trust_boundaries) it shows:
+    OVERVIEW first (the whole model, for build_overview_diagram), then each
+    trust boundary with the flows touching its nodes, then OUTSIDE for flows
+    no boundary mentions.
+    """
+    nodes = dfd_nodes(data_flows)
+    if len(nodes) < PARTITION_NODES:
+        return None
+    groups = _node_groups(nodes, trust_boundaries)
+    boundary_flows = [[] for _ in trust_boundaries]
+    outside = []
+    for flow in data_flows:
+        touched = groups[flow["source"]] | groups[flow["destination"]]
+        for position in touched:
+            boundary_flows[position].append(flow)
+        if not touched:
+            outside.append(flow)
+
+    views = {OVERVIEW: (data_flows, trust_boundaries)}
+    for boundary, flows in zip(trust_boundaries, boundary_flows):
+        if flows:
+            views.setdefault(boundary["name"], (flows, [boundary]))
+    if outside:
+        views[OUTSIDE] = (outside, [])
+    return views
+
+
+def build_overview_diagram(data_flows, trust_boundaries):
+    """Summarize a DFD as one node per trust boundary and the number of flows between them."""
+    dot = new_digraph("Data Flow Overview")
+    dot.attr(rankdir="LR", size="8,5")
+
+    # Each node is drawn in the first boundary that mentions it
+    group_of = {}
+    for node, positions in _node_groups(dfd_nodes(data_flows), trust_boundaries).items():
+        group_of[node] = trust_boundaries[min(positions)]["name"] if positions else OUTSIDE
+    sizes = Counter(group_of.values())
+    links = Counter()
+    internal = Counter()
+    for flow in data_flows:
+        source, destination = group_of[flow["source"]], group_of[flow["destination"]]
+        if source == destination:
+            internal[source] += 1
+        else:
+            links[source, destination] += 1
+
+    for group in sorted(sizes):
+        dot.node(group, f"{group}\n{sizes[group]} components, {internal[group]} internal flows", shape="box", style="dashed")
+    for (source, destination), count in sorted(links.items()):
+        dot.edge(source, destination, label=f"{count} flow{'s' if count != 1 else ''}")
+    return dot
+
+
+def build_view(build, data_flows, trust_boundaries, views=None, view=None):
+    """Build the diagram for a model, or for one of its diagram_views(), and pick its engine.
+
+    build(data_flows, trust_boundaries) draws a full or per-boundary DFD.
+    Returns (dot, engine) with dot already tuned for engine.
+    """
+    if views:
+        data_flows, trust_boundaries = views[view]
+        if view == OVERVIEW:
+            engine = choose_engine(len(trust_boundaries) + 1)
+            return apply_engine(build_overview_diagram(data_flows, trust_boundaries), engine), engine
+    engine = choose_engine(len(dfd_nodes(data_flows)))
+    return apply_engine(build(data_flows, trust_boundaries), engine), engine
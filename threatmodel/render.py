@@ -0,0 +1,46 @@
+"""Render DOT sources to image bytes entirely in memory.
+
+DOT is piped into the Graphviz process on stdin and the image is read back
+from stdout, so no file is written and concurrent sessions never share a path.
+
+The apps display SVG by default: it is smaller than PNG for large diagrams,
+skips rasterization in Graphviz and stays sharp when zoomed. Set
+THREATMODEL_DIAGRAM_FORMAT=png to go back to raster images.
+"""
+import os
+
+from threatmodel.metrics import metrics
+
+# Formats the apps can show with st.image
+DISPLAY_FORMATS = ("svg", "png")
+DIAGRAM_FORMAT = os.environ.get("THREATMODEL_DIAGRAM_FORMAT", "svg").lower()
+if DIAGRAM_FORMAT not in DISPLAY_FORMATS:
+    DIAGRAM_FORMAT = "svg"
+
+
+class RenderError(Exception):
+    """Raised when Graphviz fails to render a diagram."""
+
+
+class GraphvizNotFound(RenderError):
+    """Raised when the Graphviz executable is not installed."""
+
+
+def render_dot(source, fmt="png", engine="dot"):
+    """Render DOT source with Graphviz and return the image bytes."""
+    import graphviz  # Deferred so importing this module stays cheap
+    try:
+        with metrics.stage("graphviz"):
+            return graphviz.pipe(engine, fmt, source.encode("utf-8"), quiet=True)
+    except graphviz.ExecutableNotFound as e:
+        raise GraphvizNotFound(f"Graphviz executable '{engine}' not found.") from e
+    except graphviz.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode("utf-8", "replace").strip()
+        raise RenderError(f"Graphviz failed to render the diagram: {stderr or e}") from e
+
+
+def image_source(payload, fmt=DIAGRAM_FORMAT):
+    """Return what st.image needs to show a rendered payload."""
+    if fmt == "svg":
+        return payload  # st.image accepts SVG markup as is
+    return f"data:image/{fmt};base64,{payload}"
@@ -0,0 +1,179 @@
+"""Content-addressed cache for rendered Graphviz diagrams.
+
+Rendered images are keyed on a hash of the canonical DOT source, so identical
+models render once per process no matter how many sessions or reruns ask for
+them. The in-memory tier is a process-wide LRU shared by all sessions; an
+optional on-disk tier survives restarts and is evicted by total size.
+"""
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from threatmodel.metrics import metrics
+
+
+def canonical_dot(source):
+    """Normalize DOT source so cosmetic differences do not change the key."""
+    lines = source.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def diagram_key(source, fmt="png", engine="dot"):
+    """Return the cache key for a DOT source rendered with a format and engine."""
+    digest = hashlib.sha256()
+    digest.update(f"{engine}:{fmt}\n".encode("utf-8"))
+    digest.update(canonical_dot(source).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def to_base64(data):
+    """Encode rendered image bytes the way the apps embed them."""
+    return base64.b64encode(data).decode("utf-8")
+
+
+def to_text(data):
+    """Decode rendered SVG bytes into markup the apps can embed directly."""
+    return data.decode("utf-8")
+
+
+# Raster formats travel as base64, vector formats as plain markup
+ENCODERS = {"svg": to_text}
+
+
+def encoder_for(fmt):
+    """Return the payload encoder for a render format."""
+    return ENCODERS.get(fmt, to_base64)
+
+
+class RenderCache:
+    """Two-tier (memory LRU + optional disk) cache of rendered diagrams."""
+
+    def __init__(self, max_entries=128, disk_dir=None, disk_max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def get(self, key, encode=to_base64):
+        """Return the cached payload for key, or None."""
+        with self._lock:
+            payload = self._pinned.get(key)
+            if payload is not None:
+                self.hits += 1
+                return payload
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return payload
+        data = self._disk_read(key)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with metrics.stage("encode"):
+            payload = encode(data)
+        with self._lock:
+            self.hits += 1
+            self._remember(key, payload)
+        return payload
+
+    def put(self, key, data, encode=to_base64):
+        """Store rendered bytes under key and return their encoded payload."""
+        with metrics.stage("encode"):
+            payload = encode(data)
+        with self._lock:
+            self._remember(key, payload)
+        self._disk_write(key, data)
+        return payload
+
+    def pin(self, key, payload):
+        """Keep an encoded payload in memory for the life of the process, outside the LRU."""
+        with self._lock:
+            self._pinned[key] = payload
+
+    def clear(self):
+        """Drop the in-memory tier (pinned payloads and the disk tier are left alone)."""
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key, payload):
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _disk_entries(self):
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _disk_read(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for eviction
+            return data
+        except OSError:
+            return None
+
+    def _disk_write(self, key, data):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Rescan so files written by other processes sharing the directory count too
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+
+def cache_from_env():
+    """Build the shared cache from THREATMODEL_RENDER_CACHE_* environment variables."""
+    return RenderCache(
+        max_entries=int(os.environ.get("THREATMODEL_RENDER_CACHE_ENTRIES", "128")),
+        disk_dir=os.environ.get("THREATMODEL_RENDER_CACHE_DIR") or None,
+        disk_max_bytes=int(os.environ.get("THREATMODEL_RENDER_CACHE_DISK_MB", "64")) * 1024 * 1024,
+    )
+
+
+# Process-wide instance shared by every Streamlit session
+render_cache = cache_from_env()
+metrics.register_cache("render", lambda: (render_cache.hits, render_cache.misses))
@@ -0,0 +1,123 @@
+"""Bounded background pool for Graphviz render jobs.
+
+Renders run on a small thread pool (each job is one ``dot`` subprocess), so
+the Streamlit script thread only waits for the image at the very end of a
+run. Concurrency and queue depth are capped so a burst of sessions cannot
+fork an unbounded number of Graphviz processes. Identical jobs submitted by
+different sessions share one render, and a job is only cancelled once every
+session waiting on it has moved on.
+"""
+import os
+import threading
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+from threatmodel.render import render_dot
+from threatmodel.render_cache import diagram_key, encoder_for, render_cache
+
+
+class RenderPoolBusy(Exception):
+    """Raised when the render queue is full."""
+
+
+class _Job:
+    """A queued or running render shared by every session that asked for it."""
+
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class RenderPool:
+    """Thread pool running Graphviz renders with bounded concurrency and queue depth."""
+
+    def __init__(self, max_workers=None, max_queue=32):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="graphviz-render")
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_queue)
+        self._jobs = {}
+        self._lock = threading.RLock()
+
+    def submit(self, source, fmt="png", engine="dot"):
+        """Queue a render of source and return a Future of its payload (base64, or markup for SVG)."""
+        key = diagram_key(source, fmt, engine)
+        handle = Future()
+        handle.render_key = key
+        payload = render_cache.get(key, encoder_for(fmt))
+        if payload is not None:
+            handle.set_result(payload)
+            return handle
+
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                if not self._slots.acquire(blocking=False):
+                    raise RenderPoolBusy("The diagram renderer is busy. Please try again in a moment.")
+                job = _Job(self._executor.submit(self._render, key, source, fmt, engine))
+                self._jobs[key] = job
+                job.future.add_done_callback(lambda _, key=key, job=job: self._job_done(key, job))
+            job.waiters += 1
+
+        job.future.add_done_callback(lambda future: _forward(future, handle))
+        handle.add_done_callback(lambda _: self._release(job, handle))
+        return handle
+
+    def resubmit(self, handle, source, fmt="png", engine="dot"):
+        """Return handle if it renders (or rendered) source successfully; otherwise cancel it and submit source."""
+        if handle is not None:
+            # A render that failed or was cancelled is tried again rather than handed back
+            failed = handle.cancelled() or (handle.done() and handle.exception() is not None)
+            if handle.render_key == diagram_key(source, fmt, engine) and not failed:
+                return handle
+            handle.cancel()
+        return self.submit(source, fmt, engine)
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and cancel everything still queued."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _render(self, key, source, fmt, engine):
+        # submit() already missed the cache for key, so go straight to Graphviz
+        return render_cache.put(key, render_dot(source, fmt, engine), encoder_for(fmt))
+
+    def _job_done(self, key, job):
+        with self._lock:
+            if self._jobs.get(key) is job:
+                del self._jobs[key]
+        self._slots.release()
+
+    def _release(self, job, handle):
+        if not handle.cancelled():
+            return
+        with self._lock:
+            job.waiters -= 1
+            if job.waiters == 0:
+                job.future.cancel()  # No-op once the render has started
+
+
+def _forward(future, handle):
+    """Copy a finished shared job's outcome into one session's handle."""
+    try:
+        if future.cancelled():
+            handle.cancel()
+        elif future.exception() is not None:
+            handle.set_exception(future.exception())
+        else:
+            handle.set_result(future.result())
+    except InvalidStateError:
+        pass  # The session already cancelled its handle
+
+
+def pool_from_env():
+    """Build the shared pool from THREATMODEL_RENDER_* environment variables."""
+    workers = int(os.environ.get("THREATMODEL_RENDER_WORKERS", "0"))
+    return RenderPool(
+        max_workers=workers or None,
+        max_queue=int(os.environ.get("THREATMODEL_RENDER_QUEUE", "32")),
+    )
+
+
+# Process-wide pool shared by every Streamlit session
+render_pool = pool_from_env()
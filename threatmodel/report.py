@@ -0,0 +1,254 @@
+"""Streaming HTML, Markdown and PDF threat model reports.
+
+A report is written front to back into a binary file: the title and system
+description, the data flow diagram, a STRIDE legend with threat counts, then
+every threat. Threats are formatted and written one at a time, so memory
+stays flat however many there are; the PDF writer only keeps the byte
+offsets of its objects for the cross-reference table. ``progress(count)`` is
+called after each threat and may raise to abandon the report.
+
+The diagram is passed as ``(kind, payload)``: ``("svg", markup)`` or
+``("png", base64)`` as the render pool returns them, or ``("text", diagram)``
+for the text diagram. PDF reports can only embed the text diagram.
+"""
+import base64
+import html
+import io
+import textwrap
+from collections import Counter
+
+from threatmodel.results import threat_markdown, threat_title
+
+# Report format -> (label, MIME type)
+REPORT_FORMATS = {
+    "html": ("HTML", "text/html"),
+    "md": ("Markdown", "text/markdown"),
+    "pdf": ("PDF", "application/pdf"),
+}
+
+STRIDE_LEGEND = (
+    ("Spoofing", "Pretending to be another user, component or system."),
+    ("Tampering", "Changing data or code without authorization."),
+    ("Repudiation", "Denying an action because nothing proves who performed it."),
+    ("Information Disclosure", "Exposing information to someone not allowed to see it."),
+    ("Denial of Service", "Making a component or service unavailable."),
+    ("Elevation of Privilege", "Gaining capabilities without proper authorization."),
+)
+
+# Threat fields listed under each threat, in order
+_FIELDS = (
+    ("description", "Description"),
+    ("mitigation", "Mitigation"),
+    ("controls", "Security Controls"),
+    ("asvs", "OWASP ASVS"),
+    ("samm", "OWASP SAMM"),
+    ("dfd_element", "DFD Element"),
+)
+
+_CSS = (
+    "body{font-family:Arial,sans-serif;max-width:60em;margin:2em auto;color:#222}"
+    "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:.3em .6em;text-align:left}"
+    "section{border-top:1px solid #ddd;padding:.5em 0}h3{margin:.3em 0}"
+    ".diagram svg,.diagram img{max-width:100%;height:auto}"
+)
+
+# Wrapped PDF paragraphs kept for reuse
+_MAX_WRAPPED = 4096
+
+
+def _noop(count):
+    pass
+
+
+def stride_counts(threats):
+    """Return {STRIDE category: number of threats}."""
+    return Counter(threat["stride"] for threat in threats)
+
+
+def write_report(out, fmt, title, description, threats, diagram=None, progress=None):
+    """Stream a report of threats into the binary file out in fmt ("html", "md" or "pdf")."""
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format: {fmt}")
+    progress = progress or _noop
+    counts = stride_counts(threats)
+    if fmt == "pdf":
+        _write_pdf(out, title, description, threats, diagram, counts, progress)
+        return
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="\n")
+    try:
+        writer = _write_html if fmt == "html" else _write_markdown
+        writer(text, title, description, threats, diagram, counts, progress)
+    finally:
+        text.flush()
+        text.detach()  # Leave the caller's file open
+
+
+def _write_html(text, title, description, threats, diagram, counts, progress):
+    e = html.escape
+    text.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{e(title)}</title>'
+               f"<style>{_CSS}</style></head><body>\n<h1>{e(title)}</h1>\n")
+    if description:
+        text.write(f"<p>{e(description)}</p>\n")
+    if diagram is not None:
+        kind, payload = diagram
+        text.write('<h2>Data Flow Diagram</h2>\n<div class="diagram">')
+        if kind == "svg":
+            text.write(payload[payload.find("<svg"):])  # Drop the XML prolog to inline it
+        elif kind == "png":
+            text.write(f'<img alt="Data flow diagram" src="data:image/png;base64,{payload}">')
+        else:
+            text.write(f"<pre>{e(payload)}</pre>")
+        text.write("</div>\n")
+
+    text.write("<h2>STRIDE Legend</h2>\n<table><tr><th>Category</th><th>Meaning</th><th>Threats</th></tr>\n")
+    for stride, meaning in STRIDE_LEGEND:
+        text.write(f"<tr><td>{stride}</td><td>{meaning}</td><td>{counts.get(stride, 0)}</td></tr>\n")
+    text.write("</table>\n")
+
+    text.write(f"<h2>Threats ({len(threats)})</h2>\n")
+    for count, threat in enumerate(threats, 1):
+        items = "".join(f"<li><b>{label}</b>: {e(threat[key])}</li>" for key, label in _FIELDS if key in threat)
+        text.write(f"<section><h3>{e(threat_title(threat))}</h3><p>STRIDE: {e(threat['stride'])}</p><ul>{items}</ul></section>\n")
+        progress(count)
+    text.write("</body></html>\n")
+
+
+def _write_markdown(text, title, description, threats, diagram, counts, progress):
+    text.write(f"# {title}\n\n")
+    if description:
+        text.write(f"{description}\n\n")
+    if diagram is not None:
+        kind, payload = diagram
+        text.write("## Data Flow Diagram\n\n")
+        if kind == "svg":
+            text.write(f"![Data flow diagram](data:image/svg+xml;base64,{base64.b64encode(payload.encode('utf-8')).decode('ascii')})\n\n")
+        elif kind == "png":
+            text.write(f"![Data flow diagram](data:image/png;base64,{payload})\n\n")
+        else:
+            text.write(f"```text\n{payload}\n```\n\n")
+
+    text.write("## STRIDE Legend\n\n| Category | Meaning | Threats |\n| --- | --- | --- |\n")
+    for stride, meaning in STRIDE_LEGEND:
+        text.write(f"| {stride} | {meaning} | {counts.get(stride, 0)} |\n")
+
+    text.write(f"\n## Threats ({len(threats)})\n")
+    for count, threat in enumerate(threats, 1):
+        text.write(f"\n{threat_markdown(threat)}\n\n---\n")
+        progress(count)
+
+
+class _PdfWriter:
+    """Minimal PDF 1.4 writer laying out text lines on A4 pages as it goes."""
+
+    WIDTH, HEIGHT, MARGIN = 595, 842, 50
+    FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Courier"}
+    # Average glyph width as a fraction of the font size, to wrap lines
+    _GLYPH = {"F1": 0.5, "F2": 0.55, "F3": 0.6}
+
+    def __init__(self, out):
+        self.out = out
+        self.position = 0
+        self.offsets = [0, 0, 0]  # Catalog (1) and page tree (2) are written last
+        self.kids = []
+        self.page = []
+        self.y = self.HEIGHT - self.MARGIN
+        self._wrapped = {}
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.fonts = {name: self._object(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>".encode("ascii"))
+                      for name, base in self.FONTS.items()}
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, body, number=None):
+        if number is None:
+            number = len(self.offsets)
+            self.offsets.append(0)
+        self.offsets[number] = self.position
+        self._write(f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+        return number
+
+    @staticmethod
+    def _escape(text):
+        text = text.replace("→", "->").encode("cp1252", "replace")
+        return text.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    def _lines(self, paragraph, font, width):
+        """Return a paragraph wrapped to width as escaped PDF strings."""
+        # Mitigations, controls and references repeat across threats, so wrapping is cached
+        key = (paragraph, font, width)
+        lines = self._wrapped.get(key)
+        if lines is None:
+            if len(paragraph) <= width:
+                lines = [paragraph]
+            else:
+                lines = textwrap.wrap(paragraph, width, drop_whitespace=font != "F3", replace_whitespace=False) or [""]
+            lines = [self._escape(line) for line in lines]
+            if len(self._wrapped) >= _MAX_WRAPPED:
+                self._wrapped.clear()
+            self._wrapped[key] = lines
+        return lines
+
+    def text(self, text, font="F1", size=10, indent=0, space=0):
+        """Add text, wrapped to the page width, starting a new page when this one is full."""
+        self.y -= space
+        width = max(20, int((self.WIDTH - 2 * self.MARGIN - indent) / (size * self._GLYPH[font])))
+        prefix = b"BT /%s %d Tf %d " % (font.encode("ascii"), size, self.MARGIN + indent)
+        for paragraph in text.split("\n"):
+            for line in self._lines(paragraph, font, width):
+                if self.y - size < self.MARGIN:
+                    self.end_page()
+                self.y -= size * 1.3
+                self.page.append(b"%s%.1f Td (%s) Tj ET" % (prefix, self.y, line))
+
+    def end_page(self):
+        if not self.page:
+            return
+        content = b"\n".join(self.page)
+        stream = self._object(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        fonts = " ".join(f"/{name} {number} 0 R" for name, number in self.fonts.items())
+        self.kids.append(self._object(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.WIDTH} {self.HEIGHT}] "
+            f"/Resources << /Font << {fonts} >> >> /Contents {stream} 0 R >>".encode("ascii")
+        ))
+        self.page = []
+        self.y = self.HEIGHT - self.MARGIN
+
+    def close(self):
+        self.end_page()
+        if not self.kids:
+            self.text("")
+            self.end_page()
+        kids = " ".join(f"{kid} 0 R" for kid in self.kids)
+        self._object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.kids)} >>".encode("ascii"), 2)
+        self._object(b"<< /Type /Catalog /Pages 2 0 R >>", 1)
+        xref = self.position
+        self._write(f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n".encode("ascii"))
+        for offset in self.offsets[1:]:
+            self._write(b"%010d 00000 n \n" % offset)
+        self._write(f"trailer\n<< /Size {len(self.offsets)} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+
+def _write_pdf(out, title, description, threats, diagram, counts, progress):
+    pdf = _PdfWriter(out)
+    pdf.text(title, "F2", 16)
+    if description:
+        pdf.text(description, space=6)
+    if diagram is not None and diagram[0] == "text":
+        pdf.text("Data Flow Diagram", "F2", 13, space=12)
+        pdf.text(diagram[1], "F3", 7, space=4)
+
+    pdf.text("STRIDE Legend", "F2", 13, space=12)
+    for stride, meaning in STRIDE_LEGEND:
+        pdf.text(f"{stride} ({counts.get(stride, 0)}): {meaning}", space=2)
+
+    pdf.text(f"Threats ({len(threats)})", "F2", 13, space=12)
+    for count, threat in enumerate(threats, 1):
+        pdf.text(threat_title(threat), "F2", 11, space=8)
+        pdf.text(f"STRIDE: {threat['stride']}")
+        for key, label in _FIELDS:
+            if key in threat:
+                pdf.text(f"{label}: {threat[key]}", indent=12)
+        progress(count)
+    pdf.close()
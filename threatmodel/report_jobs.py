@@ -0,0 +1,165 @@
+"""Background jobs writing threat model reports to files.
+
+Reports run on a small thread pool, so the Streamlit script only polls a
+job's progress and offers the file once it is done. Concurrency and queue
+depth are capped like the render pool's. Each report is streamed into its
+own file under the reports directory; the file is deleted when its job is
+cancelled or fails, and files left behind by old sessions are pruned.
+"""
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from threatmodel.ascii_diagram import ascii_diagram
+from threatmodel.report import REPORT_FORMATS, write_report
+
+# Seconds a report waits for the diagram render it embeds
+RENDER_WAIT = 60
+
+# Larger models get no text diagram (it is only a fallback for HTML/Markdown)
+MAX_TEXT_DIAGRAM_FLOWS = 200
+
+# Report files older than this are deleted when a new report is queued
+MAX_AGE = 24 * 60 * 60
+
+
+class ReportQueueBusy(Exception):
+    """Raised when the report queue is full."""
+
+
+class ReportCancelled(Exception):
+    """Raised inside a report job to stop writing it."""
+
+
+class ReportJob:
+    """One report being written in the background, with its progress."""
+
+    def __init__(self, path, filename, fmt, total):
+        self.path = path
+        self.filename = filename
+        self.fmt = fmt
+        self.mime = REPORT_FORMATS[fmt][1]
+        self.total = total
+        self.written = 0
+        self.future = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def done(self):
+        return self.future.done()
+
+    def progress(self):
+        """Return the fraction of threats written so far."""
+        if self.total == 0:
+            return 1.0 if self.done() else 0.0
+        return self.written / self.total
+
+    def cancel(self):
+        """Stop the job if it is still running and delete its file."""
+        with self._lock:
+            self._stop.set()
+            self.future.cancel()
+            if self._finished:
+                self._remove()
+
+    def _advance(self, count):
+        if self._stop.is_set():
+            raise ReportCancelled()
+        self.written = count
+
+    def _finish(self, ok):
+        with self._lock:
+            self._finished = True
+            if not ok or self._stop.is_set():
+                self._remove()
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ReportQueue:
+    """Thread pool writing reports with bounded concurrency and queue depth."""
+
+    def __init__(self, directory, max_workers=2, max_queue=8):
+        self.directory = directory
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-writer")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fmt, title, description, threats, data_flows=(), trust_boundaries=(),
+               render=None, diagram_format="svg", name="threat-model"):
+        """Queue a report of threats and return its ReportJob.
+
+        render is the Future of the rendered diagram to embed (as returned by
+        the render pool); without it, or when it fails, the text diagram of
+        data_flows and trust_boundaries is used. threats must not change
+        while the report is written.
+        """
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {fmt}")
+        if not self._slots.acquire(blocking=False):
+            raise ReportQueueBusy("The report writer is busy. Please try again in a moment.")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune()
+            job = ReportJob(os.path.join(self.directory, f"{uuid.uuid4().hex}.{fmt}"), f"{name}.{fmt}", fmt, len(threats))
+            job.future = self._executor.submit(
+                self._run, job, title, description, threats, list(data_flows), list(trust_boundaries), render, diagram_format
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        job.future.add_done_callback(lambda _: self._slots.release())
+        return job
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and cancel everything still queued."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, title, description, threats, data_flows, trust_boundaries, render, diagram_format):
+        ok = False
+        try:
+            diagram = None
+            if render is not None and job.fmt != "pdf":
+                try:
+                    diagram = (diagram_format, render.result(timeout=RENDER_WAIT))
+                except (CancelledError, Exception):
+                    diagram = None  # Fall back to the text diagram
+            if diagram is None and data_flows and len(data_flows) <= MAX_TEXT_DIAGRAM_FLOWS:
+                diagram = ("text", ascii_diagram(data_flows, trust_boundaries, threats))
+            with open(job.path, "wb") as out:
+                write_report(out, job.fmt, title, description, threats, diagram, job._advance)
+            ok = True
+            return job.path
+        finally:
+            job._finish(ok)
+
+    def _prune(self):
+        """Delete report files older than MAX_AGE."""
+        cutoff = time.time() - MAX_AGE
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass  # Removed concurrently or not ours to delete
+
+
+def queue_from_env():
+    """Build the shared queue from THREATMODEL_REPORT_* environment variables."""
+    return ReportQueue(
+        os.environ.get("THREATMODEL_REPORT_DIR", os.path.join(tempfile.gettempdir(), "threatmodel-reports")),
+        max_workers=int(os.environ.get("THREATMODEL_REPORT_WORKERS", "2")),
+        max_queue=int(os.environ.get("THREATMODEL_REPORT_QUEUE", "8")),
+    )
+
+
+# Process-wide queue shared by every Streamlit session
+report_queue = queue_from_env()
@@ -0,0 +1,58 @@
+"""Paginated markdown for the threat results of step 3.
+
+Every Streamlit element costs a protobuf message and a frontend component, so
+the apps render one page of threats at a time, each page (or each DFD element
+on a page) as a single markdown block built here.
+"""
+import math
+import os
+
+# Threats shown per results page
+PAGE_SIZE = int(os.environ.get("THREATMODEL_PAGE_SIZE", "50"))
+
+
+def page_bounds(total, page, page_size=PAGE_SIZE):
+    """Return (start, stop, page count) of a 1-based page, clamping page into range."""
+    pages = max(1, math.ceil(total / page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total), pages
+
+
+def threat_title(threat):
+    """Return "ID: type" for a numbered threat, otherwise its type."""
+    return f"{threat['id']}: {threat['type']}" if "id" in threat else threat["type"]
+
+
+def threat_markdown(threat):
+    """Return the markdown describing one threat."""
+    title = threat_title(threat)
+    lines = [
+        f"**{title}** (STRIDE: {threat['stride']})",
+        f"- **Description**: {threat['description']}",
+        f"- **Mitigation**: {threat['mitigation']}",
+    ]
+    if "controls" in threat:
+        lines.append(f"- **Security Controls**: {threat['controls']}")
+    lines.append(f"- **OWASP ASVS**: {threat['asvs']}")
+    lines.append(f"- **OWASP SAMM**: {threat['samm']}")
+    if "dfd_element" in threat:
+        lines.append(f"- **DFD Element**: {threat['dfd_element']}")
+    return "\n".join(lines)
+
+
+def threats_markdown(threats):
+    """Return one markdown block for several threats, separated by rules."""
+    return "\n\n---\n\n".join(threat_markdown(threat) for threat in threats)
+
+
+def element_runs(threats):
+    """Group consecutive threats by DFD element into (element, threats) pairs."""
+    runs = []
+    for threat in threats:
+        element = threat.get("dfd_element")
+        if runs and runs[-1][0] == element:
+            runs[-1][1].append(threat)
+        else:
+            runs.append((element, [threat]))
+    return runs
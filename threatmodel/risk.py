@@ -0,0 +1,215 @@
+"""Likelihood, impact and risk scores for analyzed threats.
+
+Each threat is scored from three factors:
+
+- its STRIDE category, which sets a base likelihood and impact;
+- the sensitivity of the data on the flow it concerns (from keywords in the
+  flow's ``dataType``), which raises or lowers impact;
+- whether that flow crosses a trust boundary (or the threat is on a
+  boundary itself), which raises likelihood.
+
+An attack path takes the sensitivity of the sink it reaches and always
+counts as crossing, since it starts in an untrusted part of the model.
+
+The factors of every distinct DFD element are worked out once from the
+model; each threat then only contributes its category and element codes,
+and the scoring, ranking and heatmap are computed on NumPy arrays across the
+whole result.
+"""
+import numpy as np
+
+from threatmodel.attack_paths import path_sink
+from threatmodel.boundary_index import BoundaryIndex
+from threatmodel.keyword_matcher import KeywordMatcher
+
+# STRIDE category -> (base likelihood, base impact), on a 1-5 scale
+STRIDE_FACTORS = {
+    "Spoofing": (4, 4),
+    "Tampering": (3, 4),
+    "Repudiation": (2, 2),
+    "Information Disclosure": (3, 4),
+    "Denial of Service": (3, 3),
+    "Elevation of Privilege": (2, 5),
+}
+STRIDE = tuple(STRIDE_FACTORS)
+_UNKNOWN_FACTORS = (3, 3)
+
+# Sensitivity of a flow's data, 1-5, by keywords in its dataType; 3 when nothing matches
+SENSITIVITY_KEYWORDS = {
+    5: ("payment", "card", "credential", "password", "secret", "token"),
+    4: ("pii", "personal", "sensitive", "confidential", "health", "financial"),
+    2: ("internal",),
+    1: ("public",),
+}
+DEFAULT_SENSITIVITY = 3
+
+# Risk (likelihood x impact, 1-25) at which each level starts
+LEVELS = (("Low", 1), ("Medium", 6), ("High", 12), ("Critical", 20))
+LEVEL_COLORS = {"Low": "#c8e6c9", "Medium": "#fff59d", "High": "#ffcc80", "Critical": "#ef9a9a"}
+
+SYSTEM = "(system)"
+
+_sensitivity_matcher = KeywordMatcher(keyword for keywords in SENSITIVITY_KEYWORDS.values() for keyword in keywords)
+
+
+def data_sensitivity(data_type):
+    """Return the 1-5 sensitivity of a flow's dataType."""
+    found = _sensitivity_matcher.find(data_type.lower())
+    levels = [level for level, keywords in SENSITIVITY_KEYWORDS.items() if not found.isdisjoint(keywords)]
+    # Any sensitive keyword wins over a "public" or "internal" label
+    return max(levels) if levels else DEFAULT_SENSITIVITY
+
+
+def risk_level(risk):
+    """Return the level name of a risk score."""
+    name = LEVELS[0][0]
+    for level, start in LEVELS:
+        if risk >= start:
+            name = level
+    return name
+
+
+def risk_color(risk):
+    """Return the CSS background color of a risk score; empty for 0 (no threat)."""
+    return f"background-color: {LEVEL_COLORS[risk_level(risk)]}" if risk else ""
+
+
+def threat_element(threat):
+    """Return the DFD element a threat concerns, deriving it from its values when it has none."""
+    if threat.dfd_element:
+        return threat.dfd_element
+    fields = dict(zip(threat.template.fields, threat.values))
+    if "source" in fields and "destination" in fields:
+        return f"{fields['source']} → {fields['destination']}"
+    for field in ("destination", "name", "component"):
+        if field in fields:
+            return fields[field]
+    return SYSTEM
+
+
+def element_factors(data_flows, trust_boundaries):
+    """Map each lowercased DFD element of a model to its (sensitivity, crosses boundary) factors."""
+    index = BoundaryIndex((boundary["description"], boundary["name"]) for boundary in trust_boundaries)
+    # Node names and data types repeat across flows, so each is looked up once
+    groups = {}
+    sensitivities = {}
+    factors = {}
+
+    def merge(element, sensitivity, crosses):
+        old = factors.get(element)
+        if old is None:
+            factors[element] = (sensitivity, crosses)
+        elif sensitivity > old[0] or (crosses and not old[1]):
+            factors[element] = (max(sensitivity, old[0]), crosses or old[1])
+
+    for flow in data_flows:
+        source, destination = flow["source"], flow["destination"]
+        for node in (source, destination):
+            if node not in groups:
+                groups[node] = frozenset(index.boundaries_for(node))
+        data_type = flow.get("dataType", "")
+        sensitivity = sensitivities.get(data_type)
+        if sensitivity is None:
+            sensitivity = sensitivities[data_type] = data_sensitivity(data_type)
+        crosses = groups[source] != groups[destination]
+        merge(f"{source} → {destination}".lower(), sensitivity, crosses)
+        # A node is as sensitive as the data flowing into or out of it
+        merge(source.lower(), sensitivity, crosses)
+        merge(destination.lower(), sensitivity, crosses)
+    for boundary in trust_boundaries:
+        name = boundary["name"].lower()
+        factors[name] = (factors.get(name, (DEFAULT_SENSITIVITY, True))[0], True)
+    return factors
+
+
+def _factors_of(factors, element):
+    """Return the (sensitivity, crosses boundary) factors of element from element_factors()."""
+    found = factors.get(element.lower())
+    if found is None:
+        sink = path_sink(element)
+        if sink is not None:
+            return (factors.get(sink.lower(), (DEFAULT_SENSITIVITY, True))[0], True)
+    return found or (DEFAULT_SENSITIVITY, False)
+
+
+class RiskScores:
+    """Per-threat likelihood, impact and risk arrays for one list of threats."""
+
+    def __init__(self, threats, elements, element_codes, stride_codes, likelihood, impact):
+        self.threats = threats
+        self.elements = elements
+        self.element_codes = element_codes
+        self.stride_codes = stride_codes
+        self.likelihood = likelihood
+        self.impact = impact
+        self.risk = likelihood * impact
+
+    def __len__(self):
+        return len(self.threats)
+
+    def level_counts(self):
+        """Return {level: number of threats}."""
+        starts = np.array([start for _, start in LEVELS])
+        counts = np.bincount(np.searchsorted(starts, self.risk, side="right") - 1, minlength=len(LEVELS))
+        return {name: int(count) for (name, _), count in zip(LEVELS, counts)}
+
+    def top(self, n=10):
+        """Return the positions of the n highest-risk threats, highest first (earlier threats win ties)."""
+        count = len(self.risk)
+        if count == 0 or n <= 0:
+            return []
+        # Unique sort key: risk, then earlier position
+        key = self.risk.astype(np.int64) * count + (count - 1 - np.arange(count))
+        n = min(n, count)
+        best = np.argpartition(-key, n - 1)[:n]
+        return best[np.argsort(-key[best])].tolist()
+
+    def heatmap(self, limit=30):
+        """Return (elements, STRIDE categories, matrix of the highest risk per cell) for the riskiest elements."""
+        matrix = np.zeros((len(self.elements), len(STRIDE) + 1), dtype=np.int64)
+        np.maximum.at(matrix, (self.element_codes, self.stride_codes), self.risk)
+        totals = np.zeros(len(self.elements), dtype=np.int64)
+        np.add.at(totals, self.element_codes, self.risk)
+        # Highest cell first, then most total risk
+        order = np.lexsort((-totals, -matrix.max(axis=1, initial=0)))[:limit]
+        columns = list(STRIDE) + ["Other"]
+        used = matrix[order].any(axis=0) if len(order) else np.zeros(len(columns), dtype=bool)
+        return [self.elements[i] for i in order], [c for c, keep in zip(columns, used) if keep], matrix[order][:, used]
+
+
+def score_threats(threats, data_flows, trust_boundaries):
+    """Score every threat against the model it came from and return RiskScores."""
+    factors = element_factors(data_flows, trust_boundaries)
+    stride_index = {stride: code for code, stride in enumerate(STRIDE)}
+
+    # The only per-threat pass: category and element codes; threats of one
+    # element share their values, so each distinct key is resolved once
+    element_index = {}
+    elements = []
+    codes = {}
+    element_codes = []
+    stride_codes = []
+    for threat in threats:
+        key = (threat.dfd_element, threat.values, threat.template.fields)
+        code = codes.get(key)
+        if code is None:
+            element = threat_element(threat)
+            code = element_index.get(element)
+            if code is None:
+                code = element_index[element] = len(elements)
+                elements.append(element)
+            codes[key] = code
+        element_codes.append(code)
+        stride_codes.append(stride_index.get(threat.template.stride, len(STRIDE)))
+    element_codes = np.array(element_codes, dtype=np.int64)
+    stride_codes = np.array(stride_codes, dtype=np.int64)
+
+    # Factor tables per STRIDE category and per element, gathered by code
+    base = np.array([STRIDE_FACTORS[stride] for stride in STRIDE] + [_UNKNOWN_FACTORS], dtype=np.int64)
+    element_table = np.array([_factors_of(factors, element) for element in elements],
+                             dtype=np.int64).reshape(-1, 2)
+    sensitivity = element_table[element_codes, 0]
+    crosses = element_table[element_codes, 1]
+    likelihood = np.clip(base[stride_codes, 0] + crosses, 1, 5)
+    impact = np.clip(base[stride_codes, 1] + sensitivity - DEFAULT_SENSITIVITY, 1, 5)
+    return RiskScores(threats, elements, element_codes, stride_codes, likelihood, impact)
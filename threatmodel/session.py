@@ -0,0 +1,58 @@
+"""Session state of the Streamlit front-ends, without importing Streamlit.
+
+The helpers take any mutable mapping, so they work the same on
+``st.session_state`` and on a plain dict.
+"""
+import copy
+
+# Keys every session starts with; a model's text_input, data_flows and trust_boundaries override them
+SESSION_DEFAULTS = {
+    "step": 1,
+    "text_input": "",
+    "diagram": None,
+    "diagram_upload": None,
+    "data_flows": [],
+    "trust_boundaries": [],
+    "threat_model": None,
+    "analysis": None,
+    "threat_index": None,
+    "threat_filter": None,
+    "risk_scores": None,
+    "import_report": None,
+    "error": "",
+    "generated_diagram": None,
+    "diagram_error": "",
+    "diagram_job": None,
+    "report_job": None,
+    "saved_models": None,
+    "metrics_totals": {},
+}
+
+# Kept when a session starts over
+_PERSISTENT_KEYS = ("metrics_totals", "saved_models")
+
+
+def session_defaults(model=None):
+    """Return fresh default state, starting from model when given."""
+    defaults = copy.deepcopy(SESSION_DEFAULTS)
+    if model:
+        defaults.update(copy.deepcopy(model))
+    return defaults
+
+
+def init_session(state, model=None):
+    """Add any missing keys to state."""
+    for key, value in session_defaults(model).items():
+        if key not in state:
+            state[key] = value
+
+
+def reset_session(state, model=None):
+    """Return state to step 1 with model (or an empty model), cancelling its pending render and report."""
+    for key in ("diagram_job", "report_job"):
+        job = state.get(key)
+        if job is not None:
+            job.cancel()
+    for key, value in session_defaults(model).items():
+        if key not in _PERSISTENT_KEYS:
+            state[key] = value
@@ -0,0 +1,253 @@
+"""SQLite persistence for threat models and their analyzed threats.
+
+Every save of a model adds a new version holding its description, data
+flows, trust boundaries and threats, so earlier versions stay queryable.
+Threats are stored as their catalog template plus interpolated values (see
+catalog.py), with the DFD element and STRIDE category in indexed columns:
+questions such as "which stored models have Spoofing threats on the
+Database" run in SQLite and stream their rows, so they never load every
+model into memory.
+
+The database lives at THREATMODEL_DB (default ``~/.threatmodel/threatmodel.db``);
+the file and its directory are only created on first use. Each thread gets
+its own connection; WAL mode lets readers carry on while a session saves.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from threatmodel.catalog import CATALOG, Threat
+from threatmodel.fingerprint import model_fingerprint
+
+SCHEMA_VERSION = 1
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".threatmodel", "threatmodel.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    latest_version_id INTEGER,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS model_versions (
+    id INTEGER PRIMARY KEY,
+    model_id INTEGER NOT NULL REFERENCES models(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    ruleset TEXT NOT NULL,
+    text_input TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    saved REAL NOT NULL,
+    UNIQUE (model_id, version)
+);
+CREATE TABLE IF NOT EXISTS data_flows (
+    version_id INTEGER NOT NULL REFERENCES model_versions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    PRIMARY KEY (version_id, position)
+);
+CREATE TABLE IF NOT EXISTS trust_boundaries (
+    version_id INTEGER NOT NULL REFERENCES model_versions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (version_id, position)
+);
+CREATE TABLE IF NOT EXISTS threats (
+    version_id INTEGER NOT NULL REFERENCES model_versions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    template TEXT NOT NULL,
+    field_values TEXT NOT NULL,
+    dfd_element TEXT,
+    stride TEXT NOT NULL,
+    number INTEGER,
+    PRIMARY KEY (version_id, position)
+);
+CREATE INDEX IF NOT EXISTS threats_by_element ON threats (dfd_element, version_id);
+CREATE INDEX IF NOT EXISTS threats_by_stride ON threats (stride, version_id);
+CREATE INDEX IF NOT EXISTS versions_by_fingerprint ON model_versions (fingerprint);
+CREATE INDEX IF NOT EXISTS models_by_update ON models (updated);
+"""
+
+
+class StoreError(ValueError):
+    """Raised when a stored model does not exist."""
+
+
+class ModelStore:
+    """Versioned models and threats in one SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        """Return this thread's connection, creating the database and schema on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.execute("PRAGMA journal_mode = WAL")
+                    connection.executescript(_SCHEMA)
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def save_model(self, name, model, threats=(), ruleset="generic"):
+        """Save model (and its threats, any iterable) as the next version of name and return that version.
+
+        Saving a model identical to the latest version returns that version
+        without writing anything.
+        """
+        fingerprint = model_fingerprint(model["text_input"], model["data_flows"], model["trust_boundaries"])
+        connection = self._connection()
+        with connection:
+            row = connection.execute(
+                "SELECT m.id, v.version, v.fingerprint, v.ruleset FROM models m"
+                " LEFT JOIN model_versions v ON v.id = m.latest_version_id WHERE m.name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                model_id = connection.execute("INSERT INTO models (name, updated) VALUES (?, ?)", (name, time.time())).lastrowid
+                version = 1
+            else:
+                model_id, latest, latest_fingerprint, latest_ruleset = row
+                if (latest_fingerprint, latest_ruleset) == (fingerprint, ruleset):
+                    return latest
+                version = (latest or 0) + 1
+            now = time.time()
+            version_id = connection.execute(
+                "INSERT INTO model_versions (model_id, version, ruleset, text_input, fingerprint, saved) VALUES (?, ?, ?, ?, ?, ?)",
+                (model_id, version, ruleset, model["text_input"], fingerprint, now),
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO data_flows VALUES (?, ?, ?, ?, ?)",
+                ((version_id, position, flow["source"], flow["destination"], flow["dataType"])
+                 for position, flow in enumerate(model["data_flows"])),
+            )
+            connection.executemany(
+                "INSERT INTO trust_boundaries VALUES (?, ?, ?, ?)",
+                ((version_id, position, boundary["name"], boundary["description"])
+                 for position, boundary in enumerate(model["trust_boundaries"])),
+            )
+            connection.executemany(
+                "INSERT INTO threats VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((version_id, position, threat.template.id, json.dumps(threat.values, ensure_ascii=False),
+                  threat.dfd_element, threat.template.stride, threat.number)
+                 for position, threat in enumerate(threats)),
+            )
+            connection.execute("UPDATE models SET latest_version_id = ?, updated = ? WHERE id = ?", (version_id, now, model_id))
+        return version
+
+    def _version_id(self, name, version=None):
+        if version is None:
+            row = self._connection().execute("SELECT latest_version_id FROM models WHERE name = ?", (name,)).fetchone()
+        else:
+            row = self._connection().execute(
+                "SELECT v.id FROM model_versions v JOIN models m ON m.id = v.model_id WHERE m.name = ? AND v.version = ?",
+                (name, version),
+            ).fetchone()
+        if row is None or row[0] is None:
+            raise StoreError(f"no saved model '{name}'" + (f" version {version}" if version is not None else ""))
+        return row[0]
+
+    def load_model(self, name, version=None):
+        """Return the model dict saved as name (its latest version by default)."""
+        connection = self._connection()
+        version_id = self._version_id(name, version)
+        text_input, = connection.execute("SELECT text_input FROM model_versions WHERE id = ?", (version_id,)).fetchone()
+        flows = connection.execute(
+            "SELECT source, destination, data_type FROM data_flows WHERE version_id = ? ORDER BY position", (version_id,))
+        boundaries = connection.execute(
+            "SELECT name, description FROM trust_boundaries WHERE version_id = ? ORDER BY position", (version_id,))
+        return {
+            "text_input": text_input,
+            "data_flows": [{"source": s, "destination": d, "dataType": t} for s, d, t in flows],
+            "trust_boundaries": [{"name": n, "description": d} for n, d in boundaries],
+        }
+
+    def load_threats(self, name, version=None):
+        """Return the threats saved with name (its latest version by default)."""
+        rows = self._connection().execute(
+            "SELECT template, field_values, dfd_element, number FROM threats WHERE version_id = ? ORDER BY position",
+            (self._version_id(name, version),),
+        )
+        return [_threat(*row) for row in rows]
+
+    def list_models(self, limit=-1):
+        """Yield (name, latest version, updated timestamp) for stored models, most recent first."""
+        yield from self._connection().execute(
+            "SELECT m.name, v.version, m.updated FROM models m JOIN model_versions v ON v.id = m.latest_version_id"
+            " ORDER BY m.updated DESC LIMIT ?", (limit,)
+        )
+
+    def versions(self, name):
+        """Yield (version, ruleset, saved timestamp) for every version of name, oldest first."""
+        yield from self._connection().execute(
+            "SELECT v.version, v.ruleset, v.saved FROM model_versions v JOIN models m ON m.id = v.model_id"
+            " WHERE m.name = ? ORDER BY v.version", (name,)
+        )
+
+    def delete_model(self, name):
+        """Remove name and all of its versions."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM models WHERE name = ?", (name,))
+
+    def _threat_filter(self, stride, dfd_element, all_versions):
+        join = "JOIN model_versions v ON v.id = t.version_id JOIN models m ON m.id = v.model_id"
+        clauses = [] if all_versions else ["t.version_id = m.latest_version_id"]
+        params = []
+        if stride is not None:
+            clauses.append("t.stride = ?")
+            params.append(stride)
+        if dfd_element is not None:
+            clauses.append("t.dfd_element = ?")
+            params.append(dfd_element)
+        return join + (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query_threats(self, stride=None, dfd_element=None, all_versions=False):
+        """Yield (model name, version, threat) for stored threats matching the filters, one row at a time.
+
+        Only the latest version of each model is searched unless all_versions is set.
+        """
+        where, params = self._threat_filter(stride, dfd_element, all_versions)
+        rows = self._connection().execute(
+            "SELECT m.name, v.version, t.template, t.field_values, t.dfd_element, t.number FROM threats t "
+            + where + " ORDER BY m.name, v.version, t.position", params
+        )
+        for name, version, template, values, dfd_element_, number in rows:
+            yield name, version, _threat(template, values, dfd_element_, number)
+
+    def threat_counts(self, by="stride", stride=None, dfd_element=None, all_versions=False):
+        """Return {stride category or DFD element: threat count} over the stored models."""
+        column = {"stride": "t.stride", "dfd_element": "t.dfd_element"}[by]
+        where, params = self._threat_filter(stride, dfd_element, all_versions)
+        rows = self._connection().execute(f"SELECT {column}, COUNT(*) FROM threats t {where} GROUP BY {column}", params)
+        return dict(rows)
+
+
+def _threat(template, values, dfd_element, number):
+    """Rebuild a Threat record from its stored columns."""
+    return Threat(CATALOG[template], tuple(json.loads(values)), dfd_element, number)
+
+
+def store_from_env():
+    """Build the shared store from the THREATMODEL_DB environment variable."""
+    return ModelStore(os.environ.get("THREATMODEL_DB") or DEFAULT_PATH)
+
+
+# Process-wide instance shared by every Streamlit session
+model_store = store_from_env()
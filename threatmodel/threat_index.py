@@ -0,0 +1,133 @@
+"""Inverted indexes for filtering and searching an analysis result.
+
+A ``ThreatIndex`` is built once per list of threats and answers filters by
+STRIDE category, DFD element, OWASP ASVS/SAMM reference and free text with
+set intersections instead of a scan over every threat. Threats raised by the
+same catalog rule share their category, references and most of their text,
+so those are indexed per template and only the interpolated values, DFD
+element and ID are indexed per threat.
+"""
+import string
+from bisect import bisect_left
+
+from threatmodel.boundary_index import tokenize
+
+
+def references(text):
+    """Split an ASVS or SAMM field into its references, e.g. "V2.1.1" or "Governance Level 2"."""
+    return [part.split(" - ", 1)[0].strip() for part in text.split(";") if part.strip()]
+
+
+def _literal_words(text):
+    """Return the words of a template text, leaving out its {placeholders}."""
+    return tokenize(" ".join(literal for literal, _, _, _ in string.Formatter().parse(text or "")))
+
+
+class ThreatIndex:
+    """Facet and full-text index over a list of threats."""
+
+    def __init__(self, threats):
+        self.threats = threats
+        self._by_template = {}
+        self._by_element = {}
+        self._by_id = {}
+        # Flow endpoints and boundary names repeat heavily, so threats sharing
+        # their values and DFD element are grouped and each group tokenized once
+        groups = {}
+        for position, threat in enumerate(threats):
+            self._by_template.setdefault(threat.template, []).append(position)
+            element = threat.dfd_element
+            if element is not None:
+                self._by_element.setdefault(element, []).append(position)
+            if threat.number is not None:
+                self._by_id[f"t{threat.number}"] = position
+            groups.setdefault((threat.values, element), []).append(position)
+        self._words = {}
+        for (values, element), positions in groups.items():
+            for word in set(tokenize(" ".join(values + (element or "",)))):
+                self._words.setdefault(word, []).append(positions)
+
+        self._by_stride = {}
+        self._by_reference = {}
+        self._template_words = {}
+        for template in self._by_template:
+            self._by_stride.setdefault(template.stride, []).append(template)
+            for reference in references(template.asvs) + references(template.samm):
+                self._by_reference.setdefault(reference, []).append(template)
+            for text in (template.type, template.stride, template.description, template.mitigation,
+                         template.controls, template.asvs, template.samm):
+                for word in _literal_words(text):
+                    self._template_words.setdefault(word, set()).add(template)
+        self._vocabulary = sorted(self._words.keys() | self._template_words.keys())
+
+    def __len__(self):
+        return len(self.threats)
+
+    def strides(self):
+        """Return {STRIDE category: threat count}."""
+        return {stride: sum(len(self._by_template[t]) for t in templates) for stride, templates in sorted(self._by_stride.items())}
+
+    def elements(self):
+        """Return {DFD element: threat count}, in order of first appearance."""
+        return {element: len(positions) for element, positions in self._by_element.items()}
+
+    def references(self):
+        """Return {ASVS or SAMM reference: threat count}."""
+        return {reference: sum(len(self._by_template[t]) for t in templates) for reference, templates in sorted(self._by_reference.items())}
+
+    def _templates_positions(self, templates):
+        positions = set()
+        for template in templates:
+            positions.update(self._by_template[template])
+        return positions
+
+    def _word_positions(self, prefix):
+        """Return the positions of threats with a word starting with prefix, or with prefix as their ID."""
+        positions = set()
+        templates = set()
+        start = bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            for group in self._words.get(word, ()):
+                positions.update(group)
+            templates |= self._template_words.get(word, set())
+        if prefix in self._by_id:
+            positions.add(self._by_id[prefix])
+        return positions | self._templates_positions(templates)
+
+    def search(self, strides=(), elements=(), references=(), text=""):
+        """Return the sorted positions of threats matching every given filter.
+
+        Within strides, elements and references any value may match; each
+        word of text must start a word of the threat or be its ID.
+        """
+        result = None
+        if strides:
+            result = self._templates_positions(t for stride in strides for t in self._by_stride.get(stride, ()))
+        if elements:
+            matches = set()
+            for element in elements:
+                matches.update(self._by_element.get(element, ()))
+            result = matches if result is None else result & matches
+        if references:
+            matches = self._templates_positions({t for reference in references for t in self._by_reference.get(reference, ())})
+            result = matches if result is None else result & matches
+        for word in tokenize(text):
+            if result is not None and not result:
+                break
+            matches = self._word_positions(word)
+            result = matches if result is None else result & matches
+        if result is None:
+            return list(range(len(self.threats)))
+        return sorted(result)
+
+    def filter(self, strides=(), elements=(), references=(), text="", group_by_element=False):
+        """Return the threats matching search(), in their original order or grouped by DFD element."""
+        threats = [self.threats[position] for position in self.search(strides, elements, references, text)]
+        if group_by_element:
+            groups = {}
+            for threat in threats:
+                groups.setdefault(threat.dfd_element, []).append(threat)
+            threats = [threat for group in groups.values() for threat in group]
+        return threats
@@ -0,0 +1,48 @@
+"""Precomputed warm start for the e-commerce example every session opens with.
+
+threat_modeling_app.py seeds each new session with ECOMMERCE_MODEL, so its
+threats, DOT source and rendered diagram are identical for every visitor and
+after every "Start Over". ``warm_default_model`` analyzes the model and
+submits its diagram for rendering once per process; the finished image is
+pinned in the render cache. ``default_analysis`` hands each session a copy
+of the analyzed model, so its first diagram request is a cache hit and only
+its own later edits are analyzed.
+"""
+import threading
+
+from threatmodel.defaults import ECOMMERCE_MODEL
+from threatmodel.incremental import IncrementalModel
+from threatmodel.render import DIAGRAM_FORMAT
+from threatmodel.render_cache import render_cache
+from threatmodel.render_pool import RenderPoolBusy, render_pool
+
+_lock = threading.Lock()
+_default = None
+
+
+def _pin(job):
+    """Keep a finished warm-start render in the cache for good."""
+    if not job.cancelled() and job.exception() is None:
+        render_cache.pin(job.render_key, job.result())
+
+
+def warm_default_model(fmt=DIAGRAM_FORMAT):
+    """Return the process-wide analyzed default model, analyzing and pre-rendering it on the first call."""
+    global _default
+    with _lock:
+        if _default is None:
+            model = IncrementalModel("ecommerce").sync(
+                ECOMMERCE_MODEL["text_input"], ECOMMERCE_MODEL["data_flows"], ECOMMERCE_MODEL["trust_boundaries"]
+            )
+            dot, engine = model.layout()
+            try:
+                render_pool.submit(dot.source, fmt, engine).add_done_callback(_pin)
+            except RenderPoolBusy:
+                pass  # Sessions will render it themselves
+            _default = model
+        return _default
+
+
+def default_analysis():
+    """Return a private copy of the analyzed default model for a new session."""
+    return warm_default_model().copy()